@@ -0,0 +1,124 @@
+import os
+import copy
+import threading
+import numpy as np
+
+# Written at the end of every ingestion run; a new value flushes cached answers
+CORPUS_VERSION_FILE = os.getenv("CORPUS_VERSION_FILE", os.path.join("backend", "corpus_version.txt"))
+
+
+def read_corpus_version(path=CORPUS_VERSION_FILE):
+    """
+    Version stamp written by data_injestion after every ingestion run.
+    Missing file means the corpus has never been stamped.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def write_corpus_version(version, path=CORPUS_VERSION_FILE):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(version)
+
+
+class SemanticAnswerCache:
+    """
+    Caches full answers keyed by the dense embedding of the query.
+
+    Query vectors are kept L2-normalized in a preallocated float32 matrix, so a
+    lookup is a single matrix-vector product; `lookup_many` scores a batch of
+    queries with one matrix-matrix product. When full, the least recently used
+    slot is overwritten. Entries belong to a corpus version and are flushed as
+    soon as a different version is seen.
+    """
+
+    def __init__(self, threshold=0.95, max_size=512, version=""):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.version = version
+        self.lock = threading.Lock()
+        self.vectors = None
+        self.answers = [None] * max_size
+        self.last_used = np.zeros(max_size, dtype=np.int64)
+        self.size = 0
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def check_version(self, version):
+        """Flush every cached answer if the corpus version changed."""
+        with self.lock:
+            if version != self.version:
+                self.version = version
+                self._reset()
+                self.invalidations += 1
+
+    def lookup(self, vector):
+        """Return the cached answer for the closest previous query, or None below the threshold."""
+        return self.lookup_many([vector])[0]
+
+    def lookup_many(self, vectors):
+        queries = self._normalize(vectors)
+        with self.lock:
+            if self.size == 0:
+                self.misses += len(queries)
+                return [None] * len(queries)
+            similarities = queries @ self.vectors[:self.size].T
+            best = similarities.argmax(axis=1)
+            results = []
+            for row, slot in enumerate(best):
+                if similarities[row, slot] >= self.threshold:
+                    self.clock += 1
+                    self.last_used[slot] = self.clock
+                    self.hits += 1
+                    results.append(copy.deepcopy(self.answers[slot]))
+                else:
+                    self.misses += 1
+                    results.append(None)
+            return results
+
+    def store(self, vector, answer):
+        query = self._normalize(vector)
+        with self.lock:
+            if self.vectors is None:
+                self.vectors = np.zeros((self.max_size, query.shape[-1]), dtype=np.float32)
+            if self.size < self.max_size:
+                slot = self.size
+                self.size += 1
+            else:
+                slot = int(self.last_used.argmin())
+            self.clock += 1
+            self.vectors[slot] = query
+            self.answers[slot] = copy.deepcopy(answer)
+            self.last_used[slot] = self.clock
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.answers = [None] * self.max_size
+        self.last_used[:] = 0
+        self.size = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self.size,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel
+from backend import response_manager
+from backend.context_retrival import routing_stats
+from backend.instrumentation import registry
+
+# Requests admitted at once; beyond this the API answers 503 instead of queueing without bound
+API_MAX_IN_FLIGHT = int(os.getenv("API_MAX_IN_FLIGHT", "32"))
+# Seconds a request may take end to end (for streams: until the last token)
+API_REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", "60"))
+# Threads running the blocking retrieval/LLM calls; shared by all requests, not one per request
+API_WORKERS = int(os.getenv("API_WORKERS", str(API_MAX_IN_FLIGHT)))
+
+app = FastAPI(title="JioPay Business Assistant API")
+executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+in_flight = 0
+rejected = 0
+timed_out = 0
+
+# Marks the end of a blocking token iterator
+STREAM_END = object()
+
+
+class AskRequest(BaseModel):
+    query: str
+    # /ask only: include per-stage span timings in the result
+    timings: bool = False
+
+
+class Slot:
+    """
+    An admitted request's in-flight slot. It is held by the request handler and by every
+    executor job the request started, and released once all of them are done, so a request
+    that timed out keeps counting until its worker thread actually finishes.
+    Only touched from the event loop thread.
+    """
+
+    def __init__(self):
+        self.holders = 1
+
+    def run(self, function, *args):
+        """Run the blocking `function(*args)` on the shared executor; awaitable."""
+        loop = asyncio.get_running_loop()
+        future = executor.submit(function, *args)
+        self.holders += 1
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.drop))
+        return asyncio.wrap_future(future, loop=loop)
+
+    def drop(self):
+        self.holders -= 1
+        if self.holders == 0:
+            release()
+
+
+def admit():
+    """Reserve an in-flight slot or reject the request (backpressure)."""
+    global in_flight, rejected
+    if in_flight >= API_MAX_IN_FLIGHT:
+        rejected += 1
+        raise HTTPException(status_code=503, detail="Too many requests in flight", headers={"Retry-After": "1"})
+    in_flight += 1
+    return Slot()
+
+
+def release():
+    global in_flight
+    in_flight -= 1
+
+
+def read_token(tokens, lock):
+    with lock:
+        return next(tokens, STREAM_END)
+
+
+def close_tokens(tokens, lock):
+    """Close the token iterator (releasing its LLM stream or shared flight) once a read in progress returns."""
+    close = getattr(tokens, "close", None)
+    if close is not None:
+        with lock:
+            close()
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/ask")
+async def ask(request: AskRequest):
+    """Answer a question; returns {"response", "sources"} like response_manager.response."""
+    global timed_out
+    slot = admit()
+    try:
+        return await asyncio.wait_for(slot.run(response_manager.response, request.query, request.timings), API_REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        timed_out += 1
+        raise HTTPException(status_code=504, detail="Timed out generating a response")
+    finally:
+        slot.drop()
+
+
+@app.post("/ask/stream")
+async def ask_stream(request: AskRequest):
+    """
+    Server-sent events: one `sources` event, then `token` events as the LLM
+    streams, then `done` (or `error` if the request deadline passes).
+    """
+    global timed_out
+    slot = admit()
+    deadline = time.monotonic() + API_REQUEST_TIMEOUT
+    try:
+        result = await asyncio.wait_for(slot.run(response_manager.response_stream, request.query), API_REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        slot.drop()
+        timed_out += 1
+        raise HTTPException(status_code=504, detail="Timed out retrieving context")
+    except Exception:
+        slot.drop()
+        raise
+
+    tokens = iter(result["response"])
+    # Serializes reads and the final close: the client may disconnect while a read is running
+    tokens_lock = threading.Lock()
+
+    async def events():
+        global timed_out
+        try:
+            yield sse("sources", result["sources"])
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                chunk = await asyncio.wait_for(slot.run(read_token, tokens, tokens_lock), remaining)
+                if chunk is STREAM_END:
+                    break
+                yield sse("token", chunk)
+            yield sse("done", {})
+        except asyncio.TimeoutError:
+            timed_out += 1
+            yield sse("error", {"detail": "Timed out generating a response"})
+        finally:
+            # Also runs when the client disconnects mid-stream
+            slot.run(close_tokens, tokens, tokens_lock)
+            slot.drop()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms in the Prometheus text format (needs INSTRUMENTATION_ENABLED=true)."""
+    return registry.export_prometheus()
+
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "in_flight": in_flight,
+        "max_in_flight": API_MAX_IN_FLIGHT,
+        "rejected": rejected,
+        "timed_out": timed_out,
+        "coalescing": response_manager.coalescing_stats(),
+        "context_packing": response_manager.context_packing_stats(),
+        "faq": response_manager.faq_stats(),
+        "retrieval_gate": response_manager.retrieval_gate_stats(),
+        "routing": routing_stats(),
+    }
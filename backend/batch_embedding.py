@@ -0,0 +1,135 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Tokenizer loaded on first use (see get_encoding): loading it may download its
+# encoding files, which importing modules like response_manager must not do
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """The OpenAI embedding tokenizer, or None when tiktoken or its encoding files are unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:  # tiktoken missing or its encoding files unavailable offline
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text):
+    """Token count with the OpenAI embedding tokenizer, or a chars/4 estimate without it."""
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def is_retryable(error):
+    """Rate limits (HTTP 429) and dropped connections are worth retrying; anything else is not."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    message = str(error).lower()
+    return (
+        status == 429
+        or (status is not None and status >= 500)
+        or "rate limit" in message
+        or "connection" in message
+        or "timed out" in message
+    )
+
+
+class EmbeddingProgress:
+    """
+    Thread-safe progress and throughput reporting for an embedding run.
+    `total_chunks` may be None when chunks are streamed.
+    """
+
+    def __init__(self, total_chunks, report_every=5):
+        self.total_chunks = total_chunks
+        self.report_every = report_every
+        self.chunks = 0
+        self.tokens = 0
+        self.batches = 0
+        self.retries = 0
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def batch_done(self, chunks, tokens):
+        with self.lock:
+            self.chunks += chunks
+            self.tokens += tokens
+            self.batches += 1
+            if self.batches % self.report_every == 0 or self.chunks == self.total_chunks:
+                total = f"/{self.total_chunks}" if self.total_chunks is not None else ""
+                print(f"Embedded {self.chunks}{total} chunks {self.rates()}")
+
+    def retried(self):
+        with self.lock:
+            self.retries += 1
+
+    def rates(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return f"({self.chunks / elapsed:.1f} chunks/sec, {self.tokens / elapsed:.0f} tokens/sec)"
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        return {
+            "chunks": self.chunks,
+            "tokens": self.tokens,
+            "batches": self.batches,
+            "retries": self.retries,
+            "seconds": round(elapsed, 3),
+            "chunks_per_sec": round(self.chunks / max(elapsed, 1e-9), 1),
+            "tokens_per_sec": round(self.tokens / max(elapsed, 1e-9), 1),
+        }
+
+
+def embed_batch_with_backoff(embedding_model, texts, progress, max_retries=5, base_delay=1.0, max_delay=30.0):
+    """
+    Embed one batch with `embed_documents`, backing off exponentially with full
+    jitter on rate limits and transient network errors.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            vectors = embedding_model.embed_documents(texts)
+            progress.batch_done(len(texts), sum(count_tokens(text) for text in texts))
+            return vectors
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            progress.retried()
+            print(f"❌ Embedding batch failed ({e}). Retrying in {delay:.1f} sec...")
+            time.sleep(delay)
+
+
+def embed_in_batches(embedding_model, texts, batch_size=64, max_workers=4, max_retries=5, base_delay=1.0):
+    """
+    Embed `texts` in batches of `batch_size` across a pool of `max_workers` threads.
+    Returns (vectors in input order, throughput summary).
+    """
+    progress = EmbeddingProgress(len(texts))
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embed") as pool:
+        results = pool.map(
+            lambda batch: embed_batch_with_backoff(embedding_model, batch, progress, max_retries, base_delay),
+            batches,
+        )
+        vectors = [vector for batch_vectors in results for vector in batch_vectors]
+
+    summary = progress.summary()
+    print(
+        f"Embedded {summary['chunks']} chunks in {summary['seconds']}s "
+        f"({summary['chunks_per_sec']} chunks/sec, {summary['tokens_per_sec']} tokens/sec, "
+        f"{summary['retries']} retries)"
+    )
+    return vectors, summary
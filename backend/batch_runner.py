@@ -0,0 +1,118 @@
+"""
+Answer a file of questions with response_batch and write one JSON line per answer.
+
+Input is JSONL with a "question" (or "query") field and optional "id" / "expected"
+fields, or a scraped help-centre JSON file whose Q/A pairs become the questions.
+Each output line holds the id, question, expected answer, response, sources and
+per-stage timings. Lines are flushed batch by batch, and questions whose id is
+already answered in the output file are skipped, so an interrupted run resumes where
+it stopped. Failed answers ("Error..." responses) are written too but retried on the
+next run; a later line for the same id supersedes an earlier one.
+
+The FAQ fast path is off unless --use-faq is given: run over helpcentre.json, it
+would echo the curated answers and test neither retrieval nor the LLM.
+
+Run from the repository root:
+    python -m backend.batch_runner data_collection/helpcentre.json --output answers.jsonl
+"""
+import os
+import json
+import time
+import argparse
+from backend.response_manager import response_batch, LLM_BATCH_CONCURRENCY
+
+
+def load_questions(path):
+    """[{"id", "question", "expected"}] from a JSONL file or a help-centre JSON file."""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        return [
+            {"id": f"{section['section']}#{i}", "question": item["question"], "expected": item.get("answer")}
+            for section in data.get("content", [])
+            for i, item in enumerate(section.get("text", []))
+            if isinstance(item, dict) and "question" in item
+        ]
+
+    questions = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            questions.append({
+                "id": str(record.get("id", line_number)),
+                "question": record.get("question") or record["query"],
+                "expected": record.get("expected"),
+            })
+    return questions
+
+
+def drop_partial_line(output_path):
+    """Truncate a last line left unfinished by a crash, so appended answers start on a fresh line."""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as file:
+        content = file.read()
+        if content and not content.endswith(b"\n"):
+            file.truncate(content.rfind(b"\n") + 1)
+
+
+def failed(result):
+    """Whether `result` is a provider failure (see llm_handler) rather than an answer."""
+    return str(result.get("response", "")).startswith("Error")
+
+
+def completed_ids(output_path):
+    """Ids already answered in the output file; ids whose latest answer failed are retried."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+                if failed(record):
+                    done.discard(record["id"])
+                else:
+                    done.add(record["id"])
+            except (json.JSONDecodeError, KeyError):
+                continue
+    return done
+
+
+def run(input_path, output_path, batch_size=16, max_concurrency=LLM_BATCH_CONCURRENCY, use_faq=False):
+    questions = load_questions(input_path)
+    drop_partial_line(output_path)
+    done = completed_ids(output_path)
+    todo = [question for question in questions if question["id"] not in done]
+    print(f"📋 {len(questions)} questions, {len(questions) - len(todo)} already answered, {len(todo)} to go")
+
+    start = time.perf_counter()
+    failures = 0
+    with open(output_path, "a", encoding="utf-8") as output:
+        for offset in range(0, len(todo), batch_size):
+            batch = todo[offset:offset + batch_size]
+            results = response_batch([question["question"] for question in batch], max_concurrency, use_faq)
+            for question, result in zip(batch, results):
+                failures += failed(result)
+                output.write(json.dumps({**question, **result}, ensure_ascii=False) + "\n")
+            output.flush()
+            elapsed = time.perf_counter() - start
+            answered = offset + len(batch)
+            print(f"✅ {answered}/{len(todo)} answered ({answered / elapsed:.2f} questions/sec), {failures} failed")
+    if failures:
+        print(f"⚠️ {failures} answers failed; run again with the same --output to retry them")
+    return len(todo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of questions in batches (resumable).")
+    parser.add_argument("input", help="JSONL of questions, or a help-centre JSON file")
+    parser.add_argument("--output", required=True, help="JSONL file answers are appended to")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=LLM_BATCH_CONCURRENCY, help="LLM calls in flight at once")
+    parser.add_argument("--use-faq", action="store_true",
+                        help="answer FAQ questions from the FAQ index instead of retrieval + LLM, as the API does")
+    args = parser.parse_args()
+    run(args.input, args.output, args.batch_size, args.concurrency, args.use_faq)
@@ -0,0 +1,169 @@
+"""
+Calibrate the retrieval-confidence gate (backend.retrieval_gate) against the configured
+retriever and report what it would have saved.
+
+Labeled queries come from a JSONL file of {"query", "in_scope"} records, which must
+include out-of-scope queries. In-scope records may name the help-centre question they
+paraphrase in "gold_question"; the chunks cut from that Q/A pair are their gold context.
+Queries the FAQ fast path answers never reach the gate at runtime, so they are left
+out. Every query is retrieved once with hybrid_search. Thresholds are fitted on a
+training split and reported on the held-out rest, then refitted on everything and saved.
+
+Run from the repository root:
+    python -m backend.calibrate_gate --labeled data_collection/gate_labeled_queries.jsonl
+"""
+import json
+import random
+import argparse
+from backend.batch_embedding import count_tokens
+from backend.context_retrival import hybrid_search, active_backend
+from backend.faq_index import FaqIndex, question_key
+from backend.response_manager import FAQ_MATCH_THRESHOLD
+from backend.retrieval_gate import (
+    RetrievalGate, RETRIEVAL_GATE_FILE, MIN_DOMINANCE_MARGIN, top_index_scores, dominance_gap, calibrate_thresholds,
+    calibrate_margin,
+)
+
+HELPCENTRE_FILE = "data_collection/helpcentre.json"
+LABELED_FILE = "data_collection/gate_labeled_queries.jsonl"
+
+
+def load_labeled(helpcentre_path=HELPCENTRE_FILE, labeled_path=LABELED_FILE, faq_threshold=FAQ_MATCH_THRESHOLD):
+    """
+    [{"query", "in_scope", "gold"}] where gold is the text of the help-centre Q/A pair the
+    query paraphrases, if known. Queries the FAQ index would answer are skipped.
+    """
+    entries = []
+    with open(helpcentre_path, "r", encoding="utf-8") as file:
+        for section in json.load(file).get("content", []):
+            for item in section.get("text", []):
+                if item.get("question") and item.get("answer"):
+                    entries.append({"question": item["question"], "answer": item["answer"]})
+    gold = {question_key(entry["question"]): f"Q: {entry['question']}\nA: {entry['answer']}" for entry in entries}
+    faq = FaqIndex(entries, faq_threshold)
+
+    queries, answered_by_faq = [], 0
+    with open(labeled_path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if faq.match(record["query"]) is not None:
+                answered_by_faq += 1
+                continue
+            gold_question = record.get("gold_question")
+            if gold_question and question_key(gold_question) not in gold:
+                raise ValueError(f"gold_question not in {helpcentre_path}: {gold_question}")
+            queries.append({"query": record["query"], "in_scope": bool(record["in_scope"]),
+                            "gold": gold[question_key(gold_question)] if gold_question else None})
+    if answered_by_faq:
+        print(f"⏭ Left out {answered_by_faq} labeled queries the FAQ fast path answers")
+    return queries
+
+
+def collect_samples(queries, search, top_k=5):
+    """
+    Retrieve every labeled query once with `search(query, top_k)` and keep what the gate looks at.
+    Queries whose retrieval lost a branch (failure or timeout) are left out: their scores are incomplete.
+    """
+    samples = []
+    for labeled in queries:
+        results = search(labeled["query"], top_k)
+        if getattr(results, "missing", None):
+            print(f"⚠️ Left out {labeled['query']!r}: {', '.join(sorted(results.missing))} search failed")
+            continue
+        gold_rank = None
+        if labeled["gold"]:
+            gold_rank = next((rank for rank, result in enumerate(results, start=1)
+                              if result.text.strip() and result.text.strip() in labeled["gold"]), None)
+        samples.append({
+            **labeled,
+            "scores": top_index_scores(results),
+            "gap": dominance_gap(results),
+            "gold_rank": gold_rank,
+            "tokens": [count_tokens(result.text) for result in results],
+        })
+    return samples
+
+
+def fit(samples, target_recall, min_k, top_k, max_loss, backend=None, min_margin=MIN_DOMINANCE_MARGIN):
+    return RetrievalGate(
+        calibrate_thresholds(samples, target_recall),
+        calibrate_margin(samples, min_k, top_k, max_loss, min_margin),
+        min_k,
+        backend,
+    )
+
+
+def report(gate, samples):
+    """LLM calls avoided and answer-quality impact of `gate` on `samples`."""
+    answered = [sample for sample in samples if gate.passes(sample["scores"])]
+    gated = [sample for sample in samples if not gate.passes(sample["scores"])]
+    gated_in_scope = [sample for sample in gated if sample["in_scope"]]
+    in_scope = sum(1 for sample in samples if sample["in_scope"])
+    out_of_scope = len(samples) - in_scope
+
+    trimmed = [sample for sample in answered if gate.dominates(len(sample["tokens"]), sample["gap"])]
+    answered_in_scope = [sample for sample in answered if sample["in_scope"]]
+    trimmed_in_scope = [sample for sample in trimmed if sample["in_scope"]]
+    gold_retrieved = sum(1 for sample in answered if sample["gold_rank"])
+    gold_lost = sum(1 for sample in trimmed if sample["gold_rank"] and sample["gold_rank"] > gate.min_k)
+    tokens_before = sum(sum(sample["tokens"]) for sample in answered)
+    tokens_saved = sum(sum(sample["tokens"][gate.min_k:]) for sample in trimmed)
+
+    return {
+        "queries": len(samples),
+        "llm_calls_avoided": len(gated),
+        "out_of_scope_gated": f"{len(gated) - len(gated_in_scope)}/{out_of_scope}",
+        "in_scope_gated": f"{len(gated_in_scope)}/{in_scope}",
+        "in_scope_gated_with_gold_retrieved": sum(1 for sample in gated_in_scope if sample["gold_rank"]),
+        "answered_with_trimmed_context": f"{len(trimmed)}/{len(answered)}",
+        "in_scope_trim_rate": f"{len(trimmed_in_scope)}/{len(answered_in_scope)}",
+        "gold_kept_after_trimming": f"{gold_retrieved - gold_lost}/{gold_retrieved}",
+        "context_tokens_saved": f"{tokens_saved / tokens_before:.1%}" if tokens_before else "0.0%",
+    }
+
+
+def print_report(title, gate, result):
+    print(f"\n{title}")
+    margin = "none (fixed top_k)" if gate.margin == float("inf") else round(gate.margin, 4)
+    print(f"  thresholds {gate.thresholds}, dominance margin {margin}, min_k {gate.min_k}")
+    for key, value in result.items():
+        print(f"  {key:<36}{value}")
+
+
+def calibrate(samples, target_recall=0.98, min_k=2, top_k=5, max_loss=0.01, holdout=0.3, seed=0, backend=None,
+              min_margin=MIN_DOMINANCE_MARGIN):
+    """Report a gate fitted on a training split against the held-out samples; return the gate fitted on all."""
+    shuffled = samples[:]
+    random.Random(seed).shuffle(shuffled)
+    cut = int(len(shuffled) * (1 - holdout))
+    if 0 < cut < len(shuffled):
+        train, test = shuffled[:cut], shuffled[cut:]
+        held_out_gate = fit(train, target_recall, min_k, top_k, max_loss, backend, min_margin)
+        print_report(f"Fitted on {len(train)}, evaluated on {len(test)} held-out queries", held_out_gate,
+                     report(held_out_gate, test))
+    gate = fit(samples, target_recall, min_k, top_k, max_loss, backend, min_margin)
+    print_report(f"Fitted and evaluated on all {len(samples)} queries", gate, report(gate, samples))
+    return gate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the retrieval-confidence gate.")
+    parser.add_argument("--labeled", default=LABELED_FILE, help="JSONL of {\"query\", \"in_scope\"}")
+    parser.add_argument("--helpcentre", default=HELPCENTRE_FILE)
+    parser.add_argument("--output", default=RETRIEVAL_GATE_FILE)
+    parser.add_argument("--target-recall", type=float, default=0.98, help="Share of in-scope queries that must pass")
+    parser.add_argument("--min-k", type=int, default=2, help="Chunks kept when the top hit dominates")
+    parser.add_argument("--max-loss", type=float, default=0.01, help="Share of gold chunks trimming may drop")
+    parser.add_argument("--min-margin", type=float, default=MIN_DOMINANCE_MARGIN,
+                        help="Below this calibrated margin, keep a fixed top_k instead of trimming")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = collect_samples(load_labeled(args.helpcentre, args.labeled),
+                              lambda query, top_k: hybrid_search(query, top_k=top_k), args.top_k)
+    gate = calibrate(samples, args.target_recall, args.min_k, args.top_k, args.max_loss, backend=active_backend(),
+                     min_margin=args.min_margin)
+    gate.save(args.output)
+    print(f"\n✅ Saved retrieval gate to {args.output}")
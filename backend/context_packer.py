@@ -0,0 +1,95 @@
+import re
+from dataclasses import replace
+from backend.batch_embedding import count_tokens
+from backend.text_similarity import MinHasher
+
+# Chunks whose 3-word shingle sets are at least this similar (estimated Jaccard) count as duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.7
+# Shortest shared boundary text treated as splitter overlap when merging adjacent chunks
+MIN_MERGE_OVERLAP = 30
+
+minhasher = MinHasher(num_perm=64, shingle_size=3)
+
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def same_source(a, b):
+    return a.url == b.url and a.section == b.section
+
+
+def overlap_merge(first, second):
+    """
+    `first` followed by the rest of `second` when `second` starts with a tail of
+    `first` (the overlap the text splitter leaves between neighbouring chunks), else None.
+    """
+    probe = second[:MIN_MERGE_OVERLAP]
+    if len(probe) < MIN_MERGE_OVERLAP:
+        return None
+    position = first.find(probe)
+    while position != -1:
+        tail = first[position:]
+        if second.startswith(tail):
+            return first + second[len(tail):]
+        position = first.find(probe, position + 1)
+    return None
+
+
+def pack_context(chunks, token_budget):
+    """
+    Prepare retrieved chunks (RetrievedChunk, best first) for the prompt:
+    drop exact and near-duplicate chunks, merge neighbouring chunks of the same source
+    that overlap, then keep chunks in score order while they fit `token_budget` tokens.
+    Returns (packed chunks, report) where report counts tokens before/after and what was removed.
+    """
+    tokens_before = sum(count_tokens(chunk.text) for chunk in chunks)
+    report = {"tokens_before": tokens_before, "duplicates": 0, "merged": 0, "over_budget": 0}
+
+    # Exact duplicates (after whitespace/case normalization), then near-duplicates by MinHash
+    kept, signatures, seen = [], [], set()
+    for chunk in chunks:
+        key = normalize_text(chunk.text)
+        if key in seen:
+            report["duplicates"] += 1
+            continue
+        signature = minhasher.signature(chunk.text)
+        if any(MinHasher.similarity(signature, other) >= NEAR_DUPLICATE_THRESHOLD for other in signatures):
+            report["duplicates"] += 1
+            continue
+        seen.add(key)
+        signatures.append(signature)
+        kept.append(chunk)
+
+    # Merge overlapping neighbours from the same source into the better-ranked slot
+    merged = []
+    for chunk in kept:
+        for i, packed in enumerate(merged):
+            if not same_source(packed, chunk):
+                continue
+            text = overlap_merge(packed.text, chunk.text) or overlap_merge(chunk.text, packed.text)
+            if text is not None:
+                merged[i] = replace(packed, text=text, score=max(packed.score, chunk.score))
+                report["merged"] += 1
+                break
+        else:
+            merged.append(chunk)
+
+    # Fit the budget, best first; a chunk that does not fit is skipped in favour of smaller ones
+    packed, used = [], 0
+    for chunk in merged:
+        tokens = count_tokens(chunk.text)
+        if used + tokens <= token_budget:
+            packed.append(chunk)
+            used += tokens
+        elif not packed:
+            # Even the best chunk alone is over budget: keep its head rather than nothing
+            text = chunk.text[:max(1, len(chunk.text) * token_budget // tokens)]
+            packed.append(replace(chunk, text=text))
+            used += count_tokens(text)
+        else:
+            report["over_budget"] += 1
+
+    report["tokens_after"] = used
+    report["tokens_saved"] = tokens_before - used
+    return packed, report
@@ -1,8 +1,18 @@
 import os
 import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import numpy as np
+import threading
+from dataclasses import dataclass
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from langchain_openai import OpenAIEmbeddings
+from backend.fusion import fuse
+from backend.embedding_cache import EmbeddingCache, normalize_query
+from backend.local_index import LocalIndex
+from backend.query_router import get_query_router
+from backend.instrumentation import span, submit
+from backend.single_flight import SingleFlight
 
 # Load environment variables
 load_dotenv(os.path.join("backend", ".env"))
@@ -14,60 +24,446 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 # Index Names
 DENSE_INDEX = "rag-chatbot-dense"
 SPARSE_INDEX = "rag-chatbot-sparse"
+NAMESPACE = "chatbot-namespace"
 
-# Initialize Pinecone Client
-pc = Pinecone(api_key=PINECONE_API_KEY)
+# Retrieval backend: "pinecone" (hosted indexes) or "local" (in-process index built by data_injestion)
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "pinecone")
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", os.path.join("backend", "local_index"))
 
-# Connect to existing indexes
-dense_idx = pc.Index(host="https://rag-chatbot-dense-rm8ktr2.svc.aped-4627-b74a.pinecone.io")
-sparse_idx = pc.Index(host="https://rag-chatbot-sparse-rm8ktr2.svc.aped-4627-b74a.pinecone.io")
+# Seconds each retrieval branch (embed + query) may take before it is dropped
+BRANCH_TIMEOUT = float(os.getenv("RETRIEVAL_BRANCH_TIMEOUT", "5"))
 
-# Load OpenAI Embeddings
-embedding_model = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+# Fusion of the dense and sparse rankings ("rrf" or "minmax")
+FUSION_METHOD = os.getenv("FUSION_METHOD", "rrf")
+# Weight of the dense ranking; the sparse ranking gets 1 - FUSION_ALPHA
+FUSION_ALPHA = float(os.getenv("FUSION_ALPHA", "0.5"))
+
+# Query embedding cache: entry bound, TTL in seconds, optional sqlite file to persist across restarts
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+
+# Shared worker pool so the dense and sparse branches run side by side
+SEARCH_WORKERS = 8
+search_pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="hybrid-search")
+
+# Pinecone's sparse embedding model accepts at most this many inputs per request
+SPARSE_EMBED_BATCH = 96
+
+# Metadata routing: search only the section or document family the query's embedding is closest to
+# (see backend.query_router), unless it leads the next route by less than this cosine margin
+ROUTING_ENABLED = os.getenv("ROUTING_ENABLED", "true").lower() == "true"
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.08"))
+# Seconds the sparse branch waits for the route (at most half the time left); after that it searches unfiltered
+ROUTE_WAIT = float(os.getenv("ROUTE_WAIT", "0.5"))
+
+# Index hosts
+DENSE_INDEX_HOST = "https://rag-chatbot-dense-rm8ktr2.svc.aped-4627-b74a.pinecone.io"
+SPARSE_INDEX_HOST = "https://rag-chatbot-sparse-rm8ktr2.svc.aped-4627-b74a.pinecone.io"
+
+# Clients are created on first use (see the get_* functions below), so importing this
+# module stays cheap. Assigning these directly (e.g. to stubs) bypasses the lazy setup.
+pc = None
+dense_idx = None
+sparse_idx = None
+embedding_model = None
+retriever = None
+init_lock = threading.Lock()
+
+def get_pinecone():
+    """Pinecone client, created on first use."""
+    global pc
+    if pc is None:
+        with init_lock:
+            if pc is None:
+                from pinecone import Pinecone
+                pc = Pinecone(api_key=PINECONE_API_KEY)
+    return pc
+
+def get_dense_index():
+    global dense_idx
+    if dense_idx is None:
+        client = get_pinecone()
+        with init_lock:
+            if dense_idx is None:
+                dense_idx = client.Index(host=DENSE_INDEX_HOST)
+    return dense_idx
+
+def get_sparse_index():
+    global sparse_idx
+    if sparse_idx is None:
+        client = get_pinecone()
+        with init_lock:
+            if sparse_idx is None:
+                sparse_idx = client.Index(host=SPARSE_INDEX_HOST)
+    return sparse_idx
+
+def get_embedding_model():
+    """OpenAI embeddings client, created on first use."""
+    global embedding_model
+    if embedding_model is None:
+        with init_lock:
+            if embedding_model is None:
+                from langchain_openai import OpenAIEmbeddings
+                embedding_model = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+    return embedding_model
+
+# Query embedding caches, shared by every session in this process
+dense_cache = EmbeddingCache("dense", EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_PATH)
+sparse_cache = EmbeddingCache("sparse", EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_PATH)
+# Concurrent dense embeds of one query (the answer-cache lookup and the dense branch) share one request
+dense_flights = SingleFlight()
+
+def compute_dense_embedding(text):
+    with span("dense_embed"):
+        return (np.asarray(get_embedding_model().embed_query(text), dtype=np.float32),)
+
+def compute_sparse_embedding(text):
+    with span("sparse_embed"):
+        response = get_pinecone().inference.embed(
+            model="pinecone-sparse-english-v0",
+            inputs=[text],
+            parameters={"input_type": "query", "return_tokens": False}
+        )
+    data = response.data[0]
+    return (
+        np.asarray(data["sparse_indices"], dtype=np.uint32),
+        np.asarray(data["sparse_values"], dtype=np.float32),
+    )
+
+def compute_dense_embeddings(texts):
+    with span("dense_embed", mode="batch"):
+        vectors = get_embedding_model().embed_documents(texts)
+    return [(np.asarray(vector, dtype=np.float32),) for vector in vectors]
+
+def compute_sparse_embeddings(texts):
+    embeddings = []
+    for start in range(0, len(texts), SPARSE_EMBED_BATCH):
+        with span("sparse_embed", mode="batch"):
+            response = get_pinecone().inference.embed(
+                model="pinecone-sparse-english-v0",
+                inputs=texts[start:start + SPARSE_EMBED_BATCH],
+                parameters={"input_type": "query", "return_tokens": False}
+            )
+        embeddings.extend(
+            (np.asarray(data["sparse_indices"], dtype=np.uint32), np.asarray(data["sparse_values"], dtype=np.float32))
+            for data in response.data
+        )
+    return embeddings
+
+def get_dense_embedding(text):
+    """
+    Generate the dense query embedding with OpenAI, served from the cache when possible.
+    Callers embedding the same query at the same time wait for one request.
+    Returned as a float32 NumPy array.
+    """
+    arrays, _ = dense_flights.do(normalize_query(text), dense_cache.get_or_compute, text, compute_dense_embedding)
+    return arrays[0]
 
 def get_sparse_embedding(text):
     """
-    Generate sparse embeddings using Pinecone's sparse embedding model.
+    Generate sparse embeddings using Pinecone's sparse embedding model,
+    served from the cache when possible.
     """
-    response = pc.inference.embed(
-        model="pinecone-sparse-english-v0",
-        inputs=[text],
-        parameters={"input_type": "query", "return_tokens": False}
-    )
-    return response.data[0]
+    indices, values = sparse_cache.get_or_compute(text, compute_sparse_embedding)
+    return {"sparse_indices": indices.tolist(), "sparse_values": values.tolist()}
 
-def hybrid_search(query, top_k=5):
+@dataclass
+class RetrievedChunk:
     """
-    Perform hybrid search using both sparse and dense embeddings.
+    One fused retrieval result, with its metadata decoded once into plain fields.
+    `index_scores` holds the score each index gave the chunk.
     """
-    # Get dense and sparse embeddings
-    dense_embedding = embedding_model.embed_query(query)
-    sparse_embedding = get_sparse_embedding(query)
-    
-    # Query both indexes
-    dense_results = dense_idx.query(
-        namespace="chatbot-namespace", 
-        vector=dense_embedding, 
-        top_k=top_k, 
-        include_metadata=True, 
-        include_values=True
-    )
-    
-    sparse_results = sparse_idx.query(
-        sparse_vector={
-            "indices": sparse_embedding["sparse_indices"],
-            "values": sparse_embedding["sparse_values"]
-        },
+    __slots__ = ("id", "score", "text", "category", "url", "section", "index_scores")
+    id: str
+    score: float
+    text: str
+    category: str
+    url: str
+    section: str
+    index_scores: dict
+
+    @classmethod
+    def from_match(cls, match):
+        metadata = match.get("metadata") or {}
+        url = metadata.get("url")
+        section = metadata.get("section")
+        if "origin" in metadata and (url is None or section is None):
+            # Vectors ingested before metadata was flattened (see data_injestion --migrate-metadata)
+            try:
+                origin = json.loads(metadata["origin"])
+            except (json.JSONDecodeError, TypeError):
+                origin = {}
+            url = url or origin.get("url")
+            section = section or origin.get("section")
+        return cls(
+            id=match.get("id"),
+            score=match.get("score", 0),
+            text=metadata.get("source_text", "No source text available"),
+            category=metadata.get("category", "Unknown Category"),
+            url=url or "Unknown URL",
+            section=section or "Unknown Section",
+            index_scores=match.get("index_scores", {}),
+        )
+
+class SearchResults(list):
+    """
+    Fused RetrievedChunks, best first, plus `missing`: the indexes ("dense", "sparse")
+    whose branch failed or timed out and so contributed nothing, as opposed to returning no matches.
+    """
+
+    def __init__(self, chunks=(), missing=()):
+        super().__init__(chunks)
+        self.missing = frozenset(missing)
+
+class PineconeRetriever:
+    """
+    Retrieves from the hosted Pinecone dense and sparse indexes.
+    """
+    backend = "pinecone"
+
+    def dense_search(self, query, top_k=5, filter=None):
+        """
+        Embed the query with OpenAI and query the dense index.
+        """
+        dense_embedding = get_dense_embedding(query)
+        with span("index_query", index="dense"):
+            dense_results = get_dense_index().query(
+                namespace=NAMESPACE,
+                vector=dense_embedding.tolist(),
+                top_k=top_k,
+                filter=filter,
+                include_metadata=True,
+                include_values=False
+            )
+        return dense_results["matches"]
+
+    def sparse_search(self, query, top_k=5, filter=None):
+        """
+        Embed the query with Pinecone's sparse model and query the sparse index.
+        """
+        sparse_embedding = get_sparse_embedding(query)
+        with span("index_query", index="sparse"):
+            sparse_results = get_sparse_index().query(
+                sparse_vector={
+                    "indices": sparse_embedding["sparse_indices"],
+                    "values": sparse_embedding["sparse_values"]
+                },
+                top_k=top_k,
+                filter=filter,
+                include_metadata=True,
+                include_values=False
+            )
+        return sparse_results["matches"]
+
+class LocalRetriever:
+    """
+    Retrieves from an in-process LocalIndex built by data_injestion.
+    Only the dense query embedding leaves the process; sparse scoring is local BM25.
+    """
+    backend = "local"
+
+    def __init__(self, index):
+        self.index = index
+
+    def dense_search(self, query, top_k=5, filter=None):
+        dense_embedding = get_dense_embedding(query)
+        with span("index_query", index="local-dense"):
+            return self.index.query_dense(dense_embedding, top_k, filter)
+
+    def sparse_search(self, query, top_k=5, filter=None):
+        with span("index_query", index="local-bm25"):
+            return self.index.query_sparse(query, top_k, filter)
+
+def load_retriever(backend=RETRIEVER_BACKEND):
+    if backend == "local":
+        return LocalRetriever(LocalIndex.load(LOCAL_INDEX_PATH))
+    if backend == "pinecone":
+        return PineconeRetriever()
+    raise ValueError(f"Unknown retriever backend '{backend}'. Use 'pinecone' or 'local'.")
+
+def get_retriever():
+    """
+    Active retrieval backend, loaded on first use. Assign `retriever`
+    (e.g. a LocalRetriever) to change where hybrid_search looks.
+    """
+    global retriever
+    if retriever is None:
+        with init_lock:
+            if retriever is None:
+                retriever = load_retriever()
+    return retriever
+
+def active_backend():
+    """Name of the retriever backend in use ("pinecone" or "local"), e.g. to pick matching calibrations."""
+    return getattr(get_retriever(), "backend", RETRIEVER_BACKEND)
+
+def dense_search(query, top_k=5, filter=None):
+    return get_retriever().dense_search(query, top_k, filter)
+
+def sparse_search(query, top_k=5, filter=None):
+    return get_retriever().sparse_search(query, top_k, filter)
+
+def route_query(query):
+    """
+    Metadata filter for the document family `query` belongs to, or None to search
+    everything (routing off, no router built, or the router is not confident).
+    Blocks on the dense query embedding (cached once embedded), so hybrid_search calls it
+    inside its dense branch rather than before the branches start.
+    """
+    router = get_query_router(ROUTER_MIN_MARGIN) if ROUTING_ENABLED else None
+    if router is None:
+        return None
+    dense_embedding = get_dense_embedding(query)
+    with span("routing") as routing_span:
+        metadata_filter, route, _ = router.route(dense_embedding)
+        routing_span.set(outcome="fallback" if route is None else "routed")
+    return metadata_filter
+
+def routing_stats():
+    router = get_query_router(ROUTER_MIN_MARGIN) if ROUTING_ENABLED else None
+    return router.stats() if router is not None else {"routes": 0}
+
+def collect_branch(name, future, deadline):
+    """
+    Wait for a retrieval branch until the shared deadline.
+    A branch that fails or runs late contributes no matches instead of stalling the answer;
+    it returns None rather than [] so callers can tell it apart from an empty result.
+    """
+    try:
+        return list(future.result(timeout=max(0.0, deadline - time.monotonic())))
+    except FutureTimeoutError:
+        future.cancel()
+        print(f"❌ {name} search timed out, continuing without it")
+    except Exception as e:
+        print(f"❌ {name} search failed: {e}")
+    return None
+
+def fuse_branches(dense_matches, sparse_matches, top_k, method=None, alpha=None):
+    """SearchResults for the two branch results (None for a branch that failed)."""
+    fused = fuse(
+        [dense_matches or [], sparse_matches or []],
         top_k=top_k,
-        include_metadata=True,
-        include_values=True
+        method=method or FUSION_METHOD,
+        alpha=FUSION_ALPHA if alpha is None else alpha,
+        names=["dense", "sparse"],
     )
+    missing = [name for name, matches in (("dense", dense_matches), ("sparse", sparse_matches)) if matches is None]
+    return SearchResults((RetrievedChunk.from_match(match) for match in fused), missing)
+
+def embed_queries(queries):
+    """
+    Embed many queries with one batched request per embedder (cached queries are
+    skipped), warming the embedding caches so the searches that follow do not call out.
+    The sparse model is only called when the Pinecone backend needs it.
+    Returns the dense embeddings in query order.
+    """
+    dense_future = submit(search_pool, dense_cache.get_or_compute_many, queries, compute_dense_embeddings)
+    if isinstance(get_retriever(), PineconeRetriever):
+        sparse_cache.get_or_compute_many(queries, compute_sparse_embeddings)
+    return [arrays[0] for arrays in dense_future.result()]
+
+def hybrid_search(query, top_k=5, timeout=None, method=None, alpha=None, filter=None, routed=None):
+    """
+    Perform hybrid search using both sparse and dense embeddings.
+    The dense branch (embed, then query) and the sparse branch run concurrently,
+    so latency is roughly that of the slower branch rather than the sum of both.
+    The two rankings are fused (see backend.fusion) since cosine and dotproduct
+    scores are not comparable, and a chunk found by both indexes appears once.
+    Both indexes are searched with `filter`. When none is given and `routed` (default
+    ROUTING_ENABLED), the dense branch routes the query once it has its embedding (see
+    `route_query`) and searches only that route; the sparse branch embeds meanwhile and
+    queries with the same filter once the route is known (unfiltered if that takes longer
+    than ROUTE_WAIT). A routed search that finds nothing is retried unfiltered within the
+    same deadline.
+    Returns SearchResults: a list of RetrievedChunk, best first, noting failed branches.
+    """
+    return start_hybrid_search(query, top_k, timeout, method, alpha, filter, routed)()
+
+def start_hybrid_search(query, top_k=5, timeout=None, method=None, alpha=None, filter=None, routed=None):
+    """
+    Start both branches of `hybrid_search` and return without waiting for them.
+    Returns a function that waits for the branches (until the deadline set now) and
+    returns the fused results.
+    """
+    timeout = BRANCH_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    routing = filter is None and (ROUTING_ENABLED if routed is None else routed) \
+        and get_query_router(ROUTER_MIN_MARGIN) is not None
+    route = {}
+    routed_event = threading.Event()
+
+    def routed_dense_search():
+        try:
+            route["filter"] = route_query(query)
+        finally:
+            # Also when embedding failed: the sparse branch then searches unfiltered
+            routed_event.set()
+        return dense_search(query, top_k, route["filter"])
+
+    def routed_sparse_search():
+        if isinstance(get_retriever(), PineconeRetriever):
+            get_sparse_embedding(query)  # Embed while the dense branch routes
+        routed_event.wait(min(ROUTE_WAIT, max(0.0, deadline - time.monotonic()) / 2))
+        return sparse_search(query, top_k, route.get("filter") if routed_event.is_set() else None)
+
+    if routing:
+        dense_future = submit(search_pool, routed_dense_search)
+        sparse_future = submit(search_pool, routed_sparse_search)
+    else:
+        dense_future = submit(search_pool, dense_search, query, top_k, filter)
+        sparse_future = submit(search_pool, sparse_search, query, top_k, filter)
+
+    def finish():
+        dense_matches = collect_branch("Dense", dense_future, deadline)
+        sparse_matches = collect_branch("Sparse", sparse_future, deadline)
+        metadata_filter = route.get("filter") if dense_future.done() else None
+
+        # Merge results
+        with span("fusion"):
+            results = fuse_branches(dense_matches, sparse_matches, top_k, method, alpha)
+
+        if not results and metadata_filter is not None:
+            print("❌ Routed search found nothing, retrying unfiltered")
+            return hybrid_search(query, top_k, max(0.0, deadline - time.monotonic()), method, alpha, routed=False)
+        return results
+
+    return finish
+
+def hybrid_search_batch(queries, top_k=5, timeout=None, method=None, alpha=None, routed=None):
+    """
+    `hybrid_search` for many queries: embeddings are fetched in batches, then every
+    dense and sparse index query is issued concurrently on the search pool.
+    The branch timeout is scaled by how many rounds the pool needs for the batch.
+    Routes come from the batched embeddings; routed queries that find nothing are retried unfiltered.
+    Returns one SearchResults per query.
+    """
+    embed_queries(queries)
+    timeout = BRANCH_TIMEOUT if timeout is None else timeout
+    rounds = max(1, math.ceil(2 * len(queries) / SEARCH_WORKERS))
+    deadline = time.monotonic() + timeout * rounds
+    routed = ROUTING_ENABLED if routed is None else routed
+    filters = [route_query(query) if routed else None for query in queries]
+
+    def search(query, metadata_filter):
+        return (submit(search_pool, dense_search, query, top_k, metadata_filter),
+                submit(search_pool, sparse_search, query, top_k, metadata_filter))
 
-    # Merge results
-    combined_results = dense_results["matches"] + sparse_results["matches"]
-    combined_results.sort(key=lambda x: x["score"], reverse=True)  # Sort by score
+    def collect(futures, deadline):
+        return [
+            fuse_branches(collect_branch("Dense", dense_future, deadline), collect_branch("Sparse", sparse_future, deadline),
+                          top_k, method, alpha)
+            for dense_future, sparse_future in futures
+        ]
 
-    return combined_results[:top_k]  # Return top results
+    results = collect([search(query, metadata_filter) for query, metadata_filter in zip(queries, filters)], deadline)
+    empty = [i for i, (ranking, metadata_filter) in enumerate(zip(results, filters)) if not ranking and metadata_filter]
+    if empty:
+        print(f"❌ Routed search found nothing for {len(empty)} queries, retrying unfiltered")
+        retry_deadline = time.monotonic() + timeout * max(1, math.ceil(2 * len(empty) / SEARCH_WORKERS))
+        for i, ranking in zip(empty, collect([search(queries[i], None) for i in empty], retry_deadline)):
+            results[i] = ranking
+    return results
 
 # Example usage
 if __name__ == "__main__":
@@ -76,10 +472,5 @@ if __name__ == "__main__":
 
     print("\n🔹 Extracted Context:")
     for idx, result in enumerate(results, start=1):
-        metadata = result.get("metadata", {})
-        source_text = metadata.get("source_text", "No context available")
-        url = metadata.get("url", "No URL provided")
-        section = metadata.get("section", "Unknown Section")
-        
-        print(f"{idx}. **Section:** {section} | **URL:** {url} | **Score:** {result['score']}")
-        print(f"   📌 Context: {source_text}\n")
+        print(f"{idx}. **Section:** {result.section} | **URL:** {result.url} | **Score:** {result.score}")
+        print(f"   📌 Context: {result.text}\n")
@@ -2,13 +2,24 @@ import os
 import json
 import nltk
 import re
+import queue
+import hashlib
+import itertools
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from pinecone import Pinecone, ServerlessSpec, CloudProvider, AwsRegion, VectorType
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from langchain_openai import OpenAIEmbeddings
 from nltk.corpus import stopwords
+from backend.answer_cache import write_corpus_version
+from backend.local_index import LocalIndex, CHUNKS_FILE
+from backend.faq_index import FaqIndex, FAQ_INDEX_PATH
+from backend.query_router import QueryRouter, RouteSums, QUERY_ROUTER_FILE
+from backend.parallel_loader import iter_pdf_pages, iter_json_records
+from backend.batch_embedding import embed_in_batches, embed_batch_with_backoff, EmbeddingProgress
 
 # Load environment variables
 load_dotenv(os.path.join("backend", ".env"))
@@ -20,113 +31,226 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 # Index Names
 DENSE_INDEX = "rag-chatbot-dense"
 SPARSE_INDEX = "rag-chatbot-sparse"
+NAMESPACE = "chatbot-namespace"
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", os.path.join("backend", "local_index"))
 
-# Initialize Pinecone Client
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-# === Create Dense Index ===
-if DENSE_INDEX not in [index.name for index in pc.list_indexes()]:
-    pc.create_index(
-        name=DENSE_INDEX,
-        dimension=1536,  # OpenAI embedding dimension
-        spec=ServerlessSpec(cloud=CloudProvider.AWS, region=AwsRegion.US_EAST_1),
-        vector_type=VectorType.DENSE
-    )
-dense_idx = pc.Index(name=DENSE_INDEX)
-
-# === Create Sparse Index ===
-if SPARSE_INDEX not in [index.name for index in pc.list_indexes()]:
-    pc.create_index(
-        name=SPARSE_INDEX,
-        metric="dotproduct",
-        spec=ServerlessSpec(cloud=CloudProvider.AWS, region=AwsRegion.US_EAST_1),
-        vector_type=VectorType.SPARSE
-    )
-sparse_idx = pc.Index(name=SPARSE_INDEX)
-
-# Load OpenAI Embeddings
-embedding_model = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
-
-# Download stopwords for category extraction
-nltk.download('stopwords')
-stop_words = set(stopwords.words("english"))
+# Record of which chunks are already embedded and upserted, for incremental runs
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", os.path.join("backend", "ingest_manifest.json"))
+
+# Dense embedding: chunks per embed_documents request and concurrent requests
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+
+# Input corpus
+PDF_FILES = [
+    "data_collection/Grievance-Redressal-Policy.pdf",
+    "data_collection/Policy-for-Selection-of-Directors-and-determining-Directors-Independence.pdf",
+    "data_collection/Remuneration-Policy-for-Directors-Key-Managerial-Personnel-and-other-Employees.pdf",
+    "data_collection/JPSL-Annual-Return-2023-24.pdf",
+]
+JSON_FILES = [
+    "data_collection/helpcentre.json",
+    "data_collection/manual_data_extract.json",
+]
+
+# Marks the end of a stage's output in the streaming pipeline
+STAGE_DONE = object()
+
+# Pinecone, the indexes, the embedding model and the stopword list are set up on first
+# use, so importing this module does no network calls or downloads.
+pc = None
+dense_idx = None
+sparse_idx = None
+embedding_model = None
+stop_words = None
+
+def get_pinecone():
+    global pc
+    if pc is None:
+        pc = Pinecone(api_key=PINECONE_API_KEY)
+    return pc
+
+def ensure_indexes():
+    """
+    Create the dense and sparse indexes if they do not exist yet, and connect to both.
+    """
+    global dense_idx, sparse_idx
+    if dense_idx is not None and sparse_idx is not None:
+        return
+    client = get_pinecone()
+    existing = [index.name for index in client.list_indexes()]
+
+    # === Create Dense Index ===
+    if DENSE_INDEX not in existing:
+        client.create_index(
+            name=DENSE_INDEX,
+            dimension=1536,  # OpenAI embedding dimension
+            spec=ServerlessSpec(cloud=CloudProvider.AWS, region=AwsRegion.US_EAST_1),
+            vector_type=VectorType.DENSE
+        )
+    if dense_idx is None:
+        dense_idx = client.Index(name=DENSE_INDEX)
+
+    # === Create Sparse Index ===
+    if SPARSE_INDEX not in existing:
+        client.create_index(
+            name=SPARSE_INDEX,
+            metric="dotproduct",
+            spec=ServerlessSpec(cloud=CloudProvider.AWS, region=AwsRegion.US_EAST_1),
+            vector_type=VectorType.SPARSE
+        )
+    if sparse_idx is None:
+        sparse_idx = client.Index(name=SPARSE_INDEX)
+
+def get_dense_index():
+    ensure_indexes()
+    return dense_idx
+
+def get_sparse_index():
+    ensure_indexes()
+    return sparse_idx
+
+def get_embedding_model():
+    global embedding_model
+    if embedding_model is None:
+        embedding_model = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+    return embedding_model
+
+def get_stop_words():
+    """English stopwords for category extraction, downloaded on first use."""
+    global stop_words
+    if stop_words is None:
+        nltk.download('stopwords')
+        stop_words = set(stopwords.words("english"))
+    return stop_words
 
 def extract_category(text, max_words=3):
     """
     Extracts category from text by removing stopwords and keeping key words.
     """
     words = re.findall(r'\b\w+\b', text.lower())  # Tokenize words
-    filtered_words = [word for word in words if word not in stop_words]  # Remove stopwords
+    filtered_words = [word for word in words if word not in get_stop_words()]  # Remove stopwords
     return " ".join(filtered_words[:max_words])  # Limit category size
 
+# === Content-Hashed IDs ===
+def chunk_hash(doc):
+    """
+    Stable identity of a chunk: its text plus origin metadata.
+    Unlike positional IDs, it does not change when other chunks are added or reordered.
+    """
+    payload = json.dumps({"text": doc.page_content, "metadata": doc.metadata}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def dense_vector_id(content_hash):
+    return f"doc-{content_hash}"
+
+def sparse_vector_id(content_hash):
+    return f"sparse-doc-{content_hash}"
+
+def corpus_version(content_hashes):
+    """Version stamp that only changes when the set of chunks changes."""
+    return hashlib.sha256("\n".join(sorted(content_hashes)).encode("utf-8")).hexdigest()[:16]
+
 # === Load PDFs & JSON Data ===
-def load_pdfs(pdf_files):
-    documents = []
-    for pdf in pdf_files:
-        loader = PyPDFLoader(pdf)
-        pages = loader.load()
-        for page in pages:
-            documents.append(Document(page_content=page.page_content, metadata={"source": pdf}))
-    return documents
+def iter_pdf_documents(pdf_files, max_workers=None):
+    """
+    Yield one Document per PDF page. Pages are parsed in parallel on a process
+    pool and their text is cached by file hash (see backend.parallel_loader).
+    """
+    for pdf, text in iter_pdf_pages(pdf_files, max_workers=max_workers):
+        yield Document(page_content=text, metadata={"source": pdf})
 
-def load_json(json_files):
-    documents = []
+def iter_json_documents(json_files):
+    """Yield one Document per Q/A pair or page section, streaming records from the scraped JSON files."""
     for json_file in json_files:
-        with open(json_file, "r", encoding="utf-8") as file:
-            data = json.load(file)
-
-        if "content" in data:
-            url = data.get("url", "Unknown URL")
-            for section in data["content"]:
-                section_title = section.get("section", "Unknown Section")
-                for item in section.get("text", []):
+        for layout, url, record in iter_json_records(json_file):
+            if layout == "content":
+                section_title = record.get("section", "Unknown Section")
+                for item in record.get("text", []):
                     question = item.get("question", "")
                     answer = item.get("answer", "")
                     if question or answer:
-                        doc = Document(
+                        yield Document(
                             page_content=f"Q: {question}\nA: {answer}",
                             metadata={"section": section_title, "url": url}
                         )
-                        documents.append(doc)
 
-        elif "pages" in data:
-            for page in data["pages"]:
-                url = page.get("url", "Unknown URL")
-                for item in page.get("content", []):
+            elif layout == "pages":
+                url = record.get("url", "Unknown URL")
+                for item in record.get("content", []):
                     section = item.get("section", "Unknown Section")
                     text = item.get("text", "")
                     if text:
-                        doc = Document(
+                        yield Document(
                             page_content=text,
                             metadata={'section': section, 'url': url}
                         )
-                        documents.append(doc)
-    return documents
+
+def iter_faq_entries(json_files):
+    """Curated help-centre Q/A pairs for the FAQ fast path (see backend.faq_index)."""
+    for json_file in json_files:
+        for layout, url, record in iter_json_records(json_file):
+            if layout != "content":
+                continue
+            section_title = record.get("section", "Unknown Section")
+            for item in record.get("text", []):
+                question = item.get("question", "")
+                answer = item.get("answer", "")
+                if question and answer:
+                    yield {
+                        "question": question,
+                        "answer": answer,
+                        "section": section_title,
+                        "url": url,
+                        "category": extract_category(f"Q: {question}\nA: {answer}")
+                    }
+
+def build_faq_index(json_files, path=FAQ_INDEX_PATH):
+    kept, ambiguous = FaqIndex.build(iter_faq_entries(json_files), path)
+    print(f"Built FAQ index with {kept} questions at {path} ({ambiguous} ambiguous questions left out).")
+
+def load_pdfs(pdf_files):
+    return list(iter_pdf_documents(pdf_files))
+
+def load_json(json_files):
+    return list(iter_json_documents(json_files))
 
 # === Chunk Documents ===
 def chunk_documents(docs, chunk_size=500, chunk_overlap=100):
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     return text_splitter.split_documents(docs)
 
-def prepare_dense_vectors(docs):
-    vectors = []
-    for i, doc in enumerate(docs):
-        dense_embedding = embedding_model.embed_query(doc.page_content)
-        category = extract_category(doc.page_content)
+def iter_chunks(docs, chunk_size=500, chunk_overlap=100):
+    """Streaming chunk_documents: split each document as it arrives."""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for doc in docs:
+        yield from text_splitter.split_documents([doc])
 
-        vectors.append({
-            "id": f"doc-{i}",
-            "values": dense_embedding,
-            "metadata": {
-                "category": category,
-                "source_text": doc.page_content,
-                "origin": json.dumps(doc.metadata)  # Convert to string
-            }
-        })  
-    return vectors
+def flat_metadata(origin):
+    """Scalar origin fields (url, section, source) stored as top-level metadata, so readers need no JSON decoding."""
+    return {key: value for key, value in origin.items() if isinstance(value, (str, int, float, bool))}
 
+def chunk_metadata(doc):
+    return {
+        "category": extract_category(doc.page_content),
+        "source_text": doc.page_content,
+        **flat_metadata(doc.metadata)
+    }
 
+def dense_vector(doc, dense_embedding):
+    return {
+        "id": dense_vector_id(chunk_hash(doc)),
+        "values": dense_embedding,
+        "metadata": chunk_metadata(doc)
+    }
 
+def prepare_dense_vectors(docs, batch_size=EMBED_BATCH_SIZE, max_workers=EMBED_WORKERS):
+    """
+    Embed chunks in batches with `embed_documents` across a bounded worker pool.
+    """
+    texts = [doc.page_content for doc in docs]
+    dense_embeddings, _ = embed_in_batches(get_embedding_model(), texts, batch_size=batch_size, max_workers=max_workers)
+    return [dense_vector(doc, dense_embedding) for doc, dense_embedding in zip(docs, dense_embeddings)]
 
 # === Prepare Sparse Vectors ===
 def get_sparse_embedding(texts, batch_size=96):
@@ -137,7 +261,7 @@ def get_sparse_embedding(texts, batch_size=96):
     for i in range(0, len(texts), batch_size):
         batch_texts = texts[i : i + batch_size]
 
-        response = pc.inference.embed(
+        response = get_pinecone().inference.embed(
             model="pinecone-sparse-english-v0",
             inputs=batch_texts,
             parameters={"input_type": "passage", "return_tokens": False}
@@ -146,61 +270,371 @@ def get_sparse_embedding(texts, batch_size=96):
     
     return sparse_embeddings
 
-def prepare_sparse_vectors(docs):
-    vectors = []
-    texts = [doc.page_content for doc in docs]
-    
-    sparse_embeddings = get_sparse_embedding(texts)
+def sparse_vector(doc, sparse_data):
+    """Sparse index record for a chunk, or None when its sparse vector is empty."""
+    if not sparse_data["sparse_indices"] or not sparse_data["sparse_values"]:
+        return None
+    return {
+        "id": sparse_vector_id(chunk_hash(doc)),
+        "sparse_values": {
+            "indices": sparse_data["sparse_indices"],
+            "values": sparse_data["sparse_values"]
+        },
+        "metadata": chunk_metadata(doc)
+    }
+
+# === Incremental Ingestion ===
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Per index, the chunk hashes already embedded and upserted (hash -> vector id).
+    Returns None when no manifest exists yet.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def delete_vectors(index, ids, batch_size=1000):
+    for i in range(0, len(ids), batch_size):
+        index.delete(ids=ids[i : i + batch_size], namespace=NAMESPACE)
 
-    for i, doc in enumerate(docs):
-        sparse_data = sparse_embeddings[i]
+# === Metadata Migration ===
+def migrate_record_metadata(metadata):
+    """Metadata with the legacy JSON `origin` string replaced by flat fields, or None if already flat."""
+    if "origin" not in metadata:
+        return None
+    metadata = dict(metadata)
+    try:
+        origin = json.loads(metadata.pop("origin"))
+    except (json.JSONDecodeError, TypeError):
+        origin = {}
+    metadata.update(flat_metadata(origin))
+    return metadata
+
+def migrate_metadata(index, batch_size=100):
+    """
+    Rewrite vectors ingested with the JSON `origin` string to flat url/section metadata.
+    Each vector is re-upserted with its own values under the same ID, so nothing is re-embedded
+    and the manifest stays valid. Returns the number of vectors migrated.
+    """
+    migrated = 0
+    for ids in index.list(namespace=NAMESPACE):
+        for i in range(0, len(ids), batch_size):
+            fetched = index.fetch(ids=ids[i : i + batch_size], namespace=NAMESPACE).vectors
+            records = []
+            for vector_id, vector in fetched.items():
+                metadata = migrate_record_metadata(vector.metadata or {})
+                if metadata is None:
+                    continue
+                record = {"id": vector_id, "metadata": metadata}
+                if vector.values:
+                    record["values"] = vector.values
+                if vector.sparse_values:
+                    record["sparse_values"] = {"indices": vector.sparse_values.indices, "values": vector.sparse_values.values}
+                records.append(record)
+            if records:
+                index.upsert(vectors=records, namespace=NAMESPACE)
+                migrated += len(records)
+    return migrated
 
-        if not sparse_data["sparse_indices"] or not sparse_data["sparse_values"]:
-            print(f"Skipping document {i}: Sparse vector is empty.")
+def migrate_local_metadata(path=LOCAL_INDEX_PATH):
+    """Flatten the metadata of a local index built before metadata was flattened."""
+    chunks_path = os.path.join(path, CHUNKS_FILE)
+    with open(chunks_path, "r", encoding="utf-8") as file:
+        chunks = json.load(file)
+    migrated = 0
+    for i, metadata in enumerate(chunks["metadata"]):
+        flat = migrate_record_metadata(metadata)
+        if flat is not None:
+            chunks["metadata"][i] = flat
+            migrated += 1
+    with open(f"{chunks_path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(chunks, file, ensure_ascii=False)
+    os.replace(f"{chunks_path}.tmp", chunks_path)
+    return migrated
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def put_unless_stopped(target_queue, item, stop):
+    """Blocking put that gives up once another stage has failed."""
+    while not stop.is_set():
+        try:
+            target_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
             continue
+    return False
+
+def embed_chunk_batch(batch, progress):
+    """
+    Single pass over a batch of (content hash, chunk, needs dense, needs sparse):
+    embed it once per index that is missing it and build both kinds of records.
+    """
+    dense_docs = [doc for _, doc, needs_dense, _ in batch if needs_dense]
+    sparse_docs = [doc for _, doc, _, needs_sparse in batch if needs_sparse]
+
+    dense_vectors, sparse_ids = [], {}
+    if dense_docs:
+        texts = [doc.page_content for doc in dense_docs]
+        embeddings = embed_batch_with_backoff(get_embedding_model(), texts, progress)
+        dense_vectors = [dense_vector(doc, embedding) for doc, embedding in zip(dense_docs, embeddings)]
+
+    sparse_vectors = []
+    if sparse_docs:
+        for doc, sparse_data in zip(sparse_docs, get_sparse_embedding([doc.page_content for doc in sparse_docs])):
+            vector = sparse_vector(doc, sparse_data)
+            sparse_ids[chunk_hash(doc)] = vector["id"] if vector else None
+            if vector:
+                sparse_vectors.append(vector)
+
+    dense_ids = {chunk_hash(doc): dense_vector_id(chunk_hash(doc)) for doc in dense_docs}
+    return dense_vectors, sparse_vectors, dense_ids, sparse_ids
+
+def ingest_incremental(docs, manifest_path=MANIFEST_PATH, full=False,
+                       batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS, queue_size=4,
+                       router_level=None, router_path=QUERY_ROUTER_FILE):
+    """
+    Streaming, incremental ingestion into both Pinecone indexes.
+
+    `docs` may be any iterable of chunks (e.g. iter_chunks over the loaders), and is
+    consumed lazily: load/chunk, embed and upsert run as overlapping stages joined by
+    bounded queues, so memory stays flat regardless of corpus size. Each chunk is
+    embedded for the dense and the sparse index in the same pass.
+
+    Only chunks that are new or changed since the last run (per the manifest) are
+    embedded and upserted, and vectors whose source chunk disappeared are deleted.
+    Without a manifest (or with `full`), the namespace is cleared first so vectors
+    under old IDs do not linger. Returns the corpus version of `docs`.
+
+    With `router_level`, the query router is kept up to date from the same vectors:
+    upserted chunks are added to its per-route sums and deleted ones subtracted, so an
+    unchanged run does not touch it (see backend.query_router.RouteSums).
+    """
+    manifest = None if full else load_manifest(manifest_path)
+    if manifest is None:
+        print("No ingestion manifest: clearing both indexes for a full rebuild.")
+        for index in (get_dense_index(), get_sparse_index()):
+            try:
+                index.delete(delete_all=True, namespace=NAMESPACE)
+            except Exception as e:
+                print(f"Namespace not cleared ({e}); it may not exist yet.")
+        manifest = {"dense": {}, "sparse": {}}
+        save_manifest(manifest, manifest_path)
+        route_sums = RouteSums(router_level) if router_level else None
+    else:
+        route_sums = load_route_sums(router_level, router_path) if router_level else None
+    router_changed = False
+
+    seen = set()
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    vector_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    progress = EmbeddingProgress(None)
 
-        category = extract_category(doc.page_content)
-
-        vectors.append({
-            "id": f"sparse-doc-{i}",
-            "sparse_values": {
-                "indices": sparse_data["sparse_indices"],
-                "values": sparse_data["sparse_values"]
-            },
-            "metadata": {
-                "category": category,
-                "source_text": doc.page_content,
-                "origin": json.dumps(doc.metadata)  # Convert to string
-            }
-        })
-    return vectors
-
-# === Ingest Data ===
-def ingest_dense_vectors(docs, batch_size=50):
+    def pending_chunks():
+        for doc in docs:
+            content_hash = chunk_hash(doc)
+            if content_hash in seen:  # Exact duplicate chunk
+                continue
+            seen.add(content_hash)
+            needs_dense = content_hash not in manifest["dense"]
+            needs_sparse = content_hash not in manifest["sparse"]
+            if needs_dense or needs_sparse:
+                yield content_hash, doc, needs_dense, needs_sparse
+
+    def load_stage():
+        try:
+            for batch in iter_batches(pending_chunks(), batch_size):
+                if not put_unless_stopped(chunk_queue, batch, stop):
+                    return
+        except Exception:
+            stop.set()
+            raise
+        finally:
+            for _ in range(workers):
+                put_unless_stopped(chunk_queue, STAGE_DONE, stop)
+
+    def embed_stage():
+        try:
+            while not stop.is_set():
+                try:
+                    batch = chunk_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if batch is STAGE_DONE:
+                    return
+                if not put_unless_stopped(vector_queue, embed_chunk_batch(batch, progress), stop):
+                    return
+        except Exception:
+            stop.set()
+            raise
+        finally:
+            put_unless_stopped(vector_queue, STAGE_DONE, stop)
+
+    with ThreadPoolExecutor(max_workers=workers + 1, thread_name_prefix="ingest") as pool:
+        stages = [pool.submit(load_stage)] + [pool.submit(embed_stage) for _ in range(workers)]
+        try:
+            # Upsert stage runs here, as batches come off the embedders
+            finished, upserted = 0, {"dense": 0, "sparse": 0}
+            while finished < workers:
+                try:
+                    item = vector_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():  # A stage failed
+                        break
+                    continue
+                if item is STAGE_DONE:
+                    finished += 1
+                    continue
+                dense_vectors, sparse_vectors, dense_ids, sparse_ids = item
+                if dense_vectors:
+                    get_dense_index().upsert(vectors=dense_vectors, namespace=NAMESPACE)
+                    if route_sums is not None:
+                        for vector in dense_vectors:
+                            route_sums.add(vector["values"], vector["metadata"])
+                        router_changed = True
+                if sparse_vectors:
+                    get_sparse_index().upsert(vectors=sparse_vectors, namespace=NAMESPACE)
+                upserted["dense"] += len(dense_vectors)
+                upserted["sparse"] += len(sparse_vectors)
+                manifest["dense"].update(dense_ids)
+                manifest["sparse"].update(sparse_ids)
+                save_manifest(manifest, manifest_path)
+                if dense_vectors and route_sums is not None:
+                    save_route_sums(route_sums, router_path)
+                print(f"Upserted {upserted['dense']} dense / {upserted['sparse']} sparse vectors so far {progress.rates()}")
+        finally:
+            stop.set()
+        for stage in stages:
+            stage.result()  # Re-raise the first stage failure
+
+    for name, index in (("dense", get_dense_index()), ("sparse", get_sparse_index())):
+        known = manifest[name]
+        removed = [content_hash for content_hash in known if content_hash not in seen]
+        if removed:
+            ids = [known[content_hash] for content_hash in removed if known[content_hash]]
+            if name == "dense" and route_sums is not None:
+                # Only the deleted vectors are fetched, to take them out of the router
+                for values, metadata in fetch_vectors(index, ids):
+                    route_sums.remove(values, metadata)
+                router_changed = True
+            delete_vectors(index, ids)
+            for content_hash in removed:
+                del known[content_hash]
+            save_manifest(manifest, manifest_path)
+            if name == "dense" and route_sums is not None:
+                save_route_sums(route_sums, router_path)
+        print(f"{name.capitalize()} index: {upserted[name]} upserted, {len(removed)} removed, {len(known)} total.")
+
+    if router_level:
+        if route_sums is None:
+            # No router with running sums at this level yet: read the index back once
+            build_query_router(iter_index_vectors(get_dense_index()), router_level, router_path)
+        elif router_changed:
+            print(f"Updated query router at {router_path}.")
+        else:
+            print("Query router unchanged.")
+
+    return corpus_version(seen)
+
+# === Query Router ===
+def fetch_vectors(index, ids, batch_size=100):
+    """(values, metadata) of the vectors with `ids` in a Pinecone index, fetched in batches."""
+    for i in range(0, len(ids), batch_size):
+        for vector in index.fetch(ids=ids[i : i + batch_size], namespace=NAMESPACE).vectors.values():
+            yield vector.values, vector.metadata or {}
+
+def iter_index_vectors(index, batch_size=100):
+    """(values, metadata) of every vector in a Pinecone index, listed and fetched in batches."""
+    for ids in index.list(namespace=NAMESPACE):
+        yield from fetch_vectors(index, ids, batch_size)
+
+def load_route_sums(level, path=QUERY_ROUTER_FILE):
+    """The running sums saved with the router at `path`, or None when there are none for `level`."""
+    if not os.path.exists(path):
+        return None
+    route_sums = QueryRouter.load(path).route_sums
+    return route_sums if route_sums is not None and route_sums.level == level else None
+
+def save_route_sums(route_sums, path=QUERY_ROUTER_FILE):
+    """Write the router for the current `route_sums` (none while no chunk is left)."""
+    if any(count > 0 for count in route_sums.counts.values()):
+        route_sums.router().save(path)
+
+def build_query_router(chunks, level="section", path=QUERY_ROUTER_FILE):
+    """
+    Write the router hybrid_search uses to restrict queries to one section or document family
+    (see backend.query_router), from (dense vector, metadata) pairs of the ingested chunks.
+    """
+    router = QueryRouter.build(chunks, level)
+    router.save(path)
+    print(f"Built query router with {len(router)} routes at {path}: "
+          + ", ".join(f"{name} ({count})" for name, count in zip(router.names, router.counts)))
+
+def ingest_local_index(docs, path=LOCAL_INDEX_PATH, ivf_lists=None):
+    """
+    Build the in-process index used by context_retrival when RETRIEVER_BACKEND=local.
+    """
     vectors = prepare_dense_vectors(docs)
-    for i in range(0, len(vectors), batch_size):
-        batch = vectors[i : i + batch_size]
-        dense_idx.upsert(vectors=batch, namespace="chatbot-namespace")
-        print(f"Ingested batch {i // batch_size + 1} ({len(batch)} vectors) into Dense Index.")
-
-def ingest_sparse_vectors(docs, batch_size=50):
-    vectors = prepare_sparse_vectors(docs)
-    for i in range(0, len(vectors), batch_size):
-        batch = vectors[i : i + batch_size]
-        sparse_idx.upsert(vectors=batch, namespace="chatbot-namespace")
-        print(f"Ingested batch {i // batch_size + 1} ({len(batch)} vectors) into Sparse Index.")
+    index = LocalIndex.build(vectors, path, ivf_lists=ivf_lists)
+    print(f"Built local index with {len(index)} chunks at {path}.")
+    return index
 
 # === Main Execution ===
+# Run from the repository root: python -m backend.data_injestion
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the JioPay corpus into the retrieval backend.")
+    parser.add_argument("--backend", choices=["pinecone", "local"], default="pinecone")
+    parser.add_argument("--local-index", default=LOCAL_INDEX_PATH, help="Output directory for --backend local")
+    parser.add_argument("--ivf-lists", type=int, default=None, help="Cluster the local dense index into N lists")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and rebuild the Pinecone indexes")
+    parser.add_argument("--migrate-metadata", action="store_true",
+                        help="Flatten the JSON origin metadata of already ingested vectors, then exit")
+    parser.add_argument("--faq-only", action="store_true", help="Only rebuild the FAQ fast-path index, then exit")
+    parser.add_argument("--router-level", choices=["family", "section"], default="section",
+                        help="Route queries to individual sections/pages/PDFs or to document families")
+    args = parser.parse_args()
+
+    if args.migrate_metadata:
+        if args.backend == "local":
+            print(f"Migrated {migrate_local_metadata(args.local_index)} local chunks.")
+        else:
+            for name, index in (("dense", get_dense_index()), ("sparse", get_sparse_index())):
+                print(f"Migrated {migrate_metadata(index)} vectors in the {name} index.")
+        raise SystemExit(0)
+
+    # Curated Q/A pairs for the FAQ fast path in response_manager
+    build_faq_index(JSON_FILES)
+    if args.faq_only:
+        raise SystemExit(0)
+
     nltk.download("punkt")
 
-    # Load and chunk data
-    raw_docs = load_pdfs(["data_collection/Grievance-Redressal-Policy.pdf","data_collection\Policy-for-Selection-of-Directors-and-determining-Directors-Independence.pdf","data_collection\Remuneration-Policy-for-Directors-Key-Managerial-Personnel-and-other-Employees.pdf","data_collection\JPSL-Annual-Return-2023-24.pdf"]) + load_json([
-        "data_collection/helpcentre.json",
-        "data_collection/manual_data_extract.json"
-    ])
-    chunked_docs = chunk_documents(raw_docs)
+    # Load and chunk data lazily; nothing below holds the whole corpus except the local index build
+    chunks = iter_chunks(itertools.chain(iter_pdf_documents(PDF_FILES), iter_json_documents(JSON_FILES)))
+
+    if args.backend == "local":
+        chunked_docs = list(chunks)
+        local_index = ingest_local_index(chunked_docs, args.local_index, args.ivf_lists)
+        version = corpus_version(chunk_hash(doc) for doc in chunked_docs)
+        build_query_router(zip(local_index.dense, local_index.metadata), args.router_level)
+    else:
+        # Ingest Data into Pinecone, embedding only what changed since the last run
+        version = ingest_incremental(chunks, full=args.full, router_level=args.router_level)
 
-    # Ingest Data into Pinecone
-    ingest_dense_vectors(chunked_docs)
-    ingest_sparse_vectors(chunked_docs)
+    # Stamp the new corpus so cached answers from the previous one are flushed
+    write_corpus_version(version)
@@ -0,0 +1,188 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_query(text):
+    """
+    Cache key for a query: case, surrounding whitespace, repeated spaces and
+    trailing punctuation do not change what the user asked.
+    """
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" ?!.")
+
+
+class SqliteEmbeddingStore:
+    """
+    On-disk backend so cached embeddings survive restarts.
+    Each entry is a tuple of 1-D NumPy arrays stored as raw bytes, with their
+    dtypes and lengths kept alongside so they can be rebuilt without copying.
+    """
+
+    def __init__(self, path, namespace):
+        self.path = path
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "namespace TEXT, key TEXT, created_at REAL, layout TEXT, payload BLOB, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self.conn.commit()
+
+    def get(self, key, ttl=None):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT created_at, layout, payload FROM embeddings WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+        if row is None:
+            return None
+        created_at, layout, payload = row
+        if ttl is not None and time.time() - created_at > ttl:
+            self.delete(key)
+            return None
+
+        arrays, offset = [], 0
+        for dtype, length in json.loads(layout):
+            array = np.frombuffer(payload, dtype=dtype, count=length, offset=offset)
+            arrays.append(array)
+            offset += array.nbytes
+        return created_at, tuple(arrays)
+
+    def put(self, key, arrays, created_at):
+        layout = json.dumps([[array.dtype.str, len(array)] for array in arrays])
+        payload = b"".join(array.tobytes() for array in arrays)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, created_at, layout, payload),
+            )
+            self.conn.commit()
+
+    def delete(self, key):
+        with self.lock:
+            self.conn.execute("DELETE FROM embeddings WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM embeddings WHERE namespace = ?", (self.namespace,))
+            self.conn.commit()
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache of query embeddings keyed by normalized query text.
+
+    Values are tuples of compact NumPy arrays (float32 for dense vectors, uint32
+    indices + float32 values for sparse vectors). Entries older than `ttl`
+    seconds are treated as misses. With `path`, a sqlite store backs the
+    in-memory LRU and is consulted on a memory miss.
+    """
+
+    def __init__(self, name, max_size=1024, ttl=None, path=None):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.store = SqliteEmbeddingStore(path, name) if path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text):
+        key = normalize_query(text)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                created_at, arrays = entry
+                if self.ttl is None or now - created_at <= self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return arrays
+                del self.entries[key]
+
+        if self.store is not None:
+            stored = self.store.get(key, self.ttl)
+            if stored is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                    self._insert(key, stored)
+                return stored[1]
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, text, arrays):
+        key = normalize_query(text)
+        created_at = time.time()
+        with self.lock:
+            self._insert(key, (created_at, arrays))
+        if self.store is not None:
+            self.store.put(key, arrays, created_at)
+
+    def get_or_compute(self, text, compute):
+        """Return the cached arrays for `text`, computing and caching them on a miss."""
+        arrays = self.get(text)
+        if arrays is None:
+            arrays = compute(text)
+            self.put(text, arrays)
+        return arrays
+
+    def get_or_compute_many(self, texts, compute_many):
+        """
+        Batch form of `get_or_compute`: `compute_many(missing texts)` runs once for every
+        text not in the cache (each normalized query at most once) and returns their arrays in order.
+        """
+        found = {}
+        missing = {}
+        for text in texts:
+            key = normalize_query(text)
+            if key in found or key in missing:
+                continue
+            arrays = self.get(text)
+            if arrays is None:
+                missing[key] = text
+            else:
+                found[key] = arrays
+        if missing:
+            for (key, text), arrays in zip(missing.items(), compute_many(list(missing.values()))):
+                self.put(text, arrays)
+                found[key] = arrays
+        return [found[normalize_query(text)] for text in texts]
+
+    def _insert(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self.entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
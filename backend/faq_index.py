@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import threading
+import numpy as np
+from backend.local_index import tokenize
+from backend.text_similarity import MinHasher, char_shingles, jaccard
+
+# Curated help-centre Q/A pairs, written by data_injestion at every ingestion run
+FAQ_INDEX_PATH = os.getenv("FAQ_INDEX_PATH", os.path.join("backend", "faq_index.json"))
+
+# Character n-gram size for fuzzy matching, and how many MinHash candidates get an exact Jaccard check
+FAQ_NGRAM_SIZE = 3
+FAQ_CANDIDATES = 3
+
+# Conversational words a fuzzy match may add or drop ("Hi, please tell me ...") without changing the question
+FAQ_FILLER_WORDS = frozenset({"hi", "hello", "hey", "please", "kindly", "tell", "me", "quick", "question", "thanks"})
+
+minhasher = MinHasher(num_perm=64, shingle_size=FAQ_NGRAM_SIZE, char_level=True)
+
+
+def question_key(text):
+    """Exact-match key: lowercase words only, so case, spacing and punctuation do not matter."""
+    return " ".join(tokenize(text))
+
+
+def one_typo_apart(a, b):
+    """Whether `a` becomes `b` by one inserted, deleted, substituted or swapped character."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diffs) == 1 or (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                                   and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    i = next((i for i in range(len(shorter)) if shorter[i] != longer[i]), len(shorter))
+    return shorter[i:] == longer[i + 1:]
+
+
+def covered(token, tokens):
+    """
+    Whether `token` appears in `tokens`, allowing a typo in longer words. Short words and
+    words with digits must match exactly: "no"/"on" or "P2M"/"P2PM" differ by one character.
+    """
+    if token in tokens or token in FAQ_FILLER_WORDS:
+        return True
+    if len(token) < 4 or any(char.isdigit() for char in token):
+        return False
+    return any(one_typo_apart(token, other) for other in tokens)
+
+
+def terms(text):
+    """Words of `text`, with digit grouping removed so "1,00,000" and "100000" are one number."""
+    return set(tokenize(re.sub(r"(?<=\d)[,.](?=\d{2})", "", text)))
+
+
+def same_terms(query, question):
+    """Whether every word of each text is in the other, up to typos and filler words."""
+    query_tokens, question_tokens = terms(query), terms(question)
+    return all(covered(token, question_tokens) for token in query_tokens) and \
+        all(covered(token, query_tokens) for token in question_tokens)
+
+
+class FaqIndex:
+    """
+    Answers questions that match a curated FAQ question without retrieval or the LLM.
+
+    Exact matches are a dict lookup on the normalized question. Otherwise the
+    character-trigram MinHash signature of the query is compared with every FAQ
+    signature in one vectorized pass; the best candidates are confirmed with the
+    exact trigram Jaccard similarity, which must reach `threshold`, and must use the
+    same words as the FAQ question up to typos (see `same_terms`): trigram overlap alone
+    stays high when a single word changes the meaning ("P2M"/"P2PM", "credited"/"debited").
+    Questions that appear with different answers are left out, since either answer could be wrong.
+    """
+
+    def __init__(self, entries, threshold=0.8):
+        self.threshold = threshold
+        self.entries = entries
+        self.exact = {question_key(entry["question"]): i for i, entry in enumerate(entries)}
+        self.shingle_sets = [char_shingles(entry["question"], FAQ_NGRAM_SIZE) for entry in entries]
+        self.signatures = np.stack([minhasher.signature(entry["question"]) for entry in entries]) if entries else None
+        self.lock = threading.Lock()
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.term_mismatches = 0
+
+    @classmethod
+    def load(cls, path=FAQ_INDEX_PATH, threshold=0.8):
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(json.load(file)["entries"], threshold)
+
+    @staticmethod
+    def build(entries, path=FAQ_INDEX_PATH):
+        """
+        Write the FAQ index for `entries` ({"question", "answer", "section", "url", "category"}).
+        Returns (questions kept, questions dropped as ambiguous).
+        """
+        answers, kept = {}, {}
+        for entry in entries:
+            key = question_key(entry["question"])
+            answers.setdefault(key, set()).add(entry["answer"].strip())
+            kept.setdefault(key, entry)
+        ambiguous = {key for key, texts in answers.items() if len(texts) > 1}
+        kept = [entry for key, entry in kept.items() if key not in ambiguous]
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump({"entries": kept}, file, ensure_ascii=False, indent=1)
+        os.replace(f"{path}.tmp", path)
+        return len(kept), len(ambiguous)
+
+    def match(self, query):
+        """(entry, similarity, "exact" | "fuzzy") for the FAQ `query` asks, or None."""
+        i = self.exact.get(question_key(query))
+        if i is not None:
+            with self.lock:
+                self.exact_hits += 1
+            return self.entries[i], 1.0, "exact"
+
+        best, best_score, mismatched = None, 0.0, False
+        if self.signatures is not None:
+            estimates = (self.signatures == minhasher.signature(query)).mean(axis=1)
+            query_shingles = char_shingles(query, FAQ_NGRAM_SIZE)
+            for candidate in np.argsort(-estimates)[:FAQ_CANDIDATES]:
+                score = jaccard(query_shingles, self.shingle_sets[candidate])
+                if score < self.threshold or score <= best_score:
+                    continue
+                if same_terms(query, self.entries[candidate]["question"]):
+                    best, best_score = candidate, score
+                else:
+                    mismatched = True
+        with self.lock:
+            if best is not None:
+                self.fuzzy_hits += 1
+                return self.entries[best], best_score, "fuzzy"
+            self.misses += 1
+            self.term_mismatches += mismatched
+        return None
+
+    def answer(self, query):
+        """{"response", "sources"} with the curated answer (same shape as a generated one), or None."""
+        matched = self.match(query)
+        if matched is None:
+            return None
+        entry, score, _ = matched
+        return {
+            "response": entry["answer"],
+            "sources": [{
+                "category": entry.get("category", ""),
+                "url": entry.get("url", ""),
+                "section": entry.get("section", ""),
+                "score": round(score, 4)
+            }]
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.exact_hits + self.fuzzy_hits + self.misses
+            return {
+                "size": len(self.entries),
+                "exact_hits": self.exact_hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "misses": self.misses,
+                "term_mismatches": self.term_mismatches,
+                "hit_rate": round((self.exact_hits + self.fuzzy_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+faq_index = None
+faq_index_mtime = None
+faq_lock = threading.Lock()
+
+
+def get_faq_index(threshold=0.8, path=FAQ_INDEX_PATH):
+    """
+    The FAQ index at `path`, loaded on first use and reloaded when ingestion rewrites it.
+    None when no FAQ index has been built.
+    """
+    global faq_index, faq_index_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with faq_lock:
+        if faq_index is None or mtime != faq_index_mtime:
+            faq_index = FaqIndex.load(path, threshold)
+            faq_index_mtime = mtime
+        return faq_index
@@ -0,0 +1,126 @@
+import hashlib
+import numpy as np
+
+# Constant from the original RRF paper; damps the influence of top ranks
+RRF_K = 60
+DEFAULT_METHOD = "rrf"
+
+
+def chunk_key(match):
+    """
+    Identity of the chunk behind a match.
+    Dense and sparse vectors for the same chunk carry different IDs ("doc-{i}" /
+    "sparse-doc-{i}"), so the chunk text is the reliable key; the ID is the fallback.
+    """
+    metadata = match.get("metadata") or {}
+    source_text = metadata.get("source_text")
+    if source_text:
+        return hashlib.sha1(source_text.encode("utf-8")).hexdigest()
+    return match.get("id")
+
+
+def build_candidates(ranked_lists):
+    """
+    Collect the unique chunks across all ranked lists.
+    Returns the representative match per chunk plus (n_lists, n_chunks) matrices of
+    raw scores and 1-based ranks, with NaN where a list did not return the chunk.
+    """
+    keys = {}
+    representatives = []
+    for matches in ranked_lists:
+        for match in matches:
+            key = chunk_key(match)
+            if key not in keys:
+                keys[key] = len(representatives)
+                representatives.append(match)
+
+    scores = np.full((len(ranked_lists), len(representatives)), np.nan, dtype=np.float64)
+    ranks = np.full_like(scores, np.nan)
+    for row, matches in enumerate(ranked_lists):
+        for rank, match in enumerate(matches, start=1):
+            col = keys[chunk_key(match)]
+            # Keep the best (first) occurrence if a list repeats a chunk
+            if np.isnan(scores[row, col]):
+                scores[row, col] = match.get("score", 0.0)
+                ranks[row, col] = rank
+    return representatives, scores, ranks
+
+
+def min_max(scores):
+    """Scale each list's scores into [0, 1]; missing entries stay NaN."""
+    low = np.nanmin(scores, axis=1, keepdims=True)
+    high = np.nanmax(scores, axis=1, keepdims=True)
+    span = high - low
+    # A list with a single distinct score maps every hit to 1.0
+    safe_span = np.where(span > 0, span, 1.0)
+    return np.where(span > 0, (scores - low) / safe_span, np.where(np.isnan(scores), np.nan, 1.0))
+
+
+def rrf_scores(scores, ranks, weights, k=RRF_K):
+    """Reciprocal rank fusion, scaled so a chunk ranked first everywhere scores 1.0."""
+    contributions = np.where(np.isnan(ranks), 0.0, 1.0 / (k + np.nan_to_num(ranks)))
+    fused = (weights[:, None] * contributions).sum(axis=0)
+    return fused / (weights.sum() / (k + 1))
+
+
+def minmax_scores(scores, ranks, weights):
+    """Mean of per-list min-max normalized scores; missing hits count as 0."""
+    normalized = np.nan_to_num(min_max(scores), nan=0.0)
+    return (weights[:, None] * normalized).sum(axis=0) / weights.sum()
+
+
+FUSION_METHODS = {
+    "rrf": rrf_scores,
+    "minmax": minmax_scores,
+}
+
+
+def fuse(ranked_lists, top_k=5, method=DEFAULT_METHOD, weights=None, alpha=None, names=None):
+    """
+    Fuse several ranked match lists into one deduplicated top-k list.
+
+    method:  "rrf" (reciprocal rank fusion) or "minmax" (normalized score blending).
+    weights: per-list weights; defaults to equal weighting.
+    alpha:   shorthand for two lists, weighting them alpha / (1 - alpha).
+    names:   labels for the lists, used to report each chunk's raw per-index score.
+
+    Returns plain dicts with `id`, `metadata`, the fused `score` in [0, 1] and
+    `index_scores` holding the raw score from every list that returned the chunk.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}'. Choose from {sorted(FUSION_METHODS)}")
+
+    ranked_lists = [list(matches) for matches in ranked_lists]
+    names = names or [f"list-{i}" for i in range(len(ranked_lists))]
+    if alpha is not None:
+        weights = [alpha, 1.0 - alpha]
+    weights = weights if weights is not None else [1.0] * len(ranked_lists)
+
+    # Lists that returned nothing (e.g. a timed-out branch) take no part in fusion
+    kept = [i for i, matches in enumerate(ranked_lists) if matches]
+    if not kept:
+        return []
+    ranked_lists = [ranked_lists[i] for i in kept]
+    names = [names[i] for i in kept]
+    weights = np.asarray([weights[i] for i in kept], dtype=np.float64)
+
+    representatives, scores, ranks = build_candidates(ranked_lists)
+
+    fused = FUSION_METHODS[method](scores, ranks, weights)
+    # Stable sort keeps the earlier list's order on ties
+    order = np.argsort(-fused, kind="stable")[:top_k]
+
+    results = []
+    for col in order:
+        match = representatives[col]
+        results.append({
+            "id": match.get("id"),
+            "score": round(float(fused[col]), 4),
+            "metadata": match.get("metadata") or {},
+            "index_scores": {
+                name: float(scores[row, col])
+                for row, name in enumerate(names)
+                if not np.isnan(scores[row, col])
+            },
+        })
+    return results
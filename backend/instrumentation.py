@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Record stage timings into the histogram registry
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "false").lower() == "true"
+# Also emit every span as a JSON log line on the "backend.trace" logger
+INSTRUMENTATION_LOG = os.getenv("INSTRUMENTATION_LOG", "false").lower() == "true"
+
+# Prometheus' default latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, 30.0)
+
+STAGE_METRIC = "rag_stage_seconds"
+
+logger = logging.getLogger("backend.trace")
+
+# Spans of the request being traced by `collect_timings`, if any
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count for each label set of one metric."""
+
+    def __init__(self, name, description, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {}  # sorted label items -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def snapshot(self, labels):
+        """{"count", "sum"} for one label set (zeros if never observed)."""
+        with self.lock:
+            series = self.series.get(tuple(sorted(labels.items())))
+        if series is None:
+            return {"count": 0, "sum": 0.0}
+        return {"count": sum(series[:-1]), "sum": series[-1]}
+
+    def export(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {key: list(values) for key, values in self.series.items()}
+        for key, values in sorted(series.items()):
+            labels = ",".join(f'{name}="{value}"' for name, value in key)
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], values[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process histograms, exported in the Prometheus text format."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, name, description=""):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(name, description)
+            return histogram
+
+    def export_prometheus(self):
+        with self.lock:
+            histograms = list(self.histograms.values())
+        return "\n".join(line for histogram in histograms for line in histogram.export()) + "\n"
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+registry = MetricsRegistry()
+
+
+class Span:
+    """An active span; `set` adds labels (e.g. the outcome) before it ends."""
+
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.start = time.perf_counter()
+
+    def set(self, **labels):
+        self.labels.update(labels)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.labels.setdefault("outcome", "error")
+        record(self.name, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class NoopSpan:
+    __slots__ = ()
+
+    def set(self, **labels):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def span(name, **labels):
+    """
+    Time a pipeline stage: `with span("dense_embed"): ...`. Labels become histogram
+    labels, so keep their values low-cardinality (provider names, index names, outcomes).
+    When instrumentation is off and no request is being traced this returns a shared no-op.
+    """
+    if not INSTRUMENTATION_ENABLED and current_trace.get() is None:
+        return NOOP_SPAN
+    return Span(name, labels)
+
+
+def record(name, seconds, labels=None):
+    """Record a finished span (for stages timed without a `with` block)."""
+    labels = labels or {}
+    if INSTRUMENTATION_ENABLED:
+        registry.histogram(STAGE_METRIC, "Time spent in each RAG pipeline stage").observe({"stage": name, **labels}, seconds)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.append({"stage": name, **labels, "seconds": round(seconds, 6)})
+    if INSTRUMENTATION_LOG:
+        logger.info(json.dumps({"span": name, **labels, "seconds": round(seconds, 6)}))
+
+
+def annotate(name, **fields):
+    """Attach non-timing facts (e.g. token counts) to the traced request and the span log."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.append({"stage": name, **fields})
+    if INSTRUMENTATION_LOG:
+        logger.info(json.dumps({"span": name, **fields}))
+
+
+@contextmanager
+def collect_timings():
+    """Collect the spans recorded by this request (including in pool threads started with `submit`)."""
+    trace = []
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+
+
+def submit(pool, function, *args):
+    """`pool.submit` that carries the caller's trace into the worker thread."""
+    return pool.submit(contextvars.copy_context().run, function, *args)
@@ -0,0 +1,275 @@
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from http.client import RemoteDisconnected
+import urllib3
+from backend.instrumentation import span, record, submit
+
+# Errors worth retrying on the same provider; anything else moves on to the next one
+NETWORK_ERRORS = (RemoteDisconnected, urllib3.exceptions.ProtocolError, ConnectionError, TimeoutError)
+
+# Seconds between checks on a provider call still waiting for a dispatch worker (its hedge budget starts once it runs)
+QUEUED_POLL_INTERVAL = 0.05
+
+
+def backoff_delay(attempt, base_delay, max_delay=10.0):
+    """Exponential backoff with full jitter: uniform in [0, base * 2^(attempt - 1)], capped."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Skips a provider after `failure_threshold` consecutive failures. Once
+    `reset_timeout` seconds have passed, one trial request is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def abandon_trial(self):
+        """Give back a trial request that ended without an outcome (cancelled before it finished)."""
+        with self.lock:
+            self.trial_in_flight = False
+
+
+class Attempt:
+    """One provider call launched by `HedgedDispatcher.dispatch`."""
+
+    def __init__(self, name):
+        self.name = name
+        # Set by the worker thread once the call actually starts (not when it is queued)
+        self.started = None
+        self.cancelled = threading.Event()
+
+
+class LatencyTracker:
+    """
+    Rolling window of successful call latencies. The provider's hedging budget is
+    its p95 latency, capped at `max_budget` (also used until enough samples exist)
+    so a provider with a heavy tail cannot push its own budget up to the tail.
+    """
+
+    def __init__(self, max_budget, window=50, min_samples=5):
+        self.max_budget = max_budget
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def p95(self):
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def budget(self):
+        p95 = self.p95()
+        return self.max_budget if p95 is None else min(p95, self.max_budget)
+
+
+class HedgedDispatcher:
+    """
+    Dispatches a prompt across LLM providers in preference order.
+
+    The first healthy provider is started. If it has not answered within its
+    hedging budget (its observed p95 latency, at most `hedge_budget`), the next provider is started as
+    well and whichever valid answer arrives first wins. A provider that fails
+    hands over immediately, and one that exceeds `provider_deadline` is abandoned.
+    Budgets and deadlines count from when a worker starts the call, not from when it
+    was queued, and calls still running or queued once the dispatch ends are cancelled.
+    Network errors are retried on the same provider with jittered exponential
+    backoff. Providers whose circuit breaker is open are skipped.
+
+    `providers` is a list of (name, function) where the function takes a prompt and
+    returns the answer text, or None / an "Error..." string on failure.
+    """
+
+    def __init__(self, providers, hedge_budget=4.0, provider_deadline=20.0, total_deadline=30.0,
+                 max_retries=3, base_delay=0.5, failure_threshold=3, reset_timeout=30.0, max_workers=16):
+        self.providers = list(providers)
+        self.provider_deadline = provider_deadline
+        self.total_deadline = total_deadline
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.breakers = {name: CircuitBreaker(failure_threshold, reset_timeout) for name, _ in self.providers}
+        self.latency = {name: LatencyTracker(hedge_budget) for name, _ in self.providers}
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-dispatch")
+        self.hedges = 0
+
+    def call_with_retries(self, name, function, prompt, max_retries, base_delay, deadline, run=None):
+        """
+        Runs one provider, retrying network errors. Returns the answer or None; never raises.
+        With `run` (an Attempt), records when the call starts and stops retrying once it is
+        cancelled; a cancelled call that fails leaves the breaker to the dispatcher.
+        """
+        if run is not None:
+            run.started = time.monotonic()
+        for attempt in range(1, max_retries + 1):
+            start = time.monotonic()
+            try:
+                with span("llm_attempt", provider=name) as attempt_span:
+                    try:
+                        response = function(prompt)
+                    except NETWORK_ERRORS:
+                        attempt_span.set(outcome="network_error")
+                        raise
+                    attempt_span.set(outcome="ok" if response and not response.startswith("Error") else "no_answer")
+                if response and not response.startswith("Error"):
+                    self.latency[name].record(time.monotonic() - start)
+                    self.breakers[name].record_success()
+                    return response
+                print(f"❌ {name} returned no answer.")
+                break
+            except NETWORK_ERRORS as net_err:
+                delay = backoff_delay(attempt, base_delay)
+                if attempt == max_retries or time.monotonic() + delay >= deadline or (run is not None and run.cancelled.is_set()):
+                    print(f"❌ {name} failed due to network error: {net_err}.")
+                    break
+                print(f"❌ {name} failed due to network error: {net_err}. Retrying in {delay:.2f} sec...")
+                time.sleep(delay)
+            except Exception as e:
+                print(f"❌ {name} failed: {str(e)}.")
+                break
+        if run is not None and run.cancelled.is_set():
+            self.breakers[name].abandon_trial()
+        else:
+            self.breakers[name].record_failure()
+        return None
+
+    def dispatch(self, prompt, max_retries=None, base_delay=None):
+        if not self.providers:
+            return "Error: No valid LLM API keys provided."
+        max_retries = self.max_retries if max_retries is None else max_retries
+        base_delay = self.base_delay if base_delay is None else base_delay
+        started_at = time.monotonic()
+        deadline = started_at + self.total_deadline
+
+        queue = list(self.providers)
+        # Every circuit open: try them all anyway rather than fail outright
+        ignore_breakers = all(self.breakers[name].state == "open" for name, _ in queue)
+
+        pending = {}  # future -> Attempt
+        launched = []
+
+        def launch(reason=""):
+            while queue:
+                name, function = queue.pop(0)
+                if not ignore_breakers and not self.breakers[name].allow():
+                    print(f"⏭ Skipping {name}: circuit open")
+                    continue
+                print(f"⚡ Trying {name}{reason}")
+                run = Attempt(name)
+                future = submit(self.pool, self.call_with_retries, name, function, prompt, max_retries, base_delay, deadline, run)
+                pending[future] = run
+                launched.append(run)
+                return True
+            return False
+
+        def cancel_pending():
+            """Stop the calls still out: queued ones never run, running ones stop retrying."""
+            for future, run in pending.items():
+                run.cancelled.set()
+                if future.cancel():
+                    # Never started, so it has no outcome to report; give back a half-open trial
+                    self.breakers[run.name].abandon_trial()
+            pending.clear()
+
+        launch()
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+
+            # Wake up for the earliest of: overall deadline, a provider deadline, the newest provider's hedge budget
+            wake_at = min([deadline] + [run.started + self.provider_deadline for run in pending.values() if run.started is not None])
+            newest = launched[-1]
+            hedge_at = None if newest.started is None else newest.started + self.latency[newest.name].budget()
+            if queue:
+                wake_at = min(wake_at, now + QUEUED_POLL_INTERVAL if hedge_at is None else hedge_at)
+
+            done, _ = wait(list(pending), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+            failed = False
+            for future in done:
+                name = pending.pop(future).name
+                response = future.result()
+                if response:
+                    print(f"✅ Success with {name}")
+                    record("llm", time.monotonic() - started_at, {"provider": name, "outcome": "ok"})
+                    cancel_pending()
+                    return response
+                failed = True
+
+            now = time.monotonic()
+            for future, run in list(pending.items()):
+                if run.started is not None and now - run.started >= self.provider_deadline:
+                    print(f"❌ {run.name} exceeded its {self.provider_deadline}s deadline.")
+                    del pending[future]
+                    run.cancelled.set()
+                    self.breakers[run.name].record_failure()
+                    failed = True
+
+            if failed:
+                launch(" (previous provider failed)")
+            elif queue and hedge_at is not None and now >= hedge_at:
+                if launch(f" (hedging: {newest.name} slower than its p95 budget)"):
+                    self.hedges += 1
+
+        cancel_pending()
+        record("llm", time.monotonic() - started_at, {"provider": "none", "outcome": "failed"})
+        return "Error: All LLMs failed to generate a response."
+
+    def stats(self):
+        return {
+            "hedges": self.hedges,
+            "providers": {
+                name: {
+                    "circuit": self.breakers[name].state,
+                    "consecutive_failures": self.breakers[name].failures,
+                    "p95_seconds": self.latency[name].p95(),
+                }
+                for name, _ in self.providers
+            },
+        }
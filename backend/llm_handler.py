@@ -1,14 +1,12 @@
 import os
 import json
-import boto3
 from dotenv import load_dotenv
-from botocore.exceptions import ClientError
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_mistralai import ChatMistralAI
 import urllib3
 from http.client import RemoteDisconnected
 import time
+from backend.llm_dispatcher import HedgedDispatcher, backoff_delay
+from backend.provider_registry import ProviderRegistry
+from backend.instrumentation import record
 
 # Load environment variables
 load_dotenv(os.path.join("backend", ".env"))
@@ -19,13 +17,6 @@ AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 BEDROCK_MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"  # Change if needed
 
-if AWS_ACCESS_KEY and AWS_SECRET_KEY:
-    bedrock_runtime = boto3.client(
-        "bedrock-runtime",
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        region_name=AWS_REGION
-    )
 
 # === OpenAI Setup ===
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -36,6 +27,49 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # === Mistral Setup ===
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 
+# === Client Registry ===
+# Keep-alive pool shared by the HTTP-based clients and boto3's connection pool size
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+
+# Provider SDKs are imported inside these factories, so importing this module stays cheap
+# and each SDK is only loaded if its provider is actually used.
+def build_bedrock_client(registry):
+    import boto3
+    from botocore.config import Config as BotoConfig
+    return boto3.client(
+        "bedrock-runtime",
+        aws_access_key_id=AWS_ACCESS_KEY,
+        aws_secret_access_key=AWS_SECRET_KEY,
+        region_name=AWS_REGION,
+        config=BotoConfig(max_pool_connections=LLM_MAX_CONNECTIONS, tcp_keepalive=True)
+    )
+
+def build_openai_client(registry):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model_name="gpt-4o-mini", openai_api_key=OPENAI_API_KEY, http_client=registry.http_client)
+
+def build_gemini_client(registry):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model="gemini-1.5-pro", google_api_key=GEMINI_API_KEY)
+
+def build_mistral_client(registry):
+    from langchain_mistralai import ChatMistralAI
+    return ChatMistralAI(model="mistral-large-latest", mistral_api_key=MISTRAL_API_KEY)
+
+# One client per provider for the whole process, shared by every session and thread
+registry = ProviderRegistry(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE)
+registry.register("bedrock", build_bedrock_client)
+registry.register("openai", build_openai_client)
+registry.register("gemini", build_gemini_client)
+registry.register("mistral", build_mistral_client)
+
+# === Dispatch Settings (seconds) ===
+# Start the next provider if the current one is slower than its p95 latency, capped at this
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "4"))
+LLM_PROVIDER_DEADLINE = float(os.getenv("LLM_PROVIDER_DEADLINE", "20"))
+LLM_TOTAL_DEADLINE = float(os.getenv("LLM_TOTAL_DEADLINE", "30"))
+
 
 def query_bedrock_llm(prompt):
     """Queries Claude 3 via AWS Bedrock"""
@@ -47,7 +81,7 @@ def query_bedrock_llm(prompt):
     }
 
     try:
-        response = bedrock_runtime.invoke_model(
+        response = registry.get("bedrock").invoke_model(
             modelId=BEDROCK_MODEL_ID,
             body=json.dumps(request_payload),
             contentType="application/json",
@@ -55,7 +89,7 @@ def query_bedrock_llm(prompt):
         )
         model_response = json.loads(response["body"].read())
         return model_response["content"][0]["text"]
-    except (ClientError, Exception) as e:
+    except Exception as e:  # botocore ClientError included
         print(f"❌ AWS Bedrock Error: {e}")
         return None  # Fallback to OpenAI
 
@@ -63,7 +97,7 @@ def query_bedrock_llm(prompt):
 def query_openai_llm(prompt):
     """Queries OpenAI GPT-4 / GPT-3.5"""
     try:
-        llm = ChatOpenAI(model_name="gpt-4o-mini", openai_api_key=OPENAI_API_KEY)
+        llm = registry.get("openai")
         response = llm.invoke(prompt)
         return response.content
     except Exception as e:
@@ -74,7 +108,7 @@ def query_openai_llm(prompt):
 def query_gemini_llm(prompt):
     """Queries Google Gemini"""
     try:
-        llm =ChatGoogleGenerativeAI(model="gemini-1.5-pro", google_api_key=GEMINI_API_KEY)
+        llm = registry.get("gemini")
         response = llm.invoke(prompt)
         return response.content
     except Exception as e:
@@ -85,7 +119,7 @@ def query_gemini_llm(prompt):
 def query_mistral_llm(prompt):
     """Queries Mistral AI"""
     try:
-        llm = ChatMistralAI(model="mistral-large-latest", mistral_api_key=MISTRAL_API_KEY)
+        llm = registry.get("mistral")
         response = llm.invoke(prompt)
         return response.content
     except Exception as e:
@@ -93,48 +127,160 @@ def query_mistral_llm(prompt):
         return "Error: No LLM available"
 
 
-import urllib3
-from http.client import RemoteDisconnected
-def query_llm(prompt, max_retries=3, delay=2):
-    """Decides which LLM to use in sequence: Bedrock → OpenAI → Gemini → Mistral.
-    If one fails, the next available LLM is tried in order.
-    If any API fails due to network issues, it retries up to `max_retries` times.
-    """
-    llm_sequence = []
+# === Streaming Providers ===
+# Appended when a stream breaks after tokens were already shown to the user
+STREAM_INTERRUPTED = "\n\n[Response interrupted. Please try again.]"
+
+
+def stream_bedrock_llm(prompt):
+    """Streams Claude 3 via AWS Bedrock, yielding text deltas as they arrive"""
+    request_payload = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 512,
+        "temperature": 0.5,
+        "messages": [{"role": "user", "content": [{"type": "text", "text": prompt}]}],
+    }
+    response = registry.get("bedrock").invoke_model_with_response_stream(
+        modelId=BEDROCK_MODEL_ID,
+        body=json.dumps(request_payload),
+        contentType="application/json",
+        accept="application/json"
+    )
+    for event in response["body"]:
+        chunk = json.loads(event["chunk"]["bytes"])
+        if chunk.get("type") == "content_block_delta":
+            yield chunk["delta"].get("text", "")
+
+
+def stream_openai_llm(prompt):
+    """Streams OpenAI GPT-4o mini"""
+    llm = registry.get("openai")
+    for chunk in llm.stream(prompt):
+        yield chunk.content
+
 
+def stream_gemini_llm(prompt):
+    """Streams Google Gemini"""
+    llm = registry.get("gemini")
+    for chunk in llm.stream(prompt):
+        yield chunk.content
+
+
+def stream_mistral_llm(prompt):
+    """Streams Mistral AI"""
+    llm = registry.get("mistral")
+    for chunk in llm.stream(prompt):
+        yield chunk.content
+
+
+def available_providers(streaming=False):
+    """(name, function) for every provider with credentials, in fallback order:
+    Bedrock → OpenAI → Gemini → Mistral. With `streaming`, the functions are generators of text chunks.
+    """
+    providers = []
     if AWS_ACCESS_KEY and AWS_SECRET_KEY:
-        llm_sequence.append(("AWS Bedrock (Claude 3)", query_bedrock_llm))
+        providers.append(("AWS Bedrock (Claude 3)", stream_bedrock_llm if streaming else query_bedrock_llm))
     if OPENAI_API_KEY:
-        llm_sequence.append(("OpenAI (GPT-4)", query_openai_llm))
+        providers.append(("OpenAI (GPT-4)", stream_openai_llm if streaming else query_openai_llm))
     if GEMINI_API_KEY:
-        llm_sequence.append(("Google Gemini", query_gemini_llm))
+        providers.append(("Google Gemini", stream_gemini_llm if streaming else query_gemini_llm))
     if MISTRAL_API_KEY:
-        llm_sequence.append(("Mistral AI", query_mistral_llm))
-
-    if not llm_sequence:
-        return "Error: No valid LLM API keys provided."
-
-    for name, llm_function in llm_sequence:
-        for attempt in range(1, max_retries + 1):
-            print(f"⚡ Trying {name} (Attempt {attempt})")
-            try:
-                # Force a fresh connection
-                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-                response = llm_function(prompt)
-                
-                if response:  # Ensure valid response
-                    print(f"✅ Success with {name}")
-                    return response
-
-            except (RemoteDisconnected, urllib3.exceptions.ProtocolError) as net_err:
-                print(f"❌ {name} failed due to network error: {net_err}. Retrying in {delay} sec...")
-                time.sleep(delay)  # Wait before retrying
-
-            except Exception as e:
-                print(f"❌ {name} failed: {str(e)}. Trying next LLM...")
-                break  # Don't retry if it's a different issue (e.g., API key issue)
-
-    return "Error: All LLMs failed to generate a response."
+        providers.append(("Mistral AI", stream_mistral_llm if streaming else query_mistral_llm))
+    return providers
+
+
+def query_llm_stream(prompt, providers=None, max_retries=3, delay=0.5):
+    """Streaming counterpart of `query_llm`: yields text chunks as the LLM produces them.
+    Providers are tried in the same order, skipping those whose circuit breaker is open.
+    Falling back to the next provider (or retrying a network error) is only possible
+    until the first chunk has been yielded; a failure after that ends the stream with a short notice.
+    `providers` defaults to `available_providers(streaming=True)`; pass fakes to test.
+    """
+    providers = available_providers(streaming=True) if providers is None else providers
+    if not providers:
+        yield "Error: No valid LLM API keys provided."
+        return
+
+    for name, stream_function in providers:
+        breaker = dispatcher.breakers.get(name)
+        if breaker is not None and not breaker.allow():
+            print(f"⏭ Skipping {name}: circuit open")
+            continue
+
+        # Every provider allowed through resolves its breaker (and a half-open trial) exactly once
+        succeeded = interrupted = False
+        try:
+            for attempt in range(1, max_retries + 1):
+                print(f"⚡ Streaming from {name} (Attempt {attempt})")
+                started = False
+                attempt_start = time.perf_counter()
+                try:
+                    for chunk in stream_function(prompt):
+                        if chunk:
+                            if not started:
+                                record("llm_first_token", time.perf_counter() - attempt_start, {"provider": name})
+                            started = True
+                            yield chunk
+                    if started:
+                        print(f"✅ Success with {name}")
+                        record("llm_attempt", time.perf_counter() - attempt_start, {"provider": name, "mode": "stream", "outcome": "ok"})
+                        succeeded = True
+                        return
+                    record("llm_attempt", time.perf_counter() - attempt_start, {"provider": name, "mode": "stream", "outcome": "no_answer"})
+                    break  # Empty completion, try the next LLM
+
+                except (RemoteDisconnected, urllib3.exceptions.ProtocolError) as net_err:
+                    record("llm_attempt", time.perf_counter() - attempt_start, {"provider": name, "mode": "stream", "outcome": "network_error"})
+                    if started:
+                        print(f"❌ {name} stream dropped: {net_err}")
+                        interrupted = True
+                        yield STREAM_INTERRUPTED
+                        return
+                    if attempt < max_retries:
+                        wait = backoff_delay(attempt, delay)
+                        print(f"❌ {name} failed due to network error: {net_err}. Retrying in {wait:.2f} sec...")
+                        time.sleep(wait)
+
+                except Exception as e:
+                    record("llm_attempt", time.perf_counter() - attempt_start, {"provider": name, "mode": "stream", "outcome": "error"})
+                    if started:
+                        print(f"❌ {name} stream failed: {e}")
+                        interrupted = True
+                        yield STREAM_INTERRUPTED
+                        return
+                    print(f"❌ {name} failed: {str(e)}. Trying next LLM...")
+                    break
+        except GeneratorExit:
+            # The consumer stopped reading after tokens were delivered: the provider was answering
+            succeeded = not interrupted
+            raise
+        finally:
+            if breaker is not None:
+                if succeeded:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+
+    yield "Error: All LLMs failed to generate a response."
+
+
+# Shared across requests so latency budgets and circuit breakers reflect recent history
+dispatcher = HedgedDispatcher(
+    available_providers(),
+    hedge_budget=LLM_HEDGE_BUDGET,
+    provider_deadline=LLM_PROVIDER_DEADLINE,
+    total_deadline=LLM_TOTAL_DEADLINE,
+)
+
+
+def query_llm(prompt, max_retries=3, delay=0.5):
+    """Queries the LLM providers in preference order: Bedrock → OpenAI → Gemini → Mistral.
+    A provider that fails hands over to the next one; one that is slower than its p95
+    budget gets the next one started alongside it, and the first answer wins (see HedgedDispatcher).
+    Network errors are retried up to `max_retries` times with jittered exponential backoff
+    starting at `delay` seconds, and failing providers are skipped by a circuit breaker.
+    """
+    return dispatcher.dispatch(prompt, max_retries=max_retries, base_delay=delay)
 
 
 
@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import math
+from collections import Counter, defaultdict
+import numpy as np
+
+DENSE_FILE = "dense.npy"
+CHUNKS_FILE = "chunks.json"
+IVF_FILE = "ivf.npz"
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def matches_filter(metadata, metadata_filter):
+    """Whether chunk metadata satisfies a Pinecone-style filter ($eq, $ne, $in, $nin, $and, $or)."""
+    for key, condition in metadata_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, part) for part in condition):
+                return False
+        else:
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                if operator == "$eq":
+                    ok = value == operand
+                elif operator == "$ne":
+                    ok = value != operand
+                elif operator == "$in":
+                    ok = value in operand
+                elif operator == "$nin":
+                    ok = value not in operand
+                else:
+                    raise ValueError(f"Unsupported metadata filter operator '{operator}'")
+                if not ok:
+                    return False
+    return True
+
+
+def top_k_indices(scores, top_k):
+    """Indices of the `top_k` highest scores, best first, without a full sort."""
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def kmeans(vectors, n_lists, iterations=10, seed=0):
+    """Spherical k-means over normalized vectors; returns (centroids, assignments)."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = (vectors @ centroids.T).argmax(axis=1)
+        for i in range(n_lists):
+            members = vectors[assignments == i]
+            if len(members):
+                centroids[i] = members.mean(axis=0)
+        centroids = normalize_rows(centroids)
+    return centroids, (vectors @ centroids.T).argmax(axis=1)
+
+
+class BM25Index:
+    """In-memory inverted index with BM25 scoring over chunk texts."""
+
+    def __init__(self, texts):
+        self.n_docs = len(texts)
+        doc_tokens = [tokenize(text) for text in texts]
+        lengths = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float32)
+        avg_length = float(lengths.mean()) if self.n_docs else 0.0
+        self.length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(avg_length, 1.0))
+
+        postings = defaultdict(lambda: ([], []))
+        for doc_id, tokens in enumerate(doc_tokens):
+            for term, freq in Counter(tokens).items():
+                postings[term][0].append(doc_id)
+                postings[term][1].append(freq)
+
+        # term -> (doc ids, term frequencies, idf)
+        self.postings = {}
+        for term, (doc_ids, freqs) in postings.items():
+            df = len(doc_ids)
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            self.postings[term] = (np.array(doc_ids, dtype=np.int32), np.array(freqs, dtype=np.float32), idf)
+
+    def scores(self, text):
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(text)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, freqs, idf = posting
+            scores[doc_ids] += idf * freqs * (BM25_K1 + 1) / (freqs + self.length_norm[doc_ids])
+        return scores
+
+
+class LocalIndex:
+    """
+    In-process replacement for the two Pinecone indexes.
+
+    Dense vectors live L2-normalized in a float32 `.npy` file that is memory-mapped
+    on load, and are searched by brute-force inner product or, when built with
+    `ivf_lists`, by probing the `nprobe` nearest k-means lists. Sparse retrieval is
+    BM25 over an inverted index rebuilt from the chunk texts at load time.
+    Matches use the same {"id", "score", "metadata"} shape as Pinecone, and queries
+    take the same metadata filters; only matching rows are scored.
+    """
+
+    def __init__(self, dense, ids, metadata, centroids=None, assignments=None, nprobe=4):
+        self.dense = dense
+        self.ids = ids
+        self.metadata = metadata
+        self.centroids = centroids
+        self.nprobe = nprobe
+        self.lists = None
+        if centroids is not None:
+            self.lists = [np.flatnonzero(assignments == i) for i in range(len(centroids))]
+        self.bm25 = BM25Index([meta.get("source_text", "") for meta in metadata])
+        # Row mask per metadata filter; queries use a handful of distinct filters
+        self.filter_masks = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, vectors, path, ivf_lists=None):
+        """
+        Write an index from prepared dense vectors ({"id", "values", "metadata"} dicts,
+        as produced by data_injestion.prepare_dense_vectors) to the directory `path`.
+        """
+        os.makedirs(path, exist_ok=True)
+        dense = normalize_rows(np.asarray([vector["values"] for vector in vectors], dtype=np.float32))
+        np.save(os.path.join(path, DENSE_FILE), dense)
+        with open(os.path.join(path, CHUNKS_FILE), "w", encoding="utf-8") as file:
+            json.dump(
+                {"ids": [vector["id"] for vector in vectors], "metadata": [vector["metadata"] for vector in vectors]},
+                file,
+                ensure_ascii=False,
+            )
+
+        ivf_path = os.path.join(path, IVF_FILE)
+        if ivf_lists:
+            centroids, assignments = kmeans(dense, min(ivf_lists, len(dense)))
+            np.savez(ivf_path, centroids=centroids, assignments=assignments)
+        elif os.path.exists(ivf_path):
+            os.remove(ivf_path)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path, nprobe=4):
+        dense = np.load(os.path.join(path, DENSE_FILE), mmap_mode="r")
+        with open(os.path.join(path, CHUNKS_FILE), "r", encoding="utf-8") as file:
+            chunks = json.load(file)
+        centroids = assignments = None
+        ivf_path = os.path.join(path, IVF_FILE)
+        if os.path.exists(ivf_path):
+            ivf = np.load(ivf_path)
+            centroids, assignments = ivf["centroids"], ivf["assignments"]
+        return cls(dense, chunks["ids"], chunks["metadata"], centroids, assignments, nprobe)
+
+    def _matches(self, rows, scores):
+        return [
+            {"id": self.ids[row], "score": float(score), "metadata": self.metadata[row]}
+            for row, score in zip(rows, scores)
+        ]
+
+    def filter_mask(self, metadata_filter):
+        """Boolean mask of the rows matching `metadata_filter`, computed once per distinct filter."""
+        key = json.dumps(metadata_filter, sort_keys=True)
+        mask = self.filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter((matches_filter(meta, metadata_filter) for meta in self.metadata), dtype=bool,
+                               count=len(self.metadata))
+            self.filter_masks[key] = mask
+        return mask
+
+    def query_dense(self, vector, top_k=5, filter=None):
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        if self.lists is None:
+            if filter is None:
+                scores = self.dense @ query
+                best = top_k_indices(scores, top_k)
+                return self._matches(best, scores[best])
+            rows = np.flatnonzero(self.filter_mask(filter))
+        else:
+            probes = top_k_indices(self.centroids @ query, self.nprobe)
+            rows = np.concatenate([self.lists[probe] for probe in probes])
+            if filter is not None:
+                rows = rows[self.filter_mask(filter)[rows]]
+        scores = self.dense[rows] @ query
+        best = top_k_indices(scores, top_k)
+        return self._matches(rows[best], scores[best])
+
+    def query_sparse(self, text, top_k=5, filter=None):
+        scores = self.bm25.scores(text)
+        if filter is not None:
+            scores = np.where(self.filter_mask(filter), scores, 0.0)
+        best = top_k_indices(scores, top_k)
+        # Chunks sharing no term with the query are not matches
+        best = best[scores[best] > 0]
+        return self._matches(best, scores[best])
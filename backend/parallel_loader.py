@@ -0,0 +1,129 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+
+try:
+    import ijson
+except ImportError:  # Fall back to json.load when the streaming parser is not installed
+    ijson = None
+
+# Extracted page text, keyed by the SHA-256 of the PDF bytes
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join("backend", ".pdf_cache"))
+
+# Large PDFs are split into tasks of this many pages
+PAGES_PER_TASK = 4
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_page_range(path, start, end):
+    """Worker: text of pages [start, end) of one PDF, as PyPDFLoader would extract it."""
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() for i in range(start, end)]
+
+
+def read_cached_pages(cache_dir, digest):
+    cache_path = os.path.join(cache_dir, f"{digest}.json")
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def write_cached_pages(cache_dir, digest, pages):
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"{digest}.json")
+    with open(f"{cache_path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(pages, file, ensure_ascii=False)
+    os.replace(f"{cache_path}.tmp", cache_path)
+
+
+def iter_pdf_pages(pdf_files, max_workers=None, cache_dir=PDF_CACHE_DIR, pages_per_task=PAGES_PER_TASK):
+    """
+    Yield (pdf path, page text) for every page, in file and page order.
+
+    Files whose hash is in the cache are served from it. The rest are split into
+    page ranges that are parsed in parallel on a process pool, and their text is
+    cached once the whole file is done. Pass cache_dir=None to disable the cache.
+    """
+    pending = {}
+    cached = {}
+    for pdf in pdf_files:
+        digest = file_hash(pdf)
+        pages = read_cached_pages(cache_dir, digest) if cache_dir else None
+        if pages is not None:
+            cached[pdf] = pages
+        else:
+            pending[pdf] = digest
+
+    if not pending:
+        for pdf in pdf_files:
+            for text in cached[pdf]:
+                yield pdf, text
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for pdf in pending:
+            page_count = len(PdfReader(pdf).pages)
+            futures[pdf] = [
+                pool.submit(extract_page_range, pdf, start, min(start + pages_per_task, page_count))
+                for start in range(0, page_count, pages_per_task)
+            ]
+
+        for pdf in pdf_files:
+            if pdf in cached:
+                pages = cached[pdf]
+            else:
+                pages = [text for future in futures[pdf] for text in future.result()]
+                if cache_dir:
+                    write_cached_pages(cache_dir, pending[pdf], pages)
+            for text in pages:
+                yield pdf, text
+
+
+def json_layout(path):
+    """Which scraped-JSON layout a file uses: "content" (help centre Q/A) or "pages"."""
+    with open(path, "rb") as file:
+        for prefix, event, value in ijson.parse(file):
+            if prefix == "" and event == "map_key" and value in ("content", "pages"):
+                return value
+    return None
+
+
+def iter_json_records(path):
+    """
+    Stream the records of a scraped JSON file without loading it whole.
+    Yields ("content", url, section) for help-centre files and ("pages", None, page)
+    for page files, where section/page are the individual top-level array items.
+    """
+    if ijson is None:
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if "content" in data:
+            for section in data["content"]:
+                yield "content", data.get("url", "Unknown URL"), section
+        elif "pages" in data:
+            for page in data["pages"]:
+                yield "pages", None, page
+        return
+
+    layout = json_layout(path)
+    if layout == "content":
+        with open(path, "rb") as file:
+            url = next(ijson.items(file, "url"), "Unknown URL")
+        with open(path, "rb") as file:
+            for section in ijson.items(file, "content.item"):
+                yield "content", url, section
+    elif layout == "pages":
+        with open(path, "rb") as file:
+            for page in ijson.items(file, "pages.item"):
+                yield "pages", None, page
@@ -0,0 +1,80 @@
+import threading
+
+
+def http_pool_stats(client):
+    """Connection counts of an httpx.Client's keep-alive pool (empty if it has none yet)."""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    return {
+        "connections": len(connections),
+        "idle": sum(1 for connection in connections if connection.is_idle()),
+        "max_connections": getattr(pool, "_max_connections", None),
+        "max_keepalive_connections": getattr(pool, "_max_keepalive_connections", None),
+    }
+
+
+class ProviderRegistry:
+    """
+    Builds each LLM client once and hands the same instance to every caller.
+
+    Clients are created lazily by the factory registered under their name, under a
+    lock so concurrent Streamlit sessions and worker threads never build duplicates.
+    HTTP-based clients share one size-bounded keep-alive pool (`http_client`), so
+    TLS sessions and connections are reused across requests instead of being set up
+    per call.
+    """
+
+    def __init__(self, max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0, timeout=60.0):
+        self.factories = {}
+        self.clients = {}
+        # Re-entrant: factories run under the lock and may touch `http_client`
+        self.lock = threading.RLock()
+        self.pool_settings = {
+            "max_connections": max_connections,
+            "max_keepalive_connections": max_keepalive_connections,
+            "keepalive_expiry": keepalive_expiry,
+        }
+        self.timeout = timeout
+        self._http_client = None
+        self.created = {}
+        self.requests = {}
+
+    @property
+    def http_client(self):
+        """The shared httpx keep-alive pool, created on first use."""
+        if self._http_client is None:
+            import httpx
+            with self.lock:
+                if self._http_client is None:
+                    self._http_client = httpx.Client(limits=httpx.Limits(**self.pool_settings), timeout=self.timeout)
+        return self._http_client
+
+    def register(self, name, factory):
+        """`factory(registry)` builds the client; it may use `registry.http_client`."""
+        with self.lock:
+            self.factories[name] = factory
+
+    def get(self, name):
+        with self.lock:
+            client = self.clients.get(name)
+            if client is None:
+                client = self.factories[name](self)
+                self.clients[name] = client
+                self.created[name] = self.created.get(name, 0) + 1
+            self.requests[name] = self.requests.get(name, 0) + 1
+            return client
+
+    def reset(self, name=None):
+        """Drop cached clients (e.g. after rotating credentials) so they are rebuilt on next use."""
+        with self.lock:
+            for key in [name] if name else list(self.clients):
+                self.clients.pop(key, None)
+
+    def stats(self):
+        return {
+            "clients": {
+                name: {"created": self.created.get(name, 0), "requests": self.requests.get(name, 0)}
+                for name in self.factories
+            },
+            "http_pool": http_pool_stats(self._http_client),
+        }
@@ -0,0 +1,188 @@
+import os
+import json
+import threading
+from collections import defaultdict
+import numpy as np
+
+# Route centroids written by data_injestion; without this file every query searches the whole namespace
+QUERY_ROUTER_FILE = os.getenv("QUERY_ROUTER_FILE", os.path.join("backend", "query_router.npz"))
+
+# Help-centre chunks are told apart from other website pages by their URL
+HELP_CENTRE_PATH = "/help-center"
+
+ROUTE_LEVELS = ("family", "section")
+
+
+def route_of(metadata, level="family"):
+    """
+    (route name, {field: value}) of the chunk with `metadata`.
+    "family": policy PDFs, help centre or other website pages.
+    "section": each PDF, each help-centre section, each website page.
+    """
+    source, url, section = metadata.get("source"), metadata.get("url"), metadata.get("section")
+    if source:
+        if level == "family":
+            return "policy-documents", {"source": source}
+        return os.path.basename(source), {"source": source}
+    if url and url.rstrip("/").endswith(HELP_CENTRE_PATH):
+        if level == "family":
+            return "help-centre", {"url": url}
+        return f"help-centre: {section}", {"url": url, "section": section}
+    if level == "family":
+        return "website", {"url": url}
+    return url, {"url": url}
+
+
+class RouteSums:
+    """
+    Running per-route sums of normalized chunk vectors (and chunk counts), from which the
+    QueryRouter centroids are derived. Chunks can be added and removed, so ingestion
+    keeps the router up to date from the vectors it upserts and deletes, without
+    reading the whole index back.
+    """
+
+    def __init__(self, level="family", sums=None, counts=None, values=None):
+        self.level = level
+        self.sums = sums if sums is not None else {}
+        self.counts = defaultdict(int, counts or {})
+        # route -> field -> value -> chunks with that value, so values can be removed again
+        self.values = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+        for name, fields in (values or {}).items():
+            for field, field_values in fields.items():
+                self.values[name][field].update(field_values)
+
+    def add(self, vector, metadata, sign=1):
+        name, fields = route_of(metadata, self.level)
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = sign * vector / (np.linalg.norm(vector) or 1.0)
+        self.sums[name] = self.sums[name] + vector if name in self.sums else vector.copy()
+        self.counts[name] += sign
+        for field, value in fields.items():
+            self.values[name][field][value] += sign
+
+    def remove(self, vector, metadata):
+        self.add(vector, metadata, sign=-1)
+
+    def router(self, min_margin=0.08):
+        names = sorted(name for name in self.sums if self.counts[name] > 0)
+        if not names:
+            raise ValueError("No chunks to build a router from")
+        centroids = np.stack([self.sums[name] for name in names])
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        filters = [
+            {
+                field: {"$in": sorted(value for value, count in field_values.items() if count > 0)}
+                for field, field_values in sorted(self.values[name].items())
+            }
+            for name in names
+        ]
+        return QueryRouter(names, filters, centroids, [self.counts[name] for name in names], min_margin, self)
+
+
+class QueryRouter:
+    """
+    Nearest-centroid query router. Each route (a document family or section) is the
+    mean of its chunks' normalized dense vectors; a query goes to the route whose
+    centroid is most similar to its embedding, as a metadata filter, but only when that
+    route leads the runner-up by `min_margin`. Otherwise the search stays unfiltered.
+    `route_sums` (saved with the router) lets ingestion update it incrementally.
+    """
+
+    def __init__(self, names, filters, centroids, counts, min_margin=0.08, route_sums=None):
+        self.names = names
+        self.filters = filters
+        self.centroids = centroids
+        self.counts = counts
+        self.min_margin = min_margin
+        self.route_sums = route_sums
+        self.lock = threading.Lock()
+        self.routed = defaultdict(int)
+        self.fallbacks = 0
+
+    @classmethod
+    def build(cls, chunks, level="family", min_margin=0.08):
+        """Router over `chunks`, an iterable of (dense vector, metadata)."""
+        route_sums = RouteSums(level)
+        for vector, metadata in chunks:
+            route_sums.add(vector, metadata)
+        return route_sums.router(min_margin)
+
+    def save(self, path=QUERY_ROUTER_FILE):
+        routes = {"names": self.names, "filters": self.filters, "counts": self.counts}
+        arrays = {"centroids": self.centroids}
+        if self.route_sums is not None:
+            sum_names = sorted(self.route_sums.sums)
+            routes["sums"] = {
+                "level": self.route_sums.level,
+                "names": sum_names,
+                "counts": {name: self.route_sums.counts[name] for name in sum_names},
+                "values": {name: {field: dict(values) for field, values in fields.items()}
+                           for name, fields in self.route_sums.values.items()},
+            }
+            arrays["sums"] = np.stack([self.route_sums.sums[name] for name in sum_names])
+        with open(f"{path}.tmp", "wb") as file:
+            np.savez(file, routes=np.array(json.dumps(routes)), **arrays)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path=QUERY_ROUTER_FILE, min_margin=0.08):
+        with np.load(path) as data:
+            routes = json.loads(str(data["routes"]))
+            centroids = data["centroids"]
+            route_sums = None
+            if "sums" in routes:
+                saved = routes["sums"]
+                route_sums = RouteSums(saved["level"], dict(zip(saved["names"], data["sums"])),
+                                       saved["counts"], saved["values"])
+        return cls(routes["names"], routes["filters"], centroids, routes["counts"], min_margin, route_sums)
+
+    def __len__(self):
+        return len(self.names)
+
+    def similarities(self, vector):
+        query = np.asarray(vector, dtype=np.float32)
+        return self.centroids @ (query / (np.linalg.norm(query) or 1.0))
+
+    def route(self, vector):
+        """(metadata filter or None, route name or None, margin over the runner-up route)."""
+        if len(self.names) < 2:
+            return None, None, 0.0
+        similarities = self.similarities(vector)
+        second, best = np.argsort(similarities)[-2:]
+        margin = float(similarities[best] - similarities[second])
+        with self.lock:
+            if margin < self.min_margin:
+                self.fallbacks += 1
+                return None, None, margin
+            self.routed[self.names[best]] += 1
+        return self.filters[best], self.names[best], margin
+
+    def stats(self):
+        with self.lock:
+            routed = sum(self.routed.values())
+            total = routed + self.fallbacks
+            return {
+                "routes": len(self.names),
+                "routed": dict(self.routed),
+                "fallbacks": self.fallbacks,
+                "routed_share": round(routed / total, 4) if total else 0.0,
+            }
+
+
+query_router = None
+query_router_mtime = None
+router_lock = threading.Lock()
+
+
+def get_query_router(min_margin=0.08, path=QUERY_ROUTER_FILE):
+    """The router at `path`, reloaded when ingestion rebuilds it; None when there is none."""
+    global query_router, query_router_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with router_lock:
+        if query_router is None or mtime != query_router_mtime:
+            query_router = QueryRouter.load(path, min_margin)
+            query_router_mtime = mtime
+        return query_router
@@ -1,61 +1,368 @@
-import json
-from backend.llm_handler import query_llm
-from backend.context_retrival import hybrid_search
+import os
+import copy
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from backend.llm_handler import query_llm, query_llm_stream, STREAM_INTERRUPTED
+from backend.context_retrival import (
+    hybrid_search, hybrid_search_batch, start_hybrid_search, embed_queries, get_dense_embedding, search_pool, active_backend, BRANCH_TIMEOUT,
+)
+from backend.answer_cache import SemanticAnswerCache, read_corpus_version
+from backend.embedding_cache import normalize_query
+from backend.single_flight import SingleFlight
+from backend.instrumentation import span, record, annotate, collect_timings, submit
+from backend.context_packer import pack_context
+from backend.faq_index import get_faq_index
+from backend.retrieval_gate import get_retrieval_gate
 
-def response(query):
+# Semantic answer cache: queries whose embeddings are at least this cosine-similar share an answer
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+
+answer_cache = SemanticAnswerCache(ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_SIZE, read_corpus_version())
+
+# Single-flight: concurrent requests for the same normalized question share one computation
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+
+response_flights = SingleFlight()
+stream_flights = SingleFlight()
+
+# LLM calls response_batch keeps in flight at once
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "4"))
+
+# Context packing: dedupe and merge retrieved chunks, then fit them into this many prompt tokens
+CONTEXT_PACKING_ENABLED = os.getenv("CONTEXT_PACKING_ENABLED", "true").lower() == "true"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+
+packing_lock = threading.Lock()
+packing_totals = {"requests": 0, "tokens_before": 0, "tokens_after": 0, "tokens_saved": 0}
+
+# FAQ fast path: questions whose character trigrams match a curated FAQ question this closely, using the
+# same words up to typos (see backend.faq_index), get its answer directly
+FAQ_FAST_PATH_ENABLED = os.getenv("FAQ_FAST_PATH_ENABLED", "true").lower() == "true"
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.8"))
+
+def lookup_faq(query):
     """
-    Retrieves relevant context using hybrid search, generates a response using an LLM,
-    and returns sources with URL, section, and relevance score.
+    The curated help-centre answer for `query` when it is (nearly) an FAQ question, else None.
+    Skips embedding, retrieval and the LLM entirely.
+    """
+    if not FAQ_FAST_PATH_ENABLED:
+        return None
+    index = get_faq_index(FAQ_MATCH_THRESHOLD)
+    if index is None:
+        return None
+    with span("faq_lookup") as lookup_span:
+        result = index.answer(query)
+        lookup_span.set(outcome="miss" if result is None else "hit")
+    return result
+
+# Retrieval-confidence gate (thresholds from `python -m backend.calibrate_gate`): weak retrieval gets the canned reply without an LLM call
+RETRIEVAL_GATE_ENABLED = os.getenv("RETRIEVAL_GATE_ENABLED", "true").lower() == "true"
+INSUFFICIENT_CONTEXT_REPLY = "insufficient context ! kindly contact admin - admin@jio.com"
+
+gate_lock = threading.Lock()
+gate_totals = {"checked": 0, "gated": 0, "trimmed": 0, "chunks_dropped": 0}
+
+def gate_results(results):
+    """
+    Apply the calibrated retrieval gate: None when retrieval is too weak to be worth an
+    LLM call, else the results (cut to fewer chunks when the top hit dominates).
+    Unchanged when the gate is disabled or not calibrated for the retriever in use.
+    Results missing a thresholded index (its search failed) are not gated (see RetrievalGate),
+    so an outage does not look like an out-of-scope query.
+    """
+    gate = get_retrieval_gate(active_backend()) if RETRIEVAL_GATE_ENABLED else None
+    if gate is None:
+        return results
+    with span("retrieval_gate") as gate_span:
+        if not gate.confident(results, getattr(results, "missing", ())):
+            gate_span.set(outcome="gated")
+            kept = None
+        else:
+            kept = gate.trim(results)
+            gate_span.set(outcome="trimmed" if len(kept) < len(results) else "passed")
+    with gate_lock:
+        gate_totals["checked"] += 1
+        if kept is None:
+            gate_totals["gated"] += 1
+        elif len(kept) < len(results):
+            gate_totals["trimmed"] += 1
+            gate_totals["chunks_dropped"] += len(results) - len(kept)
+    return kept
+
+def insufficient_context():
+    return {"response": INSUFFICIENT_CONTEXT_REPLY, "sources": []}
+
+def retrieval_gate_stats():
+    with gate_lock:
+        return dict(gate_totals)
+
+def faq_stats():
+    index = get_faq_index(FAQ_MATCH_THRESHOLD) if FAQ_FAST_PATH_ENABLED else None
+    return index.stats() if index is not None else {"size": 0}
+
+def lookup_cached_answer(query, timeout=None):
+    """
+    Returns (query embedding, cached answer or None).
+    The embed is shared with hybrid_search's dense branch when both run at once (see
+    get_dense_embedding), and cached for it otherwise. The embed waits at most `timeout` seconds (default the retrieval branch timeout); when it
+    fails or runs late, returns (None, None) and the query is answered as with the cache off.
+    """
+    future = submit(search_pool, get_dense_embedding, query)
+    try:
+        query_embedding = future.result(timeout=BRANCH_TIMEOUT if timeout is None else timeout)
+    except FutureTimeoutError:
+        print("❌ Answer cache lookup timed out embedding the query, skipping the cache")
+        return None, None
+    except Exception as e:
+        print(f"❌ Answer cache lookup failed: {e}")
+        return None, None
+    with span("answer_cache_lookup") as lookup_span:
+        answer_cache.check_version(read_corpus_version())
+        cached = answer_cache.lookup(query_embedding)
+        lookup_span.set(outcome="miss" if cached is None else "hit")
+    return query_embedding, cached
+
+def retrieve(query, timeout=None):
+    """Hybrid search top 5 for `query`."""
+    with span("retrieval"):
+        return hybrid_search(query, top_k=5, timeout=timeout)
+
+def lookup_then_retrieve(query):
+    """
+    (query embedding or None, cached answer or None, results): the answer-cache lookup and,
+    on a miss, retrieval. Retrieval starts alongside the lookup, so a miss costs no more than
+    retrieval alone; both run against one deadline. On a hit the started search is not awaited.
+    """
+    deadline = time.monotonic() + BRANCH_TIMEOUT
+    finish = start_hybrid_search(query, top_k=5, timeout=BRANCH_TIMEOUT)
+    query_embedding = None
+    if ANSWER_CACHE_ENABLED:
+        query_embedding, cached = lookup_cached_answer(query, max(0.0, deadline - time.monotonic()))
+        if cached is not None:
+            return query_embedding, cached, None
+    with span("retrieval"):
+        return query_embedding, None, finish()
+
+def build_prompt(query, results=None):
+    """
+    Retrieves relevant context using hybrid search and builds the LLM prompt.
+    Returns (prompt, sources) where sources carry URL, section, and relevance score.
+    Pass `results` to build from an already retrieved ranking.
     """
     # Retrieve relevant context
-    results = hybrid_search(query, top_k=5)
+    if results is None:
+        results = retrieve(query)
+    build_start = time.perf_counter()
+    if CONTEXT_PACKING_ENABLED:
+        results = pack_results(results)
 
-    # Extract relevant texts, metadata, and scores
+    # Extract relevant texts, metadata, and scores (RetrievedChunk fields, already decoded)
     extracted_contexts = []
     sources = []
 
     for idx, res in enumerate(results):
-        if "metadata" in res:
-            source_text = res["metadata"].get("source_text", "No source text available")
-            category = res["metadata"].get("category", "Unknown Category")
-            score = res.get("score", 0)  # Default to 0 if score is missing
-
-            # Decode 'origin' field
-            origin_str = res["metadata"].get("origin", "{}")  # Default to empty dict if missing
-            try:
-                origin = json.loads(origin_str)  # Convert string back to dictionary
-            except json.JSONDecodeError:
-                origin = {}  # If decoding fails, default to empty dictionary
-
-            # Extract URL and Section from origin
-            url = origin.get("url", "Unknown URL")
-            section = origin.get("section", "Unknown Section")
-
-            extracted_contexts.append(f"Context {idx + 1}: {source_text}")
-            sources.append({
-                "category": category,
-                "url": url,
-                "section": section,
-                "score": score
-            })
+        extracted_contexts.append(f"Context {idx + 1}: {res.text}")
+        sources.append({
+            "category": res.category,
+            "url": res.url,
+            "section": res.section,
+            "score": res.score
+        })
 
     # Construct prompt for LLM
     context_str = "\n\n".join(extracted_contexts)
-    prompt = f"""give response to the point . No Salutation and greeting . i context is not sufficient then tell user "insufficient context ! kindly contact admin - admin@jio.com" else  Use the following retrieved context to answer the query:
+    prompt = f"""give response to the point . No Salutation and greeting . i context is not sufficient then tell user "{INSUFFICIENT_CONTEXT_REPLY}" else  Use the following retrieved context to answer the query:
 
     {context_str}
 
     Query: {query}
     Answer:"""
 
+    record("prompt_build", time.perf_counter() - build_start)
+    return prompt, sources
+
+def pack_results(results):
+    """Dedupe, merge and budget the retrieved chunks (see backend.context_packer), recording tokens saved."""
+    packed, report = pack_context(results, CONTEXT_TOKEN_BUDGET)
+    with packing_lock:
+        packing_totals["requests"] += 1
+        for key in ("tokens_before", "tokens_after", "tokens_saved"):
+            packing_totals[key] += report[key]
+    annotate("context_pack", **report)
+    if report["tokens_saved"]:
+        print(f"📦 Context packed: {report['tokens_before']} → {report['tokens_after']} tokens "
+              f"({report['duplicates']} duplicates, {report['merged']} merged, {report['over_budget']} over budget)")
+    return packed
+
+def context_packing_stats():
+    with packing_lock:
+        return dict(packing_totals)
+
+def generate_response(query):
+    """
+    Retrieves relevant context using hybrid search, generates a response using an LLM,
+    and returns sources with URL, section, and relevance score.
+    Answers to semantically equivalent earlier queries are served from the answer cache,
+    and queries whose retrieval is too weak get the canned reply (see `gate_results`).
+    """
+    query_embedding, cached, results = lookup_then_retrieve(query)
+    if cached is not None:
+        return cached
+
+    results = gate_results(results)
+    if results is None:
+        return insufficient_context()
+    prompt, sources = build_prompt(query, results)
+
     # Generate response from LLM
     llm_response = query_llm(prompt)
 
-    return {
+    result = {
         "response": llm_response,
         "sources": sources
     }
 
+    # Never cache provider failures
+    if query_embedding is not None and not llm_response.startswith("Error"):
+        answer_cache.store(query_embedding, result)
+
+    return result
+
+def generate_response_stream(query, providers=None):
+    """
+    Streaming counterpart of `generate_response`. Retrieval runs before this returns, so the
+    sources are available ahead of the first token; "response" is an iterator of text
+    chunks that calls the LLM lazily. The full answer is cached once the stream completes.
+    `providers` is passed through to query_llm_stream (e.g. fake streaming providers).
+    """
+    query_embedding, cached, results = lookup_then_retrieve(query)
+    if cached is not None:
+        return {"response": iter([cached["response"]]), "sources": cached["sources"]}
+
+    results = gate_results(results)
+    if results is None:
+        return {"response": iter([INSUFFICIENT_CONTEXT_REPLY]), "sources": []}
+    prompt, sources = build_prompt(query, results)
+
+    def tokens():
+        chunks = []
+        for chunk in query_llm_stream(prompt, providers=providers):
+            chunks.append(chunk)
+            yield chunk
+        llm_response = "".join(chunks)
+        if query_embedding is not None and not llm_response.startswith("Error") and not llm_response.endswith(STREAM_INTERRUPTED):
+            answer_cache.store(query_embedding, {"response": llm_response, "sources": sources})
+
+    return {"response": tokens(), "sources": sources}
+
+def response(query, timings=False):
+    """
+    Answer `query` with sources (see `generate_response`). Concurrent calls for the same
+    normalized question attach to the one in flight and receive a copy of its result.
+    With `timings`, the result also has "timings": the spans recorded while answering
+    (see backend.instrumentation); a call that attached to an in-flight one only records its wait.
+    FAQ questions are answered from the FAQ index first (see `lookup_faq`).
+    """
+    if timings:
+        with collect_timings() as trace:
+            with span("response"):
+                result = response(query)
+        return dict(result, timings=trace)
+    faq = lookup_faq(query)
+    if faq is not None:
+        return faq
+    if not COALESCE_REQUESTS:
+        return generate_response(query)
+    result, coalesced = response_flights.do(normalize_query(query), generate_response, query)
+    return copy.deepcopy(result) if coalesced else result
+
+def response_stream(query, providers=None):
+    """
+    Streaming answer to `query` (see `generate_response_stream`). Concurrent calls for the
+    same normalized question share one retrieval and one LLM stream; a caller joining
+    mid-stream first receives the chunks already produced. A caller that stops reading
+    early should `close()` the response iterator, so the shared stream is released once
+    its last reader is gone.
+    """
+    faq = lookup_faq(query)
+    if faq is not None:
+        return {"response": iter([faq["response"]]), "sources": faq["sources"]}
+    if not COALESCE_REQUESTS:
+        return generate_response_stream(query, providers)
+
+    def start():
+        result = generate_response_stream(query, providers)
+        return result["response"], result["sources"]
+
+    stream, sources, coalesced = stream_flights.do_stream(normalize_query(query), start)
+    return {"response": stream, "sources": copy.deepcopy(sources) if coalesced else sources}
+
+def response_batch(queries, max_concurrency=None, use_faq=True):
+    """
+    Answer many queries at once. All queries are embedded with one batched call per
+    embedder, the index queries run concurrently, and at most `max_concurrency` LLM
+    calls are in flight. Returns, in query order, {"response", "sources", "timings"}
+    where timings holds the seconds spent in each stage (embed and retrieve are
+    shared by the whole batch; FAQ and cached answers skip retrieval and the LLM,
+    FAQ answers skip embedding too, and gated queries skip the LLM).
+    With `use_faq=False` the FAQ fast path is bypassed, e.g. for regression runs over
+    the FAQ questions themselves.
+    """
+    max_concurrency = LLM_BATCH_CONCURRENCY if max_concurrency is None else max_concurrency
+    queries = list(queries)
+    results = [lookup_faq(query) if use_faq else None for query in queries]
+    timings = [{"embed": 0.0, "retrieve": 0.0, "llm": 0.0} for _ in queries]
+    pending = [i for i in range(len(queries)) if results[i] is None]
+
+    start = time.perf_counter()
+    embeddings = dict(zip(pending, embed_queries([queries[i] for i in pending]))) if pending else {}
+    embed_seconds = round(time.perf_counter() - start, 4)
+    for i in pending:
+        timings[i]["embed"] = embed_seconds
+
+    if ANSWER_CACHE_ENABLED and pending:
+        answer_cache.check_version(read_corpus_version())
+        for i, cached in zip(pending, answer_cache.lookup_many([embeddings[i] for i in pending])):
+            if cached is not None:
+                results[i] = cached
+        pending = [i for i in pending if results[i] is None]
+
+    start = time.perf_counter()
+    rankings = hybrid_search_batch([queries[i] for i in pending], top_k=5) if pending else []
+    retrieve_seconds = round(time.perf_counter() - start, 4)
+    prompts = {}
+    for i, ranking in zip(pending, rankings):
+        timings[i]["retrieve"] = retrieve_seconds
+        ranking = gate_results(ranking)
+        if ranking is None:
+            results[i] = insufficient_context()
+        else:
+            prompts[i] = build_prompt(queries[i], ranking)
+    pending = [i for i in pending if i in prompts]
+
+    def answer(i):
+        prompt, sources = prompts[i]
+        start = time.perf_counter()
+        llm_response = query_llm(prompt)
+        timings[i]["llm"] = round(time.perf_counter() - start, 4)
+        result = {"response": llm_response, "sources": sources}
+        if ANSWER_CACHE_ENABLED and not llm_response.startswith("Error"):
+            answer_cache.store(embeddings[i], result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="batch-llm") as pool:
+        for i, result in zip(pending, pool.map(answer, pending)):
+            results[i] = result
+
+    return [dict(result, timings=timing) for result, timing in zip(results, timings)]
+
+def coalescing_stats():
+    """How many calls ran (leaders) versus attached to an identical in-flight call (coalesced)."""
+    return {"response": response_flights.stats(), "response_stream": stream_flights.stats()}
+
 
 
 # print(response("How long would it require to become P2M merchant after upgradation request?"))
\ No newline at end of file
@@ -0,0 +1,177 @@
+import os
+import json
+import itertools
+import threading
+import numpy as np
+
+# Thresholds written by `python -m backend.calibrate_gate`; without this file nothing is gated
+RETRIEVAL_GATE_FILE = os.getenv("RETRIEVAL_GATE_FILE", os.path.join("backend", "retrieval_gate.json"))
+
+# Index whose score gap between the first and second chunk decides whether the top hit dominates
+DOMINANCE_INDEX = "dense"
+# A calibrated margin below this would call nearly every ranking dominated; keep a fixed top_k instead
+MIN_DOMINANCE_MARGIN = float(os.getenv("MIN_DOMINANCE_MARGIN", "0.01"))
+
+
+def top_index_scores(results):
+    """Best raw score each index gave any of the retrieved chunks, e.g. {"dense": 0.82, "sparse": 11.3}."""
+    best = {}
+    for result in results:
+        for name, score in result.index_scores.items():
+            if score > best.get(name, -np.inf):
+                best[name] = score
+    return best
+
+
+def dominance_gap(results, index=DOMINANCE_INDEX):
+    """
+    How far the top chunk's `index` score is ahead of the next best chunk's, or 0.0 when
+    the top chunk is not also that index's best (or there is nothing to compare).
+    """
+    scores = [result.index_scores.get(index) for result in results]
+    if len(scores) < 2 or scores[0] is None:
+        return 0.0
+    others = [score for score in scores[1:] if score is not None]
+    if not others:
+        return float("inf")
+    return max(0.0, scores[0] - max(others))
+
+
+class RetrievalGate:
+    """
+    Decides from retrieval scores alone whether the LLM is worth calling.
+
+    A query is answerable when at least one index scored some chunk at or above that
+    index's threshold (indexes without a threshold are ignored). When the search of a
+    thresholded index failed, the query passes: that index might have cleared its
+    threshold, and an outage must not look like an out-of-scope query. When the top chunk
+    dominates (its dense score leads the runner-up by `margin` or more), only the
+    first `min_k` chunks are kept for the prompt.
+    """
+
+    def __init__(self, thresholds, margin=float("inf"), min_k=2, backend=None):
+        self.thresholds = thresholds
+        self.margin = margin
+        self.min_k = min_k
+        self.backend = backend
+
+    def confident(self, results, missing=()):
+        """Whether `results` are worth an LLM call; `missing` names indexes whose search failed."""
+        return self.passes(top_index_scores(results), missing)
+
+    def passes(self, scores, missing=()):
+        """`confident` for precomputed best scores per index (always true without thresholds)."""
+        if not self.thresholds or any(name in missing for name in self.thresholds):
+            return True
+        return any(scores.get(name, -np.inf) >= threshold for name, threshold in self.thresholds.items())
+
+    def dominates(self, count, gap):
+        return count > self.min_k and gap >= self.margin
+
+    def trim(self, results):
+        """`results` cut to `min_k` chunks when the top hit dominates, else unchanged."""
+        if self.dominates(len(results), dominance_gap(results)):
+            return results[:self.min_k]
+        return results
+
+    def to_dict(self):
+        return {
+            "backend": self.backend,
+            "thresholds": self.thresholds,
+            "margin": None if np.isinf(self.margin) else self.margin,
+            "min_k": self.min_k,
+        }
+
+    def save(self, path=RETRIEVAL_GATE_FILE):
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=1)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path=RETRIEVAL_GATE_FILE):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        margin = data.get("margin")
+        return cls(data["thresholds"], float("inf") if margin is None else margin, data.get("min_k", 2), data.get("backend"))
+
+
+def calibrate_thresholds(samples, target_recall=0.98, quantiles=51):
+    """
+    Per-index thresholds from labeled samples ({"in_scope": bool, "scores": {index: best score}}).
+    Searches, for every index, thresholds at the 0-50th percentiles of its in-scope scores (or
+    no threshold at all) and returns the combination that gates the most out-of-scope samples
+    while still letting through at least `target_recall` of the in-scope ones.
+    """
+    positives = [sample for sample in samples if sample["in_scope"]]
+    negatives = [sample for sample in samples if not sample["in_scope"]]
+    if not positives or not negatives:
+        raise ValueError("Calibration needs both in-scope and out-of-scope queries")
+    names = sorted({name for sample in samples for name in sample["scores"]})
+
+    def matrix(group):
+        return np.array([[sample["scores"].get(name, -np.inf) for name in names] for sample in group])
+
+    positive_scores, negative_scores = matrix(positives), matrix(negatives)
+    candidates = []
+    for column in range(len(names)):
+        finite = positive_scores[:, column][np.isfinite(positive_scores[:, column])]
+        levels = np.unique(np.percentile(finite, np.linspace(0, 50, quantiles))) if len(finite) else np.array([])
+        candidates.append(list(levels) + [np.inf])
+
+    best, best_key = None, None
+    for combination in itertools.product(*candidates):
+        thresholds = np.array(combination)
+        recall = (positive_scores >= thresholds).any(axis=1).mean()
+        if recall < target_recall:
+            continue
+        key = ((negative_scores < thresholds).all(axis=1).mean(), recall)
+        if best_key is None or key > best_key:
+            best, best_key = thresholds, key
+    if best is None:
+        return {}
+    return {name: float(threshold) for name, threshold in zip(names, best) if np.isfinite(threshold)}
+
+
+def calibrate_margin(samples, min_k=2, top_k=5, max_loss=0.01, min_margin=MIN_DOMINANCE_MARGIN):
+    """
+    Smallest dominance margin at which cutting the context to `min_k` chunks loses the gold
+    chunk for at most `max_loss` of the in-scope samples whose gold chunk was retrieved
+    ({"gap": dominance gap, "gold_rank": 1-based rank or None}). Returns inf (never trim,
+    a fixed top_k) when no margin is safe or the safe one is below `min_margin`.
+    """
+    retrieved = [sample for sample in samples if sample["in_scope"] and sample.get("gold_rank")]
+    if not retrieved:
+        return float("inf")
+    gaps = np.array([sample["gap"] for sample in retrieved])
+    lost = np.array([min_k < sample["gold_rank"] <= top_k for sample in retrieved])
+    for margin in np.unique(gaps[np.isfinite(gaps)]):
+        if (lost & (gaps >= margin)).sum() <= max_loss * len(retrieved):
+            return float(margin) if margin >= min_margin else float("inf")
+    return float("inf")
+
+
+retrieval_gate = None
+retrieval_gate_mtime = None
+gate_lock = threading.Lock()
+
+
+def get_retrieval_gate(backend, path=RETRIEVAL_GATE_FILE):
+    """
+    The calibrated gate at `path`, reloaded when recalibrated. None when there is no
+    calibration, or when it was made for a different retriever backend (scores are not comparable).
+    """
+    global retrieval_gate, retrieval_gate_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with gate_lock:
+        if retrieval_gate is None or mtime != retrieval_gate_mtime:
+            retrieval_gate = RetrievalGate.load(path)
+            retrieval_gate_mtime = mtime
+            if retrieval_gate.backend not in (None, backend):
+                print(f"⚠️ Retrieval gate in {path} was calibrated for the {retrieval_gate.backend} backend; "
+                      f"not gating {backend} results.")
+        if retrieval_gate.backend not in (None, backend):
+            return None
+        return retrieval_gate
@@ -0,0 +1,201 @@
+import threading
+
+
+class Flight:
+    """One in-flight computation that concurrent callers attach to."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SharedStream:
+    """
+    Fans one iterator out to any number of readers (see `attach`). Chunks are buffered,
+    so a reader that attaches late first replays what was already produced. Whichever
+    reader needs the next chunk pulls it from the source; the others wait on it.
+    `on_finish` runs once when the source is exhausted or fails, or when the last
+    reader closes before that (the source is then closed too and no one can attach).
+    """
+
+    def __init__(self, source, on_finish=None):
+        self.source = source
+        self.on_finish = on_finish
+        self.chunks = []
+        self.finished = False
+        self.abandoned = False
+        self.error = None
+        self.readers = 0
+        self.pull_lock = threading.Lock()
+        self.readers_lock = threading.Lock()
+
+    def pull(self):
+        try:
+            self.chunks.append(next(self.source))
+        except StopIteration:
+            self.finish()
+        except Exception as e:
+            self.error = e
+            self.finish()
+
+    def finish(self):
+        self.finished = True
+        if self.on_finish is not None:
+            self.on_finish()
+
+    def read(self, position):
+        """The chunk at `position`, pulling from the source as needed; StopIteration at the end."""
+        while True:
+            if position < len(self.chunks):
+                return self.chunks[position]
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                raise StopIteration
+            with self.pull_lock:
+                # Another reader may have pulled while we waited for the lock
+                if position == len(self.chunks) and not self.finished:
+                    self.pull()
+
+    def attach(self):
+        """A new StreamReader, or None when every earlier reader already closed the stream."""
+        with self.readers_lock:
+            if self.abandoned:
+                return None
+            self.readers += 1
+        return StreamReader(self)
+
+    def detach(self):
+        with self.readers_lock:
+            self.readers -= 1
+            if self.readers or self.finished or self.abandoned:
+                return
+            self.abandoned = True
+        # Waits for a pull in progress, so the source is never closed while it runs
+        with self.pull_lock:
+            if not self.finished:
+                close = getattr(self.source, "close", None)
+                if close is not None:
+                    close()
+                self.finish()
+
+
+class StreamReader:
+    """One reader's position in a SharedStream. Exhausting it or calling `close` detaches it."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.position = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        try:
+            chunk = self.stream.read(self.position)
+        except BaseException:
+            self.close()
+            raise
+        self.position += 1
+        return chunk
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.stream.detach()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller (the leader)
+    runs the computation, callers arriving while it is in flight wait for it and
+    receive the same result (or exception). Nothing is kept once it completes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key):
+        """Returns (flight, is_leader)."""
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = Flight()
+            self.flights[key] = flight
+            self.leaders += 1
+            return flight, True
+
+    def forget(self, key, flight):
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+
+    def wait(self, flight):
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def do(self, key, function, *args):
+        """Run `function(*args)` once per concurrent burst of `key`. Returns (result, coalesced)."""
+        flight, leader = self.join(key)
+        if not leader:
+            return self.wait(flight), True
+        try:
+            flight.result = function(*args)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self.forget(key, flight)
+            flight.done.set()
+        return flight.result, False
+
+    def do_stream(self, key, function, *args):
+        """
+        Like `do` for a `function` returning (iterator, extra). The flight stays open
+        until the iterator is exhausted, so callers arriving mid-stream also attach,
+        or until every caller closed its reader, which closes the iterator.
+        Returns (StreamReader, extra, coalesced); iterate the reader, and close it when
+        abandoning the stream early.
+        """
+        while True:
+            flight, leader = self.join(key)
+            if not leader:
+                stream, extra = self.wait(flight)
+                reader = stream.attach()
+                if reader is None:
+                    # Abandoned by its readers in the meantime: start a new flight
+                    continue
+                return reader, extra, True
+            try:
+                source, extra = function(*args)
+            except Exception as e:
+                flight.error = e
+                self.forget(key, flight)
+                flight.done.set()
+                raise
+            stream = SharedStream(iter(source), on_finish=lambda: self.forget(key, flight))
+            reader = stream.attach()
+            flight.result = (stream, extra)
+            flight.done.set()
+            return reader, extra, False
+
+    def stats(self):
+        with self.lock:
+            calls = self.leaders + self.coalesced
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self.flights),
+                "coalesced_rate": round(self.coalesced / calls, 4) if calls else 0.0,
+            }
@@ -0,0 +1,56 @@
+import zlib
+import numpy as np
+from backend.local_index import tokenize
+
+# Mersenne prime for the MinHash permutations; shingle hashes are reduced below it
+MINHASH_PRIME = (1 << 31) - 1
+
+
+def shingles(text, size=5):
+    """Word n-grams of `text` (the whole text when it is shorter than `size` words)."""
+    tokens = tokenize(text)
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def char_shingles(text, size=3):
+    """Character n-grams of the lowercased words of `text`; tolerant of typos and word endings."""
+    text = " ".join(tokenize(text))
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """
+    MinHash signatures of word shingles (or character n-grams with `char_level`).
+    The fraction of equal positions in two signatures estimates the Jaccard
+    similarity of the texts' shingle sets.
+    """
+
+    def __init__(self, num_perm=64, shingle_size=5, seed=1, char_level=False):
+        rng = np.random.default_rng(seed)
+        self.shingle_size = shingle_size
+        self.shingles = char_shingles if char_level else shingles
+        self.a = rng.integers(1, MINHASH_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MINHASH_PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) % MINHASH_PRIME for shingle in self.shingles(text, self.shingle_size)),
+            dtype=np.uint64,
+        )
+        if len(hashes) == 0:
+            return np.full(len(self.a), MINHASH_PRIME, dtype=np.uint64)
+        return ((hashes[:, None] * self.a + self.b) % MINHASH_PRIME).min(axis=0)
+
+    @staticmethod
+    def similarity(signature_a, signature_b):
+        return float(np.mean(signature_a == signature_b))
@@ -0,0 +1,119 @@
+"""
+Load test for the ASGI service (backend/api.py): runs it under uvicorn on a local
+port with stubbed retrieval and LLM backends that inject latency, fires concurrent
+requests and reports throughput, p50/p99 latency and how many were shed with 503.
+
+Run from the repository root:
+    python -m benchmarks.api_load_bench [--requests 200] [--concurrency 32]
+"""
+import time
+import json
+import asyncio
+import argparse
+import threading
+import statistics
+
+import httpx
+import uvicorn
+
+from benchmarks import stubs
+from backend import api, context_retrival, llm_handler, response_manager
+from backend.llm_dispatcher import HedgedDispatcher
+
+PORT = 8765
+ANSWER = "Upgrading to a P2M merchant takes up to 24 hours once the request is approved."
+
+
+def install_stubs(llm_latency):
+    context_retrival.embedding_model = stubs.StubEmbeddings(0.05)
+    context_retrival.pc = stubs.StubPinecone(0.03)
+    context_retrival.dense_idx = stubs.StubIndex("dense", 0.04)
+    context_retrival.sparse_idx = stubs.StubIndex("sparse", 0.04)
+    # Every query is distinct; measure the full pipeline rather than the answer cache
+    response_manager.ANSWER_CACHE_ENABLED = False
+    llm_handler.dispatcher = HedgedDispatcher([("Fake", stubs.FakeLLMProvider("Fake", latency=llm_latency))], max_workers=64)
+    streaming = stubs.fake_stream_provider(ANSWER, first_token_latency=llm_latency, token_latency=0.01)
+    response_manager.query_llm_stream = lambda prompt, providers=None: llm_handler.query_llm_stream(prompt, providers or [("Fake", streaming)])
+
+
+def start_server():
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def ask(client, i):
+    start = time.perf_counter()
+    reply = await client.post("/ask", json={"query": f"How do I become a P2M merchant? #{i}"})
+    return reply.status_code, time.perf_counter() - start, None
+
+
+async def ask_stream(client, i):
+    start = time.perf_counter()
+    first_token = None
+    async with client.stream("POST", "/ask/stream", json={"query": f"How do I become a P2M merchant? #{i}"}) as reply:
+        async for line in reply.aiter_lines():
+            if first_token is None and line == "event: token":
+                first_token = time.perf_counter() - start
+        status = reply.status_code
+    return status, time.perf_counter() - start, first_token
+
+
+async def run_load(call, total, concurrency):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=120) as client:
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with gate:
+                return await call(client, i)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(total)))
+        return results, time.perf_counter() - start
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(label, results, elapsed):
+    ok = [seconds for status, seconds, _ in results if status == 200]
+    shed = sum(1 for status, _, _ in results if status == 503)
+    line = f"{label:<24} {len(ok) / elapsed:>7.1f} req/s"
+    if ok:
+        line += f"   p50 {percentile(ok, 0.5) * 1000:>7.1f}ms   p99 {percentile(ok, 0.99) * 1000:>7.1f}ms"
+    first_tokens = [first for status, _, first in results if status == 200 and first is not None]
+    if first_tokens:
+        line += f"   first token p50 {statistics.median(first_tokens) * 1000:>6.1f}ms"
+    print(f"{line}   ok {len(ok)}   503 {shed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=api.API_MAX_IN_FLIGHT)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    install_stubs(args.llm_latency)
+    server, thread = start_server()
+    try:
+        single = args.llm_latency + 0.05 + 0.04
+        print(f"Stub pipeline latency ~{single * 1000:.0f}ms; {args.requests} requests at concurrency {args.concurrency}")
+        report("/ask", *asyncio.run(run_load(ask, args.requests, args.concurrency)))
+        report("/ask/stream", *asyncio.run(run_load(ask_stream, args.requests, args.concurrency)))
+        # Offer twice the admission limit: the excess is shed with 503 instead of queueing
+        report("/ask overload (2x)", *asyncio.run(run_load(ask, args.requests, 2 * api.API_MAX_IN_FLIGHT)))
+        print("health:", json.dumps(httpx.get(f"http://127.0.0.1:{PORT}/health").json()))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compares one-request-per-chunk embedding with batched, concurrent embedding
+against a stub embedding client with a fixed per-request latency.
+
+Run from the repository root:
+    python -m benchmarks.batch_embedding_bench
+"""
+import time
+
+from benchmarks import stubs
+from backend.batch_embedding import embed_in_batches
+
+CHUNKS = 400
+LATENCY = 0.02  # seconds per HTTP request
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FlakyEmbeddings(stubs.StubEmbeddings):
+    """Rejects every `every`-th request with a 429, like a provider enforcing a rate limit."""
+
+    def __init__(self, latency, every=7):
+        super().__init__(latency)
+        self.every = every
+
+    def embed_documents(self, texts):
+        if (self.calls + 1) % self.every == 0:
+            self.calls += 1
+            raise RateLimitError("Rate limit reached for requests")
+        return super().embed_documents(texts)
+
+
+def main():
+    texts = [f"Chunk {i}: JioPay Business lets merchants accept payments via UPI, cards and POS." for i in range(CHUNKS)]
+
+    client = stubs.StubEmbeddings(LATENCY)
+    start = time.perf_counter()
+    for text in texts:
+        client.embed_query(text)
+    serial = time.perf_counter() - start
+    print(f"serial embed_query: {serial:.2f}s, {client.calls} requests, {CHUNKS / serial:.1f} chunks/sec\n")
+
+    for batch_size, workers in [(16, 1), (64, 1), (16, 4), (64, 4)]:
+        client = stubs.StubEmbeddings(LATENCY)
+        _, summary = embed_in_batches(client, texts, batch_size=batch_size, max_workers=workers)
+        print(f"-> batch {batch_size}, {workers} workers: {client.calls} requests, {serial / summary['seconds']:.0f}x faster\n")
+
+    client = FlakyEmbeddings(LATENCY)
+    vectors, summary = embed_in_batches(client, texts, batch_size=16, max_workers=4, base_delay=0.01)
+    assert len(vectors) == CHUNKS
+    print(f"-> with injected 429s: {summary['retries']} retries, all {len(vectors)} chunks embedded")
+
+
+if __name__ == "__main__":
+    main()
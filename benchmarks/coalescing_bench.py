@@ -0,0 +1,83 @@
+"""
+Burst of identical questions with and without request coalescing (single-flight),
+against stubbed retrieval and LLM backends. Reports provider calls and latency.
+
+Run from the repository root:
+    python -m benchmarks.coalescing_bench [--burst 50]
+"""
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import stubs
+from backend import context_retrival, llm_handler, response_manager
+from backend.llm_dispatcher import HedgedDispatcher
+
+ANSWER = "Upgrading to a P2M merchant takes up to 24 hours once the request is approved."
+# Spellings that normalize to the same question
+VARIANTS = ["How do I become a P2M merchant?", "how do i become a p2m merchant", "How do I  become a P2M merchant ?"]
+
+
+class CountingStream:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.stream = stubs.fake_stream_provider(ANSWER, first_token_latency=0.3, token_latency=0.01)
+
+    def __call__(self, prompt):
+        with self.lock:
+            self.calls += 1
+        return self.stream(prompt)
+
+
+def install_stubs():
+    embeddings = stubs.StubEmbeddings(0.05)
+    context_retrival.embedding_model = embeddings
+    context_retrival.pc = stubs.StubPinecone(0.03)
+    context_retrival.dense_idx = stubs.StubIndex("dense", 0.04)
+    context_retrival.sparse_idx = stubs.StubIndex("sparse", 0.04)
+    # The burst arrives before any answer exists; keep the answer cache out of the comparison
+    response_manager.ANSWER_CACHE_ENABLED = False
+    llm = stubs.FakeLLMProvider("Fake", latency=0.3)
+    llm_handler.dispatcher = HedgedDispatcher([("Fake", llm)], max_workers=64)
+    streaming = CountingStream()
+    response_manager.query_llm_stream = lambda prompt, providers=None: llm_handler.query_llm_stream(prompt, providers or [("Fake", streaming)])
+    return embeddings, llm, streaming
+
+
+def burst(call, size):
+    context_retrival.dense_cache.clear()
+    context_retrival.sparse_cache.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=size) as pool:
+        results = list(pool.map(call, [VARIANTS[i % len(VARIANTS)] for i in range(size)]))
+    return results, time.perf_counter() - start
+
+
+def read_stream(query):
+    return "".join(response_manager.response_stream(query)["response"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=50)
+    args = parser.parse_args()
+    embeddings, llm, streaming = install_stubs()
+
+    print(f"{'mode':<26} {'LLM calls':>10} {'embed calls':>12} {'burst time':>11}")
+    for coalesce in (False, True):
+        response_manager.COALESCE_REQUESTS = coalesce
+        for label, call, counter in (("response", response_manager.response, llm), ("response_stream", read_stream, streaming)):
+            before_llm, before_embed = counter.calls, embeddings.calls
+            results, elapsed = burst(call, args.burst)
+            if label == "response_stream":
+                assert all(text == ANSWER for text in results)
+            mode = f"{label} {'coalesced' if coalesce else 'independent'}"
+            print(f"{mode:<26} {counter.calls - before_llm:>10} {embeddings.calls - before_embed:>12} {elapsed * 1000:>9.0f}ms")
+
+    print("coalescing:", response_manager.coalescing_stats())
+
+
+if __name__ == "__main__":
+    main()
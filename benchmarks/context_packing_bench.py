@@ -0,0 +1,67 @@
+"""
+Prompt tokens before and after context packing (dedupe, overlap merge, token budget)
+on real retrieval results: every help-centre question is run through a local index
+(hashing stub embeddings, as in retrieval_bench) and its fused top_k is packed.
+Also checks that the gold chunk survives packing.
+
+Run from the repository root:
+    python -m benchmarks.context_packing_bench [--chunk-size 250] [--top-k 5] [--budget 1200]
+"""
+import time
+import argparse
+import tempfile
+import statistics
+
+from benchmarks import stubs
+from benchmarks.retrieval_bench import load_corpus, build_index
+from backend.fusion import fuse
+from backend.context_retrival import RetrievedChunk
+from backend.context_packer import pack_context
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=250)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=1200)
+    parser.add_argument("--with-pdfs", action="store_true")
+    args = parser.parse_args()
+
+    embeddings = stubs.HashingEmbeddings()
+    docs, queries = load_corpus(args.with_pdfs)
+    with tempfile.TemporaryDirectory() as path:
+        index, chunk_ids = build_index(docs, args.chunk_size, embeddings, path, None)
+        texts = dict(zip(index.ids, (metadata["source_text"] for metadata in index.metadata)))
+
+        before, after, latencies = [], [], []
+        totals = {"duplicates": 0, "merged": 0, "over_budget": 0}
+        gold_before = gold_after = 0
+        for question, doc in queries:
+            vector = embeddings.embed_query(question)
+            fused = fuse([index.query_dense(vector, args.top_k), index.query_sparse(question, args.top_k)],
+                         top_k=args.top_k, names=["dense", "sparse"])
+            chunks = [RetrievedChunk.from_match(match) for match in fused]
+
+            start = time.perf_counter()
+            packed, report = pack_context(chunks, args.budget)
+            latencies.append(time.perf_counter() - start)
+
+            before.append(report["tokens_before"])
+            after.append(report["tokens_after"])
+            for key in totals:
+                totals[key] += report[key]
+            gold_texts = [texts[chunk_id] for chunk_id in chunk_ids[doc]]
+            gold_before += any(gold in chunk.text for chunk in chunks for gold in gold_texts)
+            gold_after += any(gold in chunk.text for chunk in packed for gold in gold_texts)
+
+    print(f"{len(queries)} questions, chunk size {args.chunk_size}, top_k {args.top_k}, budget {args.budget} tokens")
+    print(f"context tokens   mean {statistics.mean(before):.0f} → {statistics.mean(after):.0f} "
+          f"({1 - sum(after) / sum(before):.1%} saved)")
+    print(f"removed          {totals['duplicates']} duplicates, {totals['merged']} merged overlaps, "
+          f"{totals['over_budget']} over budget")
+    print(f"gold chunk kept  {gold_after}/{gold_before} of the questions whose gold chunk was retrieved")
+    print(f"pack latency     p50 {statistics.median(latencies) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
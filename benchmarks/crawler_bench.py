@@ -0,0 +1,98 @@
+"""
+Crawls a synthetic static site served from a local HTTP server and reports pages/sec.
+Pages link to each other (plus duplicate spellings of the same URL, fragments, utm_
+parameters, mailto: and external links), and every response is delayed to mimic a
+remote site. The crawl must find every page exactly once, also when it is re-run
+into the same output file (as after a crash).
+
+Run from the repository root:
+    python -m benchmarks.crawler_bench [--pages 300] [--latency 0.02] [--fetcher http|playwright]
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from data_collection import scrape_data
+
+
+def build_site(root, pages, links_per_page=6, seed=0):
+    rng = random.Random(seed)
+    for i in range(pages):
+        targets = rng.sample(range(pages), links_per_page)
+        # Every page reachable: chain page i to page i + 1
+        targets.append((i + 1) % pages)
+        links = []
+        for j, target in enumerate(targets):
+            href = f"/page/{target}/"
+            variant = j % 4
+            if variant == 1:
+                href = f"/page/{target}"
+            elif variant == 2:
+                href = f"/page/{target}/#section-{j}"
+            elif variant == 3:
+                href = f"/page/{target}/?utm_source=nav"
+            links.append(f'<a href="{href}">Page {target}</a>')
+        links.append('<a href="mailto:merchant.support@jiopay.in">Mail</a>')
+        links.append('<a href="https://example.com/elsewhere">External</a>')
+        body = "".join(f"<p>Synthetic paragraph {k} of page {i} about JioPay Business payments.</p>" for k in range(5))
+        html = f"<html><head><title>Page {i}</title></head><body>{body}{''.join(links)}</body></html>"
+        os.makedirs(os.path.join(root, "page", str(i)), exist_ok=True)
+        with open(os.path.join(root, "page", str(i), "index.html"), "w", encoding="utf-8") as file:
+            file.write(html)
+    with open(os.path.join(root, "index.html"), "w", encoding="utf-8") as file:
+        file.write('<html><head><title>Home</title></head><body><p>Home</p><a href="/page/0/">Start</a></body></html>')
+
+
+class SlowHandler(SimpleHTTPRequestHandler):
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the server waits before each response")
+    parser.add_argument("--fetcher", choices=["http", "playwright"], default="http")
+    parser.add_argument("--workers", default="1,4,8,16", help="Comma-separated worker counts to compare")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        build_site(root, args.pages)
+        SlowHandler.latency = args.latency
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(SlowHandler, directory=root))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        start_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+        print(f"{args.pages + 1} pages, {args.latency * 1000:.0f}ms server latency, {args.fetcher} fetcher")
+        def crawl(output, workers):
+            stats = asyncio.run(scrape_data.run(start_url, output, args.fetcher, workers=workers, per_host=workers))
+            with open(output, "r", encoding="utf-8") as file:
+                urls = [json.loads(line)["url"] for line in file]
+            assert len(urls) == len(set(urls)) == args.pages + 1, (len(urls), len(set(urls)))
+            return stats
+
+        for workers in (int(count) for count in args.workers.split(",")):
+            output = os.path.join(root, f"crawl-{workers}.jsonl")
+            stats = crawl(output, workers)
+            print(f"workers {workers:>3}: {stats['pages']} pages in {stats['seconds']:.2f}s "
+                  f"({stats['pages_per_sec']} pages/sec, {stats['failed']} failed)")
+        crawl(output, workers)
+        print(f"re-run into {os.path.basename(output)}: every page still written once")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+FAQ fast path hit rate, precision and lookup latency on the help-centre questions.
+
+Each FAQ question is asked as-is, reformatted (case, punctuation, spacing), with
+typos and with a conversational prefix; a hit counts as correct when it returns that
+question's own answer. Out-of-scope questions (the PDFs' topics, unrelated requests)
+must miss, and so must near-copies of FAQ questions with one word changed that changes
+the meaning (P2M/P2PM, credited/debited, an added "not", another amount), since no
+curated answer fits them. Swept over several match thresholds.
+
+Run from the repository root:
+    python -m benchmarks.faq_bench [--thresholds 0.6,0.7,0.8,0.9]
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from backend.faq_index import FaqIndex, question_key
+from backend.parallel_loader import iter_json_records
+
+HELPCENTRE_FILE = "data_collection/helpcentre.json"
+
+OUT_OF_SCOPE = [
+    "What is the remuneration policy for directors?",
+    "When is the annual general meeting of JPSL?",
+    "How are independent directors selected?",
+    "How do I file a grievance with the nodal officer?",
+    "What is the paid-up share capital in the annual return?",
+    "Who are the key managerial personnel?",
+    "What is the weather in Mumbai today?",
+    "Write me a poem about payments",
+    "How do I reset my Jio SIM PIN?",
+    "Can I open a savings account with JioPay Business?",
+    "What is the stock price of Reliance Industries?",
+    "How do I book a train ticket?",
+    "What is UPI Lite and how is it different from UPI?",
+    "Is JioPay Business available in Nepal?",
+    "How many employees does Jio Payment Solutions have?",
+]
+
+# One word away from an FAQ question, but asking something else
+MEANING_CHANGED = [
+    "What are Limitations of being a P2M Merchant?",
+    "What are benefits of becoming a P2PM merchant?",
+    "Who are P2M Merchants?",
+    "How long would it require to become P2PM merchant after upgradation request?",
+    "How long would it require to become P2M merchant after downgradation request?",
+    "In case of transaction timeout how to check if money is debited or not?",
+    "What should I do if refund is not debited in my customer’s account?",
+    "How can I not create Collect link?",
+    "What is the minimum amount for debit without 2FA in subsequent payment?",
+    "What if a P2PM Merchant merchants breaches ₹ 2,00,000/- monthly limit?",
+    "What if a P2M Merchant merchants breaches ₹ 1,00,000/- monthly limit?",
+]
+
+
+def load_entries(path=HELPCENTRE_FILE):
+    entries = []
+    for layout, url, record in iter_json_records(path):
+        if layout != "content":
+            continue
+        for item in record.get("text", []):
+            if item.get("question") and item.get("answer"):
+                entries.append({"question": item["question"], "answer": item["answer"],
+                                "section": record.get("section", ""), "url": url})
+    return entries
+
+
+def reformat(question, rng):
+    return "  " + question.upper().rstrip("?").replace(",", "") + " ? "
+
+
+def typos(question, rng, count=2):
+    chars = list(question)
+    for _ in range(count):
+        i = rng.randrange(1, len(chars) - 1)
+        if chars[i].isalpha() and chars[i + 1].isalpha():
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars)
+
+
+def prefixed(question, rng):
+    return rng.choice(["Please tell me, ", "Hi, ", "Quick question: "]) + question[0].lower() + question[1:]
+
+
+VARIANTS = {
+    "exact": lambda question, rng: question,
+    "reformatted": reformat,
+    "typos": typos,
+    "prefixed": prefixed,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thresholds", default="0.6,0.7,0.8,0.9")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    entries = load_entries()
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "faq_index.json")
+        kept, ambiguous = FaqIndex.build(entries, path)
+        print(f"{kept} FAQ questions ({ambiguous} ambiguous left out), {len(OUT_OF_SCOPE)} out-of-scope "
+              f"and {len(MEANING_CHANGED)} meaning-changed questions")
+
+        for threshold in (float(value) for value in args.thresholds.split(",")):
+            index = FaqIndex.load(path, threshold)
+            answers = {question_key(entry["question"]): entry["answer"] for entry in index.entries}
+            rng = random.Random(args.seed)
+            print(f"\nthreshold {threshold}")
+            print(f"{'queries':<16}{'hit rate':>10}{'precision':>11}{'p50 µs':>9}{'p99 µs':>9}")
+            misses = {"out of scope": OUT_OF_SCOPE, "meaning changed": MEANING_CHANGED}
+            for name, variant in list(VARIANTS.items()) + [(name, None) for name in misses]:
+                cases = [(question, None) for question in misses[name]] if variant is None else \
+                    [(variant(entry["question"], rng), answers[question_key(entry["question"])]) for entry in index.entries]
+                hits = correct = 0
+                latencies = []
+                for query, expected in cases:
+                    start = time.perf_counter()
+                    result = index.answer(query)
+                    latencies.append(time.perf_counter() - start)
+                    if result is not None:
+                        hits += 1
+                        correct += result["response"] == expected
+                latencies.sort()
+                precision = f"{correct / hits:.1%}" if hits else "-"
+                print(f"{name:<16}{hits / len(cases):>10.1%}{precision:>11}"
+                      f"{statistics.median(latencies) * 1e6:>9.0f}{latencies[int(len(latencies) * 0.99)] * 1e6:>9.0f}")
+            print(f"stats {index.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Offline calibration of the retrieval-confidence gate: runs backend.calibrate_gate's
+calibration and report against a local index of the corpus (hashing stub embeddings,
+as in retrieval_bench) instead of the configured retriever, so it needs no API keys.
+The thresholds it finds only apply to this stub setup; calibrate the real retriever
+with `python -m backend.calibrate_gate`.
+
+Run from the repository root:
+    python -m benchmarks.gate_bench [--chunk-size 500] [--target-recall 0.98] [--with-pdfs]
+"""
+import argparse
+import tempfile
+
+from benchmarks import stubs
+from benchmarks.retrieval_bench import load_corpus, build_index
+from backend.fusion import fuse
+from backend.context_retrival import RetrievedChunk
+from backend.calibrate_gate import load_labeled, collect_samples, calibrate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--target-recall", type=float, default=0.98)
+    parser.add_argument("--min-k", type=int, default=2)
+    parser.add_argument("--max-loss", type=float, default=0.01)
+    parser.add_argument("--with-pdfs", action="store_true")
+    args = parser.parse_args()
+
+    embeddings = stubs.HashingEmbeddings()
+    docs, _ = load_corpus(args.with_pdfs)
+    labeled = load_labeled()
+    with tempfile.TemporaryDirectory() as path:
+        index, _ = build_index(docs, args.chunk_size, embeddings, path, None)
+
+        def search(query, top_k):
+            vector = embeddings.embed_query(query)
+            fused = fuse([index.query_dense(vector, top_k), index.query_sparse(query, top_k)],
+                         top_k=top_k, names=["dense", "sparse"])
+            return [RetrievedChunk.from_match(match) for match in fused]
+
+        samples = collect_samples(labeled, search, args.top_k)
+
+    in_scope = sum(1 for sample in samples if sample["in_scope"])
+    print(f"{len(samples)} labeled queries ({in_scope} in scope, {len(samples) - in_scope} out of scope), "
+          f"{len(index)} chunks of {args.chunk_size} characters")
+    calibrate(samples, args.target_recall, args.min_k, args.top_k, args.max_loss)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares sequential and concurrent hybrid search against stubbed OpenAI and
+Pinecone clients that inject latency.
+
+Run from the repository root:
+    python -m benchmarks.hybrid_search_bench
+"""
+import time
+import statistics
+
+from benchmarks import stubs
+from backend import context_retrival
+
+QUERY = "How to become P2M merchant?"
+ROUNDS = 10
+
+# (dense embed, sparse embed, dense query, sparse query) latencies in seconds
+SCENARIOS = [
+    ("balanced", 0.10, 0.05, 0.05, 0.05),
+    ("slow dense", 0.25, 0.03, 0.08, 0.03),
+    ("slow sparse", 0.05, 0.20, 0.03, 0.10),
+]
+
+
+def install_stubs(dense_embed, sparse_embed, dense_query, sparse_query):
+    context_retrival.embedding_model = stubs.StubEmbeddings(dense_embed)
+    context_retrival.pc = stubs.StubPinecone(sparse_embed)
+    context_retrival.dense_idx = stubs.StubIndex("dense", dense_query)
+    context_retrival.sparse_idx = stubs.StubIndex("sparse", sparse_query)
+
+
+def sequential_search(query, top_k=5):
+    """The original behaviour: all four round trips one after another."""
+    combined = context_retrival.dense_search(query, top_k) + context_retrival.sparse_search(query, top_k)
+    combined.sort(key=lambda x: x["score"], reverse=True)
+    return combined[:top_k]
+
+
+def time_calls(fn):
+    timings = []
+    for _ in range(ROUNDS):
+        # Measure cold lookups; the embedding caches would otherwise hide the round trips
+        context_retrival.dense_cache.clear()
+        context_retrival.sparse_cache.clear()
+        start = time.perf_counter()
+        fn(QUERY, top_k=5)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    print(f"{'scenario':<12} {'sequential':>12} {'concurrent':>12} {'slower branch':>14}")
+    for name, dense_embed, sparse_embed, dense_query, sparse_query in SCENARIOS:
+        install_stubs(dense_embed, sparse_embed, dense_query, sparse_query)
+        sequential_ms = time_calls(sequential_search)
+        concurrent_ms = time_calls(context_retrival.hybrid_search)
+        slower_ms = max(dense_embed + dense_query, sparse_embed + sparse_query) * 1000
+        print(f"{name:<12} {sequential_ms:>10.1f}ms {concurrent_ms:>10.1f}ms {slower_ms:>12.1f}ms")
+
+    # Warm embedding caches leave only the two index queries
+    install_stubs(0.10, 0.05, 0.05, 0.05)
+    context_retrival.hybrid_search(QUERY, top_k=5)
+    start = time.perf_counter()
+    context_retrival.hybrid_search("  how to become P2M merchant ", top_k=5)
+    print(f"\nbalanced, warm embedding cache: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # A branch that exceeds the timeout is dropped instead of stalling the answer
+    install_stubs(0.02, 1.5, 0.02, 0.02)
+    context_retrival.dense_cache.clear()
+    context_retrival.sparse_cache.clear()
+    start = time.perf_counter()
+    results = context_retrival.hybrid_search(QUERY, top_k=5, timeout=0.2)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"sparse stalled 1.5s, timeout 0.2s: {elapsed_ms:.1f}ms, {len(results)} dense matches returned")
+
+
+if __name__ == "__main__":
+    main()
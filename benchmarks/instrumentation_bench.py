@@ -0,0 +1,55 @@
+"""
+Cost of the instrumentation spans, and what they record for one answer, using
+stubbed retrieval and LLM backends.
+
+Run from the repository root:
+    python -m benchmarks.instrumentation_bench
+"""
+import time
+import json
+
+from benchmarks import stubs
+from backend import context_retrival, instrumentation, llm_handler, response_manager
+from backend.llm_dispatcher import HedgedDispatcher
+
+LOOPS = 200_000
+
+
+def span_cost():
+    start = time.perf_counter()
+    for _ in range(LOOPS):
+        with instrumentation.span("bench", provider="stub"):
+            pass
+    return (time.perf_counter() - start) / LOOPS * 1e9
+
+
+def install_stubs():
+    context_retrival.embedding_model = stubs.StubEmbeddings(0.05)
+    context_retrival.pc = stubs.StubPinecone(0.03)
+    context_retrival.dense_idx = stubs.StubIndex("dense", 0.04)
+    context_retrival.sparse_idx = stubs.StubIndex("sparse", 0.06)
+    context_retrival.retriever = context_retrival.PineconeRetriever()
+    llm_handler.dispatcher = HedgedDispatcher([("Fake", stubs.FakeLLMProvider("Fake", latency=0.3))])
+
+
+def main():
+    instrumentation.INSTRUMENTATION_ENABLED = False
+    disabled = span_cost()
+    instrumentation.INSTRUMENTATION_ENABLED = True
+    enabled = span_cost()
+    instrumentation.registry.clear()
+    print(f"span overhead: {disabled:.0f}ns disabled, {enabled:.0f}ns enabled (per span)")
+
+    install_stubs()
+    result = response_manager.response("How do I become a P2M merchant?", timings=True)
+    print("\ntimings of one response():")
+    for entry in result["timings"]:
+        print("  " + json.dumps(entry))
+
+    print("\nPrometheus export (excerpt):")
+    lines = instrumentation.registry.export_prometheus().splitlines()
+    print("\n".join(line for line in lines if not line.startswith(f"{instrumentation.STAGE_METRIC}_bucket")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares strictly sequential provider fallback (the previous query_llm) with the
+hedged dispatcher, using fake providers with configurable latency and failure rates.
+
+Run from the repository root:
+    python -m benchmarks.llm_dispatch_bench
+"""
+import io
+import time
+import statistics
+import contextlib
+
+from benchmarks import stubs
+from backend.llm_dispatcher import HedgedDispatcher, NETWORK_ERRORS
+
+REQUESTS = 60
+
+
+def make_providers(seed):
+    return [
+        # Usually fast, but with a heavy tail and occasional dropped connections
+        ("Primary", stubs.FakeLLMProvider("Primary", latency=0.10, tail_latency=1.5, tail_rate=0.15,
+                                          network_error_rate=0.05, seed=seed)),
+        ("Secondary", stubs.FakeLLMProvider("Secondary", latency=0.15, seed=seed + 1)),
+        ("Tertiary", stubs.FakeLLMProvider("Tertiary", latency=0.25, failure_rate=0.2, seed=seed + 2)),
+    ]
+
+
+def sequential_fallback(providers, prompt, max_retries=3, delay=0.2):
+    """The previous query_llm loop: one provider at a time, fixed sleep between network retries."""
+    for name, function in providers:
+        for _ in range(max_retries):
+            try:
+                response = function(prompt)
+                if response:
+                    return response
+            except NETWORK_ERRORS:
+                time.sleep(delay)
+                continue
+            break
+    return "Error: All LLMs failed to generate a response."
+
+
+def report(label, latencies, answers):
+    ordered = sorted(latencies)
+    ok = sum(1 for answer in answers if not answer.startswith("Error"))
+    print(
+        f"{label:<12} p50 {statistics.median(ordered) * 1000:>7.1f}ms  "
+        f"p95 {ordered[int(0.95 * (len(ordered) - 1))] * 1000:>7.1f}ms  "
+        f"max {ordered[-1] * 1000:>7.1f}ms  success {ok}/{len(answers)}"
+    )
+
+
+def run(label, call):
+    latencies, answers = [], []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            answers.append(call("prompt"))
+        latencies.append(time.perf_counter() - start)
+    report(label, latencies, answers)
+
+
+def main():
+    providers = make_providers(seed=1)
+    run("sequential", lambda prompt: sequential_fallback(providers, prompt))
+
+    providers = make_providers(seed=1)
+    dispatcher = HedgedDispatcher(providers, hedge_budget=0.3, provider_deadline=2.0, total_deadline=5.0, base_delay=0.05)
+    run("hedged", dispatcher.dispatch)
+    print(f"hedges started: {dispatcher.hedges}")
+
+    # A provider that always fails trips its circuit breaker and is skipped afterwards
+    broken = stubs.FakeLLMProvider("Broken", latency=0.2, failure_rate=1.0)
+    healthy = stubs.FakeLLMProvider("Healthy", latency=0.05)
+    dispatcher = HedgedDispatcher([("Broken", broken), ("Healthy", healthy)], hedge_budget=1.0)
+    run("breaker", dispatcher.dispatch)
+    print(f"calls to broken provider: {broken.calls} of {REQUESTS} requests, circuit {dispatcher.stats()['providers']['Broken']['circuit']}")
+
+
+if __name__ == "__main__":
+    main()
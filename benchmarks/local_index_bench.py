@@ -0,0 +1,77 @@
+"""
+Measures query latency of the in-process LocalIndex and of hybrid_search on
+top of it, fully offline (stub embeddings, no Pinecone or OpenAI calls).
+
+Run from the repository root:
+    python -m benchmarks.local_index_bench
+"""
+import json
+import time
+import tempfile
+import statistics
+
+from benchmarks import stubs
+from backend import context_retrival
+from backend.local_index import LocalIndex
+
+CORPUS_SIZE = 3000
+ROUNDS = 200
+
+
+def helpcentre_chunks(path="data_collection/helpcentre.json"):
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    for section in data["content"]:
+        for item in section.get("text", []):
+            yield section["section"], f"Q: {item.get('question', '')}\nA: {item.get('answer', '')}"
+
+
+def build_vectors():
+    chunks = list(helpcentre_chunks())
+    vectors = []
+    for i in range(CORPUS_SIZE):
+        section, text = chunks[i % len(chunks)]
+        if i >= len(chunks):
+            text = f"{text} (copy {i // len(chunks)})"
+        vectors.append({
+            "id": f"doc-{i}",
+            "values": stubs.fake_dense_vector(text),
+            "metadata": {"category": "stub", "source_text": text, "section": section},
+        })
+    return vectors
+
+
+def time_us(fn, *args):
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def main():
+    vectors = build_vectors()
+    query = "How can I download the JioPay Business App?"
+    query_vector = stubs.fake_dense_vector(query)
+
+    with tempfile.TemporaryDirectory() as path:
+        brute = LocalIndex.build(vectors, path)
+        print(f"{len(brute)} chunks x {brute.dense.shape[1]} dims")
+        print(f"dense brute force  {time_us(brute.query_dense, query_vector, 5):>9.1f}us")
+        print(f"sparse BM25        {time_us(brute.query_sparse, query, 5):>9.1f}us")
+
+        ivf = LocalIndex.build(vectors, path, ivf_lists=32)
+        print(f"dense IVF (32/4)   {time_us(ivf.query_dense, query_vector, 5):>9.1f}us")
+
+        # hybrid_search over the local backend, query embedding already cached
+        context_retrival.embedding_model = stubs.StubEmbeddings()
+        context_retrival.retriever = context_retrival.LocalRetriever(brute)
+        context_retrival.hybrid_search(query)
+        print(f"hybrid_search      {time_us(context_retrival.hybrid_search, query):>9.1f}us")
+        for result in context_retrival.hybrid_search(query, top_k=3):
+            print(f"  {result.score:.3f} {result.text[:70]!r}")
+
+
+if __name__ == "__main__":
+    main()
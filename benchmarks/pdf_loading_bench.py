@@ -0,0 +1,44 @@
+"""
+Compares serial and process-pool PDF parsing over the PDFs in data_collection/,
+plus a warm run served from the page-text cache.
+
+Run from the repository root:
+    python -m benchmarks.pdf_loading_bench
+"""
+import glob
+import time
+import tempfile
+
+from pypdf import PdfReader
+from backend.parallel_loader import iter_pdf_pages
+
+PDF_FILES = sorted(glob.glob("data_collection/*.pdf"))
+
+
+def serial_pages(pdf_files):
+    """What load_pdfs used to do: one PDF at a time, one page at a time."""
+    for pdf in pdf_files:
+        for page in PdfReader(pdf).pages:
+            yield pdf, page.extract_text()
+
+
+def timed(label, pages_iter, baseline=None):
+    start = time.perf_counter()
+    pages = list(pages_iter)
+    elapsed = time.perf_counter() - start
+    speedup = f"{baseline / elapsed:.1f}x" if baseline else ""
+    print(f"{label:<24} {elapsed:>7.2f}s {len(pages):>5} pages {speedup:>7}")
+    return elapsed, pages
+
+
+def main():
+    print(f"{len(PDF_FILES)} PDFs\n")
+    serial, serial_result = timed("serial", serial_pages(PDF_FILES))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        _, parallel_result = timed("parallel (cold cache)", iter_pdf_pages(PDF_FILES, cache_dir=cache_dir), serial)
+        timed("parallel (warm cache)", iter_pdf_pages(PDF_FILES, cache_dir=cache_dir), serial)
+    assert parallel_result == serial_result, "parallel extraction must match serial output"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Per-call overhead of building a new ChatOpenAI client for every request (the
+previous behaviour) versus reusing one from the ProviderRegistry, against a
+local OpenAI-compatible HTTP stub server. Also counts TCP connections opened.
+The stub speaks plain HTTP, so real-world savings are larger (no TLS handshakes here).
+
+Run from the repository root:
+    python -m benchmarks.provider_registry_bench
+"""
+import json
+import time
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_openai import ChatOpenAI
+from backend.provider_registry import ProviderRegistry
+
+CALLS = 100
+
+COMPLETION = json.dumps({
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}).encode("utf-8")
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # avoid 40ms delayed-ACK stalls on small responses
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubOpenAIHandler.lock:
+            StubOpenAIHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(label, get_llm):
+    StubOpenAIHandler.connections = 0
+    timings = []
+    for _ in range(CALLS):
+        start = time.perf_counter()
+        get_llm().invoke("ping")
+        timings.append(time.perf_counter() - start)
+    print(f"{label:<28} median {statistics.median(timings) * 1000:>6.2f}ms   "
+          f"mean {statistics.mean(timings) * 1000:>6.2f}ms   TCP connections {StubOpenAIHandler.connections}")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    measure("new client per call", lambda: ChatOpenAI(model_name="gpt-4o-mini", openai_api_key="sk-stub", base_url=base_url))
+
+    registry = ProviderRegistry()
+    registry.register("openai", lambda registry: ChatOpenAI(
+        model_name="gpt-4o-mini", openai_api_key="sk-stub", base_url=base_url, http_client=registry.http_client
+    ))
+    measure("registry (shared pool)", lambda: registry.get("openai"))
+    print(registry.stats())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
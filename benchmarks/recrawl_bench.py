@@ -0,0 +1,109 @@
+"""
+Full crawl versus incremental re-crawl of the synthetic site from crawler_bench.
+After a first crawl records the crawl state, the site is edited: some pages get new
+text, some only new markup, some are deleted and one new page is linked in. The
+re-crawl sends conditional requests (the local server answers If-Modified-Since with
+304) and must report exactly those edits in its change set.
+
+Run from the repository root:
+    python -m benchmarks.recrawl_bench [--pages 300] [--latency 0.02] [--edits 10]
+"""
+import os
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+from data_collection import scrape_data
+from benchmarks.crawler_bench import build_site, SlowHandler
+
+
+def page_file(root, page):
+    return os.path.join(root, "page", str(page), "index.html")
+
+
+def rewrite(root, page, old, new):
+    path = page_file(root, page)
+    with open(path, "r", encoding="utf-8") as file:
+        html = file.read()
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(html.replace(old, new, 1))
+    # Last-Modified has one-second resolution: move edited files clearly past the first crawl
+    later = time.time() + 5
+    os.utime(path, (later, later))
+
+
+def edit_site(root, pages, edits, seed=1):
+    """Edits the site in place; returns the URL paths expected in each part of the change set."""
+    rng = random.Random(seed)
+    chosen = rng.sample(range(1, pages - 1), edits * 3)
+    text_edits, markup_edits, deletions = chosen[:edits], chosen[edits:2 * edits], chosen[2 * edits:]
+    for page in text_edits:
+        rewrite(root, page, "Synthetic paragraph 0", "Updated paragraph 0")
+    for page in markup_edits:
+        rewrite(root, page, "<body>", '<body class="redesigned">')
+    for page in deletions:
+        shutil.rmtree(os.path.dirname(page_file(root, page)))
+    # A new page, linked from page 0 (which therefore changes too)
+    os.makedirs(os.path.join(root, "page", "new"), exist_ok=True)
+    with open(page_file(root, "new"), "w", encoding="utf-8") as file:
+        file.write("<html><head><title>New</title></head><body><p>A brand new page.</p></body></html>")
+    rewrite(root, 0, "</body>", '<p>See also the new page.</p><a href="/page/new/">New</a></body>')
+    return {
+        "added": ["/page/new"],
+        "changed": [f"/page/{page}" for page in text_edits + [0]],
+        "removed": [f"/page/{page}" for page in deletions],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the server waits before each response")
+    parser.add_argument("--edits", type=int, default=10, help="Pages edited in each way (text, markup, deleted)")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        site = os.path.join(root, "site")
+        build_site(site, args.pages)
+        SlowHandler.latency = args.latency
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(SlowHandler, directory=site))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        start_url = f"http://127.0.0.1:{server.server_address[1]}/"
+        state_path, changes_path = os.path.join(root, "state.json"), os.path.join(root, "changes.json")
+
+        def crawl(name):
+            output = os.path.join(root, f"{name}.jsonl")
+            stats = asyncio.run(scrape_data.run(start_url, output, "http", workers=args.workers, per_host=args.workers,
+                                                state_path=state_path, changes_path=changes_path))
+            with open(output, "r", encoding="utf-8") as file:
+                written = sum(1 for _ in file)
+            with open(changes_path, "r", encoding="utf-8") as file:
+                changes = json.load(file)
+            return stats, written, changes
+
+        print(f"{args.pages + 1} pages, {args.latency * 1000:.0f}ms server latency, {args.workers} workers")
+        full, written, changes = crawl("full")
+        assert written == len(changes["added"]) == args.pages + 1, (written, len(changes["added"]))
+        print(f"full crawl   {full['seconds']:.2f}s  {written} pages written, {len(changes['added'])} added")
+
+        expected = edit_site(site, args.pages, args.edits)
+        again, written, changes = crawl("incremental")
+        found = {key: sorted(url.split(str(server.server_address[1]), 1)[1] for url in changes[key]) for key in expected}
+        assert found == {key: sorted(urls) for key, urls in expected.items()}, found
+        print(f"re-crawl     {again['seconds']:.2f}s  {written} pages written: {again['added']} added, "
+              f"{again['changed']} changed, {again['removed']} removed")
+        print(f"             {again['not_modified']} answered 304, {again['unchanged']} re-fetched with unchanged text "
+              f"(markup-only edits), {again['failed']} failed")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Offline retrieval quality and latency: recall@k, MRR and latency of dense-only,
+sparse-only (BM25) and fused retrieval over a local index, for several top_k values
+and chunk sizes.
+
+The labeled set comes from the help-centre Q/A pairs: each question is a query and the
+chunks cut from its own Q/A pair are the gold results. The rest of the JSON corpus
+(and the PDFs with --with-pdfs) is indexed as well, as distractors.
+
+Embeddings are offline: by default a hashing stub (lexical, so dense scores mean
+something), or vectors recorded once from the real model with --record PATH and
+replayed with --embeddings PATH.
+
+Run from the repository root:
+    python -m benchmarks.retrieval_bench [--top-k 1,3,5,10] [--chunk-sizes 250,500,1000]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import itertools
+import statistics
+
+import numpy as np
+
+from benchmarks import stubs
+from backend.fusion import fuse
+from backend.local_index import LocalIndex
+from backend.batch_embedding import count_tokens
+from backend.data_injestion import (
+    JSON_FILES, PDF_FILES, iter_json_documents, iter_pdf_documents, chunk_documents, chunk_hash, dense_vector_id,
+    flat_metadata,
+)
+
+HELPCENTRE_FILE = "data_collection/helpcentre.json"
+METHODS = ("dense", "sparse", "rrf", "minmax")
+
+
+class RecordedEmbeddings:
+    """
+    Replays embeddings stored in an .npz file (text -> vector). Texts missing from the
+    recording are embedded with `model` when given (and saved by `save`), otherwise it is an error.
+    """
+
+    def __init__(self, path, model=None):
+        self.path = path
+        self.model = model
+        self.vectors = {}
+        if os.path.exists(path):
+            recorded = np.load(path, allow_pickle=False)
+            self.vectors = dict(zip(recorded["texts"].tolist(), recorded["vectors"]))
+
+    def embed_documents(self, texts):
+        missing = [text for text in dict.fromkeys(texts) if text not in self.vectors]
+        if missing:
+            if self.model is None:
+                raise KeyError(f"{len(missing)} texts are not in {self.path}; record them with --record")
+            for start in range(0, len(missing), 256):
+                batch = missing[start:start + 256]
+                self.vectors.update(zip(batch, np.asarray(self.model.embed_documents(batch), dtype=np.float32)))
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def save(self):
+        texts = list(self.vectors)
+        np.savez(self.path, texts=np.array(texts), vectors=np.stack([self.vectors[text] for text in texts]))
+
+
+def load_corpus(with_pdfs):
+    """Returns (documents, labeled queries as (question, document index))."""
+    docs = list(iter_json_documents(JSON_FILES))
+    queries = []
+    for i, doc in enumerate(docs):
+        # iter_json_documents renders help-centre pairs as "Q: ...\nA: ..."
+        if doc.metadata.get("url", "").endswith("help-center") and doc.page_content.startswith("Q: "):
+            question = doc.page_content[3:].split("\nA: ", 1)[0].strip()
+            if question:
+                queries.append((question, i))
+    if with_pdfs:
+        docs.extend(iter_pdf_documents(PDF_FILES))
+    return docs, queries
+
+
+def build_index(docs, chunk_size, embeddings, path, ivf_lists):
+    """Chunk each document as ingestion does; returns (LocalIndex, chunk ids per document)."""
+    chunk_ids = []
+    texts, ids, metadata = [], [], []
+    for doc in docs:
+        ids_of_doc = set()
+        for chunk in chunk_documents([doc], chunk_size=chunk_size, chunk_overlap=chunk_size // 5):
+            chunk_id = dense_vector_id(chunk_hash(chunk))
+            ids_of_doc.add(chunk_id)
+            texts.append(chunk.page_content)
+            ids.append(chunk_id)
+            metadata.append({"source_text": chunk.page_content, **flat_metadata(chunk.metadata)})
+        chunk_ids.append(ids_of_doc)
+
+    vectors = embeddings.embed_documents(texts)
+    records = [{"id": i, "values": v, "metadata": m} for i, v, m in zip(ids, vectors, metadata)]
+    return LocalIndex.build(records, path, ivf_lists=ivf_lists), chunk_ids
+
+
+def retrieve(index, method, query, query_vector, top_k):
+    """The ranking hybrid_search would produce for this method (fusion uses the same per-branch depth)."""
+    if method == "dense":
+        return index.query_dense(query_vector, top_k)
+    if method == "sparse":
+        return index.query_sparse(query, top_k)
+    return fuse([index.query_dense(query_vector, top_k), index.query_sparse(query, top_k)],
+                top_k=top_k, method=method, names=["dense", "sparse"])
+
+
+def evaluate(index, chunk_ids, queries, query_vectors, method, top_k):
+    hits, reciprocal_ranks, context_tokens, latencies = 0, [], [], []
+    for (query, doc), query_vector in zip(queries, query_vectors):
+        start = time.perf_counter()
+        results = retrieve(index, method, query, query_vector, top_k)
+        latencies.append(time.perf_counter() - start)
+
+        gold = chunk_ids[doc]
+        rank = next((position for position, result in enumerate(results, start=1) if result["id"] in gold), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        context_tokens.append(sum(count_tokens(result["metadata"]["source_text"]) for result in results))
+    return {
+        "recall": hits / len(queries),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "context_tokens": statistics.mean(context_tokens),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": sorted(latencies)[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", default="1,3,5,10", help="Comma-separated top_k values")
+    parser.add_argument("--chunk-sizes", default="250,500,1000", help="Comma-separated chunk sizes (overlap is 20%%)")
+    parser.add_argument("--methods", default=",".join(METHODS))
+    parser.add_argument("--embeddings", help="Replay embeddings recorded in this .npz file")
+    parser.add_argument("--record", help="Embed with the real OpenAI model and record the vectors to this .npz file")
+    parser.add_argument("--ivf-lists", type=int, default=None, help="Search an IVF dense index instead of brute force")
+    parser.add_argument("--with-pdfs", action="store_true", help="Also index the PDF corpus as distractors")
+    parser.add_argument("--output", help="Also write the rows as JSON to this file")
+    args = parser.parse_args()
+
+    top_ks = [int(k) for k in args.top_k.split(",")]
+    chunk_sizes = [int(size) for size in args.chunk_sizes.split(",")]
+    methods = args.methods.split(",")
+
+    if args.record:
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = RecordedEmbeddings(args.record, OpenAIEmbeddings())
+    elif args.embeddings:
+        embeddings = RecordedEmbeddings(args.embeddings)
+    else:
+        embeddings = stubs.HashingEmbeddings()
+
+    docs, queries = load_corpus(args.with_pdfs)
+    query_vectors = embeddings.embed_documents([query for query, _ in queries])
+    print(f"{len(queries)} labeled questions, {len(docs)} documents\n")
+
+    rows = []
+    header = f"{'chunk':>6} {'method':<7} {'k':>3} {'recall@k':>9} {'MRR':>6} {'ctx tokens':>11} {'p50':>8} {'p99':>8}"
+    print(header)
+    print("-" * len(header))
+    for chunk_size in chunk_sizes:
+        with tempfile.TemporaryDirectory() as path:
+            index, chunk_ids = build_index(docs, chunk_size, embeddings, path, args.ivf_lists)
+            for method, top_k in itertools.product(methods, top_ks):
+                row = {"chunk_size": chunk_size, "chunks": len(index), "method": method, "top_k": top_k,
+                       **evaluate(index, chunk_ids, queries, query_vectors, method, top_k)}
+                rows.append(row)
+                print(f"{chunk_size:>6} {method:<7} {top_k:>3} {row['recall']:>9.3f} {row['mrr']:>6.3f} "
+                      f"{row['context_tokens']:>11.0f} {row['p50_ms']:>6.2f}ms {row['p99_ms']:>6.2f}ms")
+        print()
+
+    if args.record:
+        embeddings.save()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(rows, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
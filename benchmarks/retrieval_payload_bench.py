@@ -0,0 +1,116 @@
+"""
+Bytes on the wire and client-side parse time of index query responses, before and
+after trimming the retrieval payload, against a local Pinecone-shaped HTTP stub.
+
+before: include_values=True (1536-float dense vectors and sparse vectors in every
+        match) and metadata with the JSON `origin` string decoded per match
+after:  include_values=False and flat url/section metadata read into RetrievedChunk
+
+Run from the repository root:
+    python -m benchmarks.retrieval_payload_bench
+"""
+import sys
+import json
+import time
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from benchmarks import stubs
+from backend.context_retrival import RetrievedChunk
+
+CALLS = 200
+TOP_K = 5
+
+
+def match(i, include_values, flat):
+    text = f"Q: How do I become a P2M merchant? ({i})\nA: " + "Complete the KYC steps in the JioPay Business app. " * 6
+    origin = {"url": "https://jiopay.com/business/help-center", "section": "Merchant Onboarding"}
+    metadata = {"category": "merchant onboarding kyc", "source_text": text}
+    if flat:
+        metadata.update(origin)
+    else:
+        metadata["origin"] = json.dumps(origin)
+    record = {"id": f"doc-{i:032x}", "score": 0.9 - i / 100, "metadata": metadata}
+    if include_values:
+        record["values"] = stubs.fake_dense_vector(text)
+        record["sparseValues"] = {"indices": list(range(0, 400, 10)), "values": [0.5] * 40}
+    return record
+
+
+PAYLOADS = {
+    "/before": json.dumps({"matches": [match(i, True, False) for i in range(TOP_K)], "namespace": "chatbot-namespace"}).encode(),
+    "/after": json.dumps({"matches": [match(i, False, True) for i in range(TOP_K)], "namespace": "chatbot-namespace"}).encode(),
+}
+
+
+class StubPineconeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = PAYLOADS[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def decode_before(matches):
+    """What build_prompt did per match before: metadata dict access plus json.loads of `origin`."""
+    results = []
+    for res in matches:
+        origin = json.loads(res["metadata"].get("origin", "{}"))
+        results.append({**res, "url": origin.get("url", "Unknown URL"), "section": origin.get("section", "Unknown Section")})
+    return results
+
+
+def decode_after(matches):
+    return [RetrievedChunk.from_match(res) for res in matches]
+
+
+def measure(client, path, decode):
+    wire, parse, total = [], [], []
+    results = None
+    for _ in range(CALLS):
+        start = time.perf_counter()
+        reply = client.post(path, content=b"{}")
+        received = time.perf_counter()
+        results = decode(json.loads(reply.content)["matches"])
+        done = time.perf_counter()
+        wire.append(len(reply.content))
+        parse.append(done - received)
+        total.append(done - start)
+    first = results[0]
+    fields = first.values() if isinstance(first, dict) else (getattr(first, name) for name in first.__slots__)
+    # The result object plus its immediate fields
+    per_result = sys.getsizeof(first) + sum(sys.getsizeof(value) for value in fields)
+    return {
+        "bytes": statistics.mean(wire),
+        "parse_ms": statistics.median(parse) * 1000,
+        "round_trip_ms": statistics.median(total) * 1000,
+        "result_bytes": per_result,
+    }
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubPineconeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with httpx.Client(base_url=f"http://127.0.0.1:{server.server_address[1]}") as client:
+        print(f"{TOP_K} matches per query, {CALLS} queries each")
+        print(f"{'':<8} {'bytes/query':>12} {'parse':>9} {'round trip':>11} {'result object':>14}")
+        for label, path, decode in (("before", "/before", decode_before), ("after", "/after", decode_after)):
+            row = measure(client, path, decode)
+            print(f"{label:<8} {row['bytes']:>12,.0f} {row['parse_ms']:>7.3f}ms {row['round_trip_ms']:>9.3f}ms {row['result_bytes']:>12}B")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Metadata-routed versus unfiltered hybrid retrieval over a local index of the whole
+corpus (help centre, website pages and policy PDFs; hashing stub embeddings, as in
+retrieval_bench). Routers are built at the document-family and the section level and
+swept over confidence margins; below the margin a query falls back to unfiltered search.
+
+Reports recall@k and MRR of the help-centre questions' gold chunks, how many queries
+were routed and to the right route, how many chunks each query had to score, context
+tokens and retrieval latency.
+
+Run from the repository root:
+    python -m benchmarks.routing_bench [--margins 0,0.02,0.05,0.08,0.1] [--top-k 5]
+
+Margins depend on the embedding model: tune ROUTER_MIN_MARGIN with vectors recorded
+from the real model (retrieval_bench --record PATH, then --embeddings PATH here).
+"""
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+from benchmarks import stubs
+from benchmarks.retrieval_bench import RecordedEmbeddings, load_corpus, build_index
+from backend.fusion import fuse
+from backend.batch_embedding import count_tokens
+from backend.query_router import QueryRouter, route_of
+from backend.calibrate_gate import LABELED_FILE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--margins", default="0,0.02,0.05,0.08,0.1")
+    parser.add_argument("--embeddings", help="Replay embeddings recorded in this .npz file")
+    args = parser.parse_args()
+
+    embeddings = RecordedEmbeddings(args.embeddings) if args.embeddings else stubs.HashingEmbeddings()
+    docs, queries = load_corpus(with_pdfs=True)
+    # In-scope policy-document questions: no gold chunk, but they belong to the PDFs
+    # (the labeled help-centre paraphrases name their gold FAQ question instead)
+    with open(LABELED_FILE, "r", encoding="utf-8") as file:
+        pdf_queries = [record["query"] for record in map(json.loads, filter(str.strip, file))
+                       if record["in_scope"] and not record.get("gold_question")]
+
+    with tempfile.TemporaryDirectory() as path:
+        index, chunk_ids = build_index(docs, args.chunk_size, embeddings, path, None)
+        row_of = {chunk_id: row for row, chunk_id in enumerate(index.ids)}
+        vectors = {query: embeddings.embed_query(query) for query, _ in queries}
+        vectors.update({query: embeddings.embed_query(query) for query in pdf_queries})
+
+        def search(query, metadata_filter):
+            vector = vectors[query]
+            return fuse([index.query_dense(vector, args.top_k, metadata_filter),
+                         index.query_sparse(query, args.top_k, metadata_filter)],
+                        top_k=args.top_k, names=["dense", "sparse"])
+
+        configs = [("unfiltered", None, None)]
+        for level in ("family", "section"):
+            router = QueryRouter.build(zip(index.dense, index.metadata), level)
+            for margin in (float(value) for value in args.margins.split(",")):
+                configs.append((level, margin, router))
+
+        print(f"{len(index)} chunks, {len(queries)} help-centre questions with gold chunks, "
+              f"{len(pdf_queries)} policy-document questions, top_k {args.top_k}")
+        header = (f"{'routing':<11}{'margin':>7}{'routes':>7}{'routed':>8}{'right route':>12}{'recall':>8}{'MRR':>7}"
+                  f"{'scored':>8}{'ctx tokens':>11}{'p50 ms':>8}")
+        print(header)
+        print("-" * len(header))
+        for level, margin, router in configs:
+            if router is not None:
+                router.min_margin = margin
+            hits, reciprocal_ranks, scored, tokens, latencies = 0, [], [], [], []
+            routed = right = 0
+            labeled = [(query, doc) for query, doc in queries] + [(query, None) for query in pdf_queries]
+            for query, doc in labeled:
+                start = time.perf_counter()
+                metadata_filter, route, _ = router.route(vectors[query]) if router else (None, None, 0.0)
+                results = search(query, metadata_filter)
+                latencies.append(time.perf_counter() - start)
+
+                scored.append(int(index.filter_mask(metadata_filter).sum()) if metadata_filter else len(index))
+                if route is not None:
+                    routed += 1
+                    if doc is None:
+                        right += route == "policy-documents" or route.endswith(".pdf")
+                    else:
+                        gold_row = row_of[next(iter(chunk_ids[doc]))]
+                        right += route_of(index.metadata[gold_row], level)[0] == route
+                if doc is None:
+                    continue
+                tokens.append(sum(count_tokens(result["metadata"]["source_text"]) for result in results))
+                rank = next((position for position, result in enumerate(results, start=1)
+                             if result["id"] in chunk_ids[doc]), None)
+                hits += rank is not None
+                reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+            print(f"{level:<11}{'-' if margin is None else margin:>7}{len(router) if router else 1:>7}"
+                  f"{routed / len(labeled):>8.0%}{(f'{right / routed:.0%}' if routed else '-'):>12}"
+                  f"{hits / len(queries):>8.3f}{statistics.mean(reciprocal_ranks):>7.3f}"
+                  f"{statistics.mean(scored):>8.0f}{statistics.mean(tokens):>11.0f}"
+                  f"{statistics.median(latencies) * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
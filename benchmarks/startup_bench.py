@@ -0,0 +1,99 @@
+"""
+Records cold-start cost: import time of backend.response_manager and latency of
+the first response() in a fresh interpreter. Client construction is real; network
+calls (embeddings, index queries, LLM) are stubbed so the numbers are stable.
+
+Run from the repository root:
+    python -m benchmarks.startup_bench [--runs 5] [--output startup.jsonl]
+        [--max-import-ms 500] [--max-first-request-ms 1500]
+
+Exits non-zero when a threshold is exceeded, so it can gate CI on regressions.
+"""
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+
+def child():
+    """Runs in a fresh interpreter; prints one JSON measurement."""
+    from benchmarks import stubs  # sets dummy API keys only
+
+    start = time.perf_counter()
+    from backend import response_manager
+    import_ms = (time.perf_counter() - start) * 1000
+    tokenizer_at_import = "tiktoken" in sys.modules
+
+    from backend import context_retrival, llm_handler
+    from backend.llm_dispatcher import HedgedDispatcher
+
+    start = time.perf_counter()
+    # Lazy client construction, as the first real request would trigger it
+    context_retrival.get_embedding_model()
+    context_retrival.get_dense_index()
+    context_retrival.get_sparse_index()
+    llm_handler.registry.get("openai")
+    # Then stub out everything that would go over the network
+    context_retrival.embedding_model = stubs.StubEmbeddings()
+    context_retrival.pc = stubs.StubPinecone()
+    context_retrival.dense_idx = stubs.StubIndex("dense")
+    context_retrival.sparse_idx = stubs.StubIndex("sparse")
+    llm_handler.dispatcher = HedgedDispatcher([("Fake", stubs.FakeLLMProvider("Fake", latency=0))])
+    response_manager.response("How to become P2M merchant?")
+    first_request_ms = (time.perf_counter() - start) * 1000
+
+    heavy = [name for name in ("boto3", "langchain_google_genai", "langchain_mistralai") if name in sys.modules]
+    print(json.dumps({"import_ms": import_ms, "first_request_ms": first_request_ms, "heavy_modules_loaded": heavy,
+                      "tokenizer_loaded_at_import": tokenizer_at_import}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Append the result as a JSON line to this file")
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-first-request-ms", type=float)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup_bench", "--child"],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": args.runs,
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "first_request_ms": round(statistics.median(s["first_request_ms"] for s in samples), 1),
+        "heavy_modules_loaded": samples[-1]["heavy_modules_loaded"],
+        "tokenizer_loaded_at_import": samples[-1]["tokenizer_loaded_at_import"],
+    }
+    print(json.dumps(result))
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as file:
+            file.write(json.dumps(result) + "\n")
+
+    failures = []
+    if args.max_import_ms is not None and result["import_ms"] > args.max_import_ms:
+        failures.append(f"import {result['import_ms']}ms > {args.max_import_ms}ms")
+    if args.max_first_request_ms is not None and result["first_request_ms"] > args.max_first_request_ms:
+        failures.append(f"first request {result['first_request_ms']}ms > {args.max_first_request_ms}ms")
+    if result["tokenizer_loaded_at_import"]:
+        failures.append("importing response_manager loaded tiktoken")
+    if failures:
+        print("Startup regression: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
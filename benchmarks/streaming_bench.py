@@ -0,0 +1,40 @@
+"""
+Time-to-first-token versus full-completion latency of query_llm_stream, using
+fake streaming providers (no network).
+
+Run from the repository root:
+    python -m benchmarks.streaming_bench
+"""
+import time
+
+from benchmarks import stubs
+from backend.llm_handler import query_llm_stream
+
+ANSWER = " ".join(["JioPay Business merchants can upgrade to P2M within 24 hours of approval."] * 8)
+
+
+def measure(label, providers):
+    start = time.perf_counter()
+    first_token = None
+    chunks = []
+    for chunk in query_llm_stream("prompt", providers=providers, delay=0):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        chunks.append(chunk)
+    total = time.perf_counter() - start
+    print(f"{label:<32} first token {first_token * 1000:>7.1f}ms   full answer {total * 1000:>7.1f}ms   {len(chunks)} chunks")
+    return "".join(chunks)
+
+
+def main():
+    healthy = stubs.fake_stream_provider(ANSWER, first_token_latency=0.3, token_latency=0.02)
+    text = measure("healthy provider", [("Fake", healthy)])
+    assert text == ANSWER
+
+    broken = stubs.fake_stream_provider(ANSWER, first_token_latency=0.1, fail_before_first=ValueError("invalid key"))
+    text = measure("first provider fails, fallback", [("Broken", broken), ("Fake", healthy)])
+    assert text == ANSWER
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import os
+import re
+import time
+import zlib
+import random
+
+# Dummy keys so backend modules can build their clients without real credentials
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("PINECONE_API_KEY", "pc-benchmark")
+
+DIMENSION = 1536
+
+
+def fake_dense_vector(text, dimension=DIMENSION):
+    """Deterministic pseudo-embedding so repeated texts map to the same vector."""
+    rng = random.Random(text)
+    return [rng.uniform(-1, 1) for _ in range(dimension)]
+
+
+def fake_sparse_vector(text):
+    """Deterministic pseudo sparse embedding: one index per distinct token."""
+    tokens = sorted(set(text.lower().split()))
+    return {
+        "sparse_indices": [hash(token) % 100000 for token in tokens],
+        "sparse_values": [1.0 for _ in tokens],
+    }
+
+
+class StubEmbeddings:
+    """Stands in for OpenAIEmbeddings, sleeping `latency` seconds per request."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        time.sleep(self.latency)
+        return fake_dense_vector(text)
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        time.sleep(self.latency)
+        return [fake_dense_vector(text) for text in texts]
+
+
+class StubInference:
+    """Stands in for `pc.inference`, sleeping `latency` seconds per request."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def embed(self, model, inputs, parameters=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        return type("EmbedResponse", (), {"data": [fake_sparse_vector(text) for text in inputs]})()
+
+
+class StubPinecone:
+    def __init__(self, latency=0.0):
+        self.inference = StubInference(latency)
+
+
+class StubIndex:
+    """Stands in for a Pinecone index, returning `size` canned matches per query."""
+
+    def __init__(self, name, latency=0.0, size=10):
+        self.name = name
+        self.latency = latency
+        self.size = size
+        self.calls = 0
+
+    def query(self, top_k=5, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        matches = [
+            {
+                "id": f"{self.name}-{i}",
+                "score": 1.0 - i / self.size,
+                "metadata": {
+                    "category": "stub",
+                    "source_text": f"{self.name} chunk {i}",
+                    "url": "https://jiopay.com/business",
+                    "section": "Stub",
+                },
+            }
+            for i in range(min(top_k, self.size))
+        ]
+        return {"matches": matches}
+
+    def upsert(self, vectors, namespace=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        return {"upserted_count": len(vectors)}
+
+
+def fake_stream_provider(text, first_token_latency=0.0, token_latency=0.0, fail_before_first=None):
+    """
+    A streaming LLM provider function for query_llm_stream: waits `first_token_latency`,
+    then yields `text` word by word every `token_latency` seconds. With
+    `fail_before_first`, raises that exception instead of yielding anything.
+    """
+    def stream(prompt):
+        time.sleep(first_token_latency)
+        if fail_before_first is not None:
+            raise fail_before_first
+        for i, word in enumerate(text.split(" ")):
+            if i:
+                time.sleep(token_latency)
+            yield word if i == 0 else f" {word}"
+    return stream
+
+
+class FakeLLMProvider:
+    """
+    A blocking LLM provider function with configurable behaviour, for dispatcher tests.
+    Each call takes `latency` seconds, or `tail_latency` with probability `tail_rate`;
+    fails with a network error with probability `network_error_rate`; and returns
+    None (a provider-side failure) with probability `failure_rate`.
+    """
+
+    def __init__(self, name, latency=0.1, tail_latency=None, tail_rate=0.0,
+                 network_error_rate=0.0, failure_rate=0.0, seed=0):
+        self.name = name
+        self.latency = latency
+        self.tail_latency = tail_latency
+        self.tail_rate = tail_rate
+        self.network_error_rate = network_error_rate
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        roll = self.rng.random()
+        slow = self.tail_latency is not None and self.rng.random() < self.tail_rate
+        time.sleep(self.tail_latency if slow else self.latency)
+        if roll < self.network_error_rate:
+            raise ConnectionError(f"{self.name}: connection reset")
+        if roll < self.network_error_rate + self.failure_rate:
+            return None
+        return f"answer from {self.name}"
+
+
+class HashingEmbeddings:
+    """
+    Offline stand-in for OpenAIEmbeddings whose vectors carry meaning: word and word-pair
+    counts hashed into `dimension` buckets. Texts sharing vocabulary land close together,
+    so retrieval quality can be compared without calling a real embedding model.
+    """
+
+    def __init__(self, dimension=DIMENSION):
+        self.dimension = dimension
+        self.calls = 0
+
+    def vector(self, text):
+        tokens = re.findall(r"\w+", text.lower())
+        vector = [0.0] * self.dimension
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            digest = zlib.crc32(feature.encode("utf-8"))
+            vector[digest % self.dimension] += 1.0 if digest & 1 << 31 else -1.0
+        return vector
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self.vector(text)
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self.vector(text) for text in texts]
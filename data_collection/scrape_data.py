@@ -1,24 +1,59 @@
+import os
 import json
-from playwright.sync_api import sync_playwright
+import time
+import hashlib
+import asyncio
+import argparse
+from collections import defaultdict
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
 
 # Base URL for crawling
 BASE_URL = "https://jiopay.com/business"
-VISITED_URLS = set()
-DATA = []
+# Scraped pages are appended here one JSON object per line as they complete
+OUTPUT_FILE = "jiopay_data.jsonl"
+# Per-URL validators and content hashes from the previous crawl, and the change set of the last one
+STATE_FILE = "crawl_state.json"
+CHANGES_FILE = "crawl_changes.json"
+
+# Pages fetched at once, and at most this many from any one host
+CRAWL_WORKERS = 8
+PER_HOST_LIMIT = 4
+
+# Links to files a browser would download rather than render
+SKIPPED_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".zip", ".mp4", ".css", ".js", ".ico")
+
+def normalize_url(url):
+    """
+    Canonical form of a URL for dedupe: lowercase scheme and host, no fragment,
+    no default port, no trailing slash, sorted query without utm_* tracking parameters.
+    Returns None for links that are not http(s) pages (mailto:, tel:, javascript:, files).
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        return None
+    if parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+        return None
+    netloc = parsed.netloc.lower()
+    if (parsed.scheme == "http" and netloc.endswith(":80")) or (parsed.scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parsed.path.rstrip("/") or "/"
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parsed.query) if not key.startswith("utm_")))
+    return urlunparse((parsed.scheme.lower(), netloc, path, "", query, ""))
 
 def is_internal_link(link, base_domain):
     """ Check if a link is internal """
     parsed_link = urlparse(link)
     return base_domain in parsed_link.netloc or parsed_link.netloc == ''
 
-def get_child_links(soup, base_url):
-    """ Extracts all internal links from a page """
+def get_child_links(soup, base_url, base_domain=None):
+    """ Extracts all internal links from a page, normalized """
+    base_domain = base_domain or urlparse(BASE_URL).netloc
     links = set()
     for a_tag in soup.find_all('a', href=True):
-        url = urljoin(base_url, a_tag['href'])
-        if is_internal_link(url, urlparse(BASE_URL).netloc):
+        url = normalize_url(urljoin(base_url, a_tag['href']))
+        if url and is_internal_link(url, base_domain):
             links.add(url)
     return links
 
@@ -29,45 +64,288 @@ def extract_content(soup):
     content = " ".join(paragraphs)
     return title, content
 
-def scrape_page(page, url):
-    """ Navigates to a URL and extracts data """
-    page.goto(url)
-    html = page.content()
+def parse_page(url, html, base_domain=None):
+    """ Returns the page record and its internal links """
     soup = BeautifulSoup(html, 'html.parser')
-    
     title, content = extract_content(soup)
-    DATA.append({
-        'url': url,
-        'title': title,
-        'content': content
-    })
-    print(f"Scraped: {url}")
-
-    child_links = get_child_links(soup, url)
-    return child_links
-
-def recursive_scrape(page, url):
-    """ Recursively scrape all internal links """
-    if url not in VISITED_URLS:
-        VISITED_URLS.add(url)
-        child_links = scrape_page(page, url)
-        for link in child_links:
-            recursive_scrape(page, link)
+    return {'url': url, 'title': title, 'content': content}, get_child_links(soup, url, base_domain)
+
+def content_hash(record):
+    """ Hash of the extracted text, so a page whose markup changed but whose text did not counts as unchanged """
+    return hashlib.sha256(json.dumps([record['title'], record['content']], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class CrawlState:
+    """
+    What the previous crawl saw at each URL: its ETag / Last-Modified validators,
+    the hash of its extracted text and its internal links (so the crawl can continue
+    past a page that was not re-fetched). Saved atomically as JSON.
+    """
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.pages = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.pages = json.load(f)
+
+    def get(self, url):
+        return self.pages.get(url)
+
+    def update(self, url, etag, last_modified, digest, links):
+        self.pages[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": digest,
+            "links": sorted(links),
+            "crawled_at": int(time.time()),
+        }
+
+    def remove(self, url):
+        self.pages.pop(url, None)
+
+    def save(self):
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.pages, f, indent=1, sort_keys=True)
+        os.replace(f"{self.path}.tmp", self.path)
+
+def conditional_headers(known):
+    """ If-None-Match / If-Modified-Since from the validators stored for a page """
+    headers = {}
+    if known and known.get("etag"):
+        headers["If-None-Match"] = known["etag"]
+    if known and known.get("last_modified"):
+        headers["If-Modified-Since"] = known["last_modified"]
+    return headers
+
+@dataclass
+class Fetched:
+    """ Outcome of fetching one URL """
+    html: str = None
+    etag: str = None
+    last_modified: str = None
+    not_modified: bool = False
+    gone: bool = False
+
+class PlaywrightFetcher:
+    """
+    Renders pages in headless Chromium. One browser context is shared and every
+    crawl worker drives its own page (tab) in it. Pages are always rendered, even in
+    incremental crawls: the site is rendered client-side, so the HTML shell's ETag and
+    Last-Modified stay the same when the content changes, and a 304 for the shell says
+    nothing. Unchanged pages are recognized by their content hash instead (see `crawl`).
+    """
+
+    async def __aenter__(self):
+        from playwright.async_api import async_playwright
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=True)
+        self.context = await self.browser.new_context()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.browser.close()
+        await self.playwright.stop()
+
+    async def new_worker(self):
+        return await self.context.new_page()
+
+    async def close_worker(self, page):
+        await page.close()
+
+    async def fetch(self, page, url, known=None):
+        response = await page.goto(url)
+        if response is None:
+            return Fetched(await page.content())
+        if response.status in (404, 410):
+            return Fetched(gone=True)
+        if not response.ok:
+            raise RuntimeError(f"HTTP {response.status}")
+        return Fetched(await page.content(), response.headers.get("etag"), response.headers.get("last-modified"))
+
+class HttpFetcher:
+    """
+    Fetches raw HTML over plain HTTP, without running JavaScript: much faster than a
+    browser for static pages (and for testing the crawler against a local site).
+    """
+
+    async def __aenter__(self):
+        import httpx
+        self.client = httpx.AsyncClient(follow_redirects=True, timeout=30)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    async def new_worker(self):
+        return self.client
+
+    async def close_worker(self, client):
+        pass
+
+    async def fetch(self, client, url, known=None):
+        response = await client.get(url, headers=conditional_headers(known))
+        if response.status_code == 304:
+            return Fetched(not_modified=True)
+        if response.status_code in (404, 410):
+            return Fetched(gone=True)
+        response.raise_for_status()
+        html = response.text if "html" in response.headers.get("content-type", "") else None
+        return Fetched(html, response.headers.get("etag"), response.headers.get("last-modified"))
+
+async def crawl(start_url, output_path, fetcher, workers=CRAWL_WORKERS, per_host=PER_HOST_LIMIT, max_pages=None,
+                state=None, changes_path=None):
+    """
+    Breadth-first crawl of the internal pages reachable from `start_url`.
+
+    A shared frontier queue feeds `workers` concurrent workers; URLs are normalized
+    and each is fetched once. At most `per_host` fetches run against one host at a time.
+    Every page is written to `output_path` (JSONL) as soon as it is scraped, so an
+    interrupted crawl keeps everything fetched so far; a full crawl starts the file
+    afresh, so re-running it does not duplicate pages. Returns crawl statistics.
+
+    With a `CrawlState`, the crawl is incremental: the HTTP fetcher requests pages
+    conditionally with their stored ETag / Last-Modified and a 304 skips extraction
+    (the Playwright fetcher always renders, see PlaywrightFetcher), and a page whose
+    extracted text hashes the same as last time is not written again. Only
+    added and changed pages are appended to `output_path`, and the change set
+    {"added", "changed", "removed"} is written to `changes_path` for ingestion.
+    """
+    base_domain = urlparse(start_url).netloc
+    start = normalize_url(start_url)
+    frontier = asyncio.Queue()
+    frontier.put_nowait(start)
+    seen = {start}
+    host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
+    stats = {"pages": 0, "failed": 0, "skipped": 0, "not_modified": 0, "unchanged": 0}
+    changes = {"added": [], "changed": [], "removed": []}
+    # URLs that still exist on the site (fetched, unchanged, or failed transiently)
+    alive = set()
+    started = time.perf_counter()
+
+    def follow(links):
+        for link in links:
+            if link not in seen:
+                seen.add(link)
+                frontier.put_nowait(link)
+
+    # Incremental crawls append their added and changed pages; a full crawl rewrites every page
+    with open(output_path, "w" if state is None else "a", encoding="utf-8") as output:
+
+        async def worker():
+            handle = None
+            try:
+                handle = await fetcher.new_worker()
+                while True:
+                    url = await frontier.get()
+                    known = None
+                    try:
+                        if max_pages is not None and stats["pages"] >= max_pages:
+                            continue
+                        known = state.get(url) if state is not None else None
+                        async with host_limits[urlparse(url).netloc]:
+                            fetched = await fetcher.fetch(handle, url, known)
+                        if fetched.gone:
+                            continue
+                        alive.add(url)
+                        if fetched.not_modified:
+                            stats["not_modified"] += 1
+                            links = known["links"]
+                        elif fetched.html is None:
+                            stats["skipped"] += 1
+                            continue
+                        else:
+                            record, links = parse_page(url, fetched.html, base_domain)
+                            digest = content_hash(record)
+                            if known is not None and known["content_hash"] == digest:
+                                stats["unchanged"] += 1
+                            else:
+                                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                                output.flush()
+                                stats["pages"] += 1
+                                changes["added" if known is None else "changed"].append(url)
+                                print(f"Scraped: {url}")
+                            if state is not None:
+                                state.update(url, fetched.etag, fetched.last_modified, digest, links)
+                        follow(links)
+                    except Exception as e:
+                        alive.add(url)
+                        stats["failed"] += 1
+                        print(f"❌ Failed to scrape {url}: {e}")
+                        # Keep crawling below a page that failed transiently through its last known links
+                        if known is not None:
+                            follow(known["links"])
+                    finally:
+                        frontier.task_done()
+            except Exception as e:
+                print(f"❌ Crawl worker could not start: {e}")
+            finally:
+                if handle is not None:
+                    await fetcher.close_worker(handle)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        # Workers only return early when they cannot start; if none is left, nothing would empty the frontier
+        joined = asyncio.ensure_future(frontier.join())
+        await asyncio.wait([joined, asyncio.gather(*tasks, return_exceptions=True)], return_when=asyncio.FIRST_COMPLETED)
+        if not joined.done():
+            print(f"❌ No crawl worker is running; {frontier.qsize()} queued pages not fetched")
+            while not frontier.empty():
+                frontier.get_nowait()
+                stats["failed"] += 1
+                frontier.task_done()
+            await joined
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if state is not None:
+        # A page is removed when it is gone (404/410) or no longer linked from the site;
+        # a crawl cut short by max_pages, or with failed fetches, cannot tell, so it removes nothing
+        if stats["failed"]:
+            print(f"⚠️ {stats['failed']} pages failed; not removing any pages this crawl")
+        elif max_pages is None or stats["pages"] < max_pages:
+            changes["removed"] = sorted(url for url in state.pages if url not in alive)
+            for url in changes["removed"]:
+                state.remove(url)
+        state.save()
+        if changes_path:
+            with open(changes_path, "w", encoding="utf-8") as f:
+                json.dump({"output": output_path, **{key: sorted(urls) for key, urls in changes.items()}}, f, indent=1)
+
+    stats.update({key: len(urls) for key, urls in changes.items()})
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["pages_per_sec"] = round(stats["pages"] / max(stats["seconds"], 1e-9), 1)
+    return stats
+
+async def run(start_url, output_path, fetcher_name="playwright", workers=CRAWL_WORKERS, per_host=PER_HOST_LIMIT, max_pages=None,
+              state_path=None, changes_path=CHANGES_FILE):
+    fetcher = PlaywrightFetcher() if fetcher_name == "playwright" else HttpFetcher()
+    state = CrawlState(state_path) if state_path else None
+    async with fetcher:
+        return await crawl(start_url, output_path, fetcher, workers, per_host, max_pages, state, changes_path)
 
 def main():
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        
-        # Start recursive scraping from the base URL
-        recursive_scrape(page, BASE_URL)
-        
-        browser.close()
-        
-        # Save the scraped data to a JSON file
-        with open('jiopay_data.json', 'w') as f:
-            json.dump(DATA, f, indent=4)
-        print("Scraping completed. Data saved to jiopay_data.json")
+    parser = argparse.ArgumentParser(description="Crawl the internal pages of a site into JSONL.")
+    parser.add_argument("--start", default=BASE_URL)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--fetcher", choices=["playwright", "http"], default="playwright",
+                        help="playwright renders JavaScript; http fetches static HTML only")
+    parser.add_argument("--workers", type=int, default=CRAWL_WORKERS)
+    parser.add_argument("--per-host", type=int, default=PER_HOST_LIMIT)
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-scrape pages changed since the last crawl recorded in --state")
+    parser.add_argument("--state", default=STATE_FILE)
+    parser.add_argument("--changes", default=CHANGES_FILE)
+    args = parser.parse_args()
+
+    state_path = args.state if args.incremental else None
+    stats = asyncio.run(run(args.start, args.output, args.fetcher, args.workers, args.per_host, args.max_pages,
+                            state_path, args.changes))
+    print(f"Scraping completed: {stats['pages']} pages ({stats['pages_per_sec']} pages/sec, "
+          f"{stats['failed']} failed). Data saved to {args.output}")
+    if state_path:
+        print(f"🔁 {stats['added']} added, {stats['changed']} changed, {stats['removed']} removed, "
+              f"{stats['not_modified'] + stats['unchanged']} unchanged. Change set saved to {args.changes}")
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,5 @@
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 import json
-import time
 
 # Function to capture network requests for JSON data
 def capture_api_calls(page):
@@ -21,19 +20,19 @@ def capture_api_calls(page):
     return api_data
 
 # Infinite scrolling to load dynamic content
-def infinite_scroll(page, scroll_pause_time=2):
-    previous_height = None
+def infinite_scroll(page, growth_timeout=5000):
     while True:
         # Scroll down to the bottom of the page
+        previous_height = page.evaluate("document.body.scrollHeight")
         page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(scroll_pause_time)
 
-        # Get current scroll height
-        current_height = page.evaluate("document.body.scrollHeight")
-        if previous_height == current_height:
-            # Stop if no more content is loaded
+        # Wait for the page to grow (new content rendered); stop if it does not within growth_timeout ms
+        try:
+            page.wait_for_function("height => document.body.scrollHeight > height", arg=previous_height, timeout=growth_timeout)
+        except PlaywrightTimeoutError:
             break
-        previous_height = current_height
+        # Let the requests the new content triggered finish before scrolling again
+        page.wait_for_load_state("networkidle")
     print("Finished scrolling.")
 
 # Main Playwright logic
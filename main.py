@@ -1,5 +1,5 @@
 import streamlit as st
-from backend.response_manager import response  # Import the response function
+from backend.response_manager import response_stream  # Import the streaming response function
 
 # Page configuration
 st.set_page_config(page_title="JioPay Business Assistant", layout="centered")
@@ -79,12 +79,15 @@ if question:
     # Generate assistant response
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
-            result = response(question)  # Call the backend function
-            llm_response = result["response"]
+            result = response_stream(question)  # Retrieval happens here; the LLM streams below
             sources = result["sources"]
 
-            # Display AI response
-            st.write(llm_response)
+        # Streamlit stops this run (raising inside it) when the user sends another message;
+        # closing the stream then releases its shared LLM stream for the next identical query
+        tokens = result["response"]
+        try:
+            # Answer goes above the sources, but the sources are rendered first since they are already known
+            answer_container = st.container()
 
             # Sort sources by score in descending order
             sorted_sources = sorted(sources, key=lambda x: x["score"], reverse=True)
@@ -109,9 +112,17 @@ if question:
                             unsafe_allow_html=True
                         )
 
+            # Display AI response token by token
+            with answer_container:
+                llm_response = st.write_stream(tokens)
+        finally:
+            close = getattr(tokens, "close", None)
+            if close is not None:
+                close()
+
     # Add assistant response to history
     st.session_state.messages.append({"role": "assistant", "content": llm_response})
 
-# run uvicorn main:app --reload
+# API server (JSON and SSE endpoints): uvicorn backend.api:app
 
 